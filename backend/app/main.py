@@ -8,18 +8,23 @@ import re
 import uuid
 import json
 import hashlib
+import hmac
 import html
 import base64
 import mimetypes
 import math
+import bisect
+import heapq
 import asyncio
 import threading
 import contextvars
 import tempfile
 import subprocess
-from functools import lru_cache
+from functools import lru_cache, partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Set, Iterable
+from typing import Any, Dict, List, Optional, Tuple, Set, FrozenSet, Iterable
 
 # Pydantic (v1/v2 compatibility)
 try:
@@ -29,6 +34,12 @@ except Exception:  # pragma: no cover
 
 from filelock import FileLock  # type: ignore
 
+# Fast JSON parsing for large request bodies (optional; stdlib json fallback).
+try:
+    import orjson as _orjson  # type: ignore
+except Exception:  # pragma: no cover
+    _orjson = None
+
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, Header, Depends, Body
 from fastapi.responses import HTMLResponse, Response, JSONResponse, FileResponse
 # Threadpool helper (prevents blocking the event loop on requests/azure upload)
@@ -238,17 +249,24 @@ def _perf_opt_env_float(name: str, default: float, *, min_value: float = 0.0, ma
 _PERF_OPT_CACHE_ENABLED = (os.getenv("PERF_OPT_CACHE_ENABLED", "1") or "1").strip().lower() not in {"0", "false", "no", "off"}
 _CATALOG_CACHE_TTL_S = _perf_opt_env_float("CATALOG_CACHE_TTL_S", 30.0, max_value=600.0)
 _USAGE_STATUS_CACHE_TTL_S = _perf_opt_env_float("USAGE_STATUS_CACHE_TTL_S", 5.0, max_value=60.0)
+_USAGE_PEEK_CACHE_TTL_S = _perf_opt_env_float("USAGE_PEEK_CACHE_TTL_S", 0.5, max_value=5.0)
 _MEMBER_REBRANDING_UPSERT_CACHE_TTL_S = _perf_opt_env_float("MEMBER_REBRANDING_UPSERT_CACHE_TTL_S", 30.0, max_value=600.0)
 _CHAT_COMPANION_PROMPT_BLOCK_CACHE_TTL_S = _perf_opt_env_float("CHAT_COMPANION_PROMPT_BLOCK_CACHE_TTL_S", 120.0, max_value=900.0)
+_CONTENT_MODE_DIR_CACHE_TTL_S = _perf_opt_env_float("CONTENT_MODE_DIR_CACHE_TTL_S", 60.0, max_value=3600.0)
 
 _CATALOG_RESPONSE_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
 _CATALOG_RESPONSE_CACHE_LOCK = threading.RLock()
 _USAGE_STATUS_FAST_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
 _USAGE_STATUS_FAST_CACHE_LOCK = threading.RLock()
+_USAGE_PEEK_CACHE: Dict[Tuple[str, bool, str, str, str], Tuple[float, Tuple[bool, Dict[str, Any]]]] = {}
+_USAGE_PEEK_CACHE_LOCK = threading.RLock()
 _MEMBER_REBRANDING_UPSERT_CACHE: Dict[str, Tuple[float, str]] = {}
 _MEMBER_REBRANDING_UPSERT_CACHE_LOCK = threading.RLock()
 _CHAT_COMPANION_PROMPT_BLOCK_CACHE: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
 _CHAT_COMPANION_PROMPT_BLOCK_CACHE_LOCK = threading.RLock()
+_CONTENT_MODE_DIR_CACHE: Dict[Tuple[str, str], Tuple[float, str]] = {}
+_CONTENT_DIR_LISTING_CACHE: Dict[str, Tuple[int, Tuple[str, ...], Tuple[int, ...]]] = {}
+_CONTENT_DIR_CACHE_LOCK = threading.RLock()
 
 def _perf_json_clone(value: Any) -> Any:
     try:
@@ -285,6 +303,21 @@ def _clear_usage_status_fast_cache(identity_key: str = "") -> None:
                 _USAGE_STATUS_FAST_CACHE.clear()
     except Exception:
         pass
+    _clear_usage_peek_cache(identity_key)
+
+def _clear_usage_peek_cache(identity_key: str = "") -> None:
+    try:
+        with _USAGE_PEEK_CACHE_LOCK:
+            if identity_key:
+                raw = str(identity_key or "").strip().lower()
+                member = raw.split("::", 1)[1].strip() if raw.startswith("member::") else raw
+                for key in list(_USAGE_PEEK_CACHE.keys()):
+                    if key[0] in (raw, member):
+                        _USAGE_PEEK_CACHE.pop(key, None)
+            else:
+                _USAGE_PEEK_CACHE.clear()
+    except Exception:
+        pass
 
 def _clear_chat_companion_prompt_block_cache(brand: str = "", avatar: str = "") -> None:
     try:
@@ -809,9 +842,10 @@ async def usage_status(request: Request):
     rebranding_key_raw = _extract_rebranding_key(session_state)
     rebranding_parsed = _parse_rebranding_key(rebranding_key_raw) if rebranding_key_raw else {}
 
-    plan_map = _session_get_str(session_state, "elaralo_plan_map", "elaraloPlanMap") or rebranding_parsed.get("elaralo_plan_map", "")
-    free_minutes_raw = _session_get_str(session_state, "free_minutes", "freeMinutes") or rebranding_parsed.get("free_minutes", "")
-    cycle_days_raw = _session_get_str(session_state, "cycle_days", "cycleDays") or rebranding_parsed.get("cycle_days", "")
+    overrides = _rebranding_overrides(session_state, rebranding_parsed)
+    plan_map = overrides["elaralo_plan_map"]
+    free_minutes_raw = overrides["free_minutes"]
+    cycle_days_raw = overrides["cycle_days"]
 
     free_minutes = _safe_int(free_minutes_raw)
     cycle_days = _safe_int(cycle_days_raw)
@@ -1539,7 +1573,21 @@ def _parse_rebranding_key(raw: str) -> Dict[str, str]:
 
     Expected order:
       Rebranding|UpgradeLink|PayGoLink|PayGoPrice|PayGoMinutes|Plan|ElaraloPlanMap|FreeMinutes|CycleDays
+
+    The same key arrives on every turn of a session, so parses are memoized by the raw
+    string; callers get their own copy of the cached dict.
     """
+    if not isinstance(raw, str):
+        return _parse_rebranding_key_uncached(raw)
+    return dict(_parse_rebranding_key_cached(raw))
+
+
+@lru_cache(maxsize=4096)
+def _parse_rebranding_key_cached(raw: str) -> Dict[str, str]:
+    return _parse_rebranding_key_uncached(raw)
+
+
+def _parse_rebranding_key_uncached(raw: Any) -> Dict[str, str]:
     v = _normalize_rebranding_key_value(raw)
     if not v:
         return {}
@@ -1961,8 +2009,10 @@ def _resolve_paygo_credit_minutes_for_member(member_id: str, paylink_id: str) ->
 #
 # Default lookup key is (brand, avatar), case-insensitive.
 
+import atexit
 import sqlite3
 import shutil
+import sys
 import tempfile
 from urllib.parse import urlparse, parse_qs, quote, unquote
 
@@ -1988,6 +2038,25 @@ from urllib.parse import urlparse, parse_qs, quote, unquote
 _ECONNECT_DB_LOCK = threading.Lock()
 _ECONNECT_DB_PATH_CACHED: Optional[str] = None
 
+# Per-connection prepared-statement cache size (sqlite3 default is 128 on 3.11, 100 before).
+# The econnect schema issues a few hundred distinct statements, so keep them all prepared.
+# CPython 3.12.0/3.12.1 shipped a statement-cache regression; disable the cache there.
+try:
+    _ECONNECT_CACHED_STATEMENTS = max(0, int(os.getenv("ECONNECT_SQLITE_CACHED_STATEMENTS", "256") or "256"))
+except Exception:
+    _ECONNECT_CACHED_STATEMENTS = 256
+if sys.version_info[:3] in {(3, 12, 0), (3, 12, 1)}:
+    _ECONNECT_CACHED_STATEMENTS = 0
+_ECONNECT_WAL_APPLIED: Set[str] = set()
+_ECONNECT_MMAP_BYTES = max(0, _env_int("ECONNECT_SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+_ECONNECT_CONN_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA busy_timeout=5000;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA cache_size=-16000;"
+    f"PRAGMA mmap_size={_ECONNECT_MMAP_BYTES};"
+)
+
 
 def _econnect_db_path() -> str:
     """Return the unified SQLite DB path (persisted when possible)."""
@@ -2079,21 +2148,40 @@ def _ensure_econnect_db_seeded() -> str:
 def _econnect_conn() -> sqlite3.Connection:
     """Open the unified persisted SQLite DB with the standard runtime pragmas."""
     path = _ensure_econnect_db_seeded()
-    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn = sqlite3.connect(
+        path,
+        timeout=30,
+        check_same_thread=False,
+        cached_statements=_ECONNECT_CACHED_STATEMENTS,
+    )
     conn.row_factory = sqlite3.Row
+    # journal_mode=WAL is persisted in the DB file, so it only needs to be set once per path.
+    if path not in _ECONNECT_WAL_APPLIED:
+        try:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            _ECONNECT_WAL_APPLIED.add(path)
+        except Exception:
+            pass
+    # The remaining pragmas are per-connection state; applied in one script.
     try:
-        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.executescript(_ECONNECT_CONN_PRAGMAS)
     except Exception:
         pass
+    return conn
+
+
+def _econnect_close(conn: Optional[sqlite3.Connection]) -> None:
+    """Close an econnect connection, letting SQLite refresh planner stats first."""
+    if conn is None:
+        return
     try:
-        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA optimize;")
     except Exception:
         pass
     try:
-        conn.execute("PRAGMA busy_timeout=5000;")
+        conn.close()
     except Exception:
         pass
-    return conn
 
 _COMPANION_MAPPINGS: Dict[Tuple[str, str], Dict[str, Any]] = {}
 _COMPANION_MAPPINGS_LOADED_AT: float | None = None
@@ -2451,6 +2539,8 @@ def _load_companion_mappings_sync() -> None:
     _COMPANION_MAPPINGS_LOADED_AT = time.time()
     _COMPANION_MAPPINGS_SOURCE = db_path
     _COMPANION_MAPPINGS_TABLE = table_name_for_source
+    # Mapping rows feed the onboarding join (avatar, id, companion_type).
+    _onboarding_join_cache_clear()
     print(f"[mappings] Loaded {len(_COMPANION_MAPPINGS)} companion mapping rows from {db_path} (table={table_name_for_source})")
 
 
@@ -2816,7 +2906,7 @@ async def _startup_load_companion_mappings() -> None:
         print(f"[mappings] ERROR ensuring companion mapping export schema/startup migrations: {e!r}")
 
     try:
-        await run_in_threadpool(_content_repair_persisted_urls_sync)
+        await _content_writer_call(_content_repair_persisted_urls_sync)
     except Exception as e:
         print(f"[content] ERROR repairing persisted content URLs: {e!r}")
 
@@ -5072,6 +5162,39 @@ def _session_get_str(session_state: Dict[str, Any], *keys: str) -> str:
             return s
     return ""
 
+# Explicit session_state fields that override the matching RebrandingKey part
+# (RebrandingKey field -> accepted session_state keys, in priority order).
+_REBRANDING_OVERRIDE_KEYS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("upgrade_link", ("upgrade_link", "upgradeLink")),
+    ("pay_go_link", ("pay_go_link", "payGoLink")),
+    ("pay_go_price", ("pay_go_price", "payGoPrice")),
+    ("pay_go_minutes", ("pay_go_minutes", "payGoMinutes")),
+    ("plan", ("rebranding_plan", "rebrandingPlan", "planExternal", "plan_external")),
+    ("elaralo_plan_map", ("elaralo_plan_map", "elaraloPlanMap")),
+    ("free_minutes", ("free_minutes", "freeMinutes")),
+    ("cycle_days", ("cycle_days", "cycleDays")),
+)
+
+
+def _rebranding_overrides(session_state: Dict[str, Any], rebranding_parsed: Dict[str, str]) -> Dict[str, str]:
+    """Resolve every RebrandingKey field in one pass: explicit session_state value first
+    (same rules as _session_get_str), else the parsed RebrandingKey part, else ""."""
+    get = getattr(session_state, "get", None)
+    out: Dict[str, str] = {}
+    for field, keys in _REBRANDING_OVERRIDE_KEYS:
+        val = ""
+        if get is not None:
+            for k in keys:
+                v = get(k)
+                if v is None:
+                    continue
+                val = str(v).strip()
+                if val:
+                    break
+        out[field] = val or (rebranding_parsed or {}).get(field, "")
+    return out
+
+
 def _normalize_plan_name_for_limits(plan_name: str) -> str:
     p = (plan_name or "").strip()
     if not p:
@@ -5121,17 +5244,22 @@ def _included_minutes_for_plan(plan_name: str) -> int:
 
 def _get_client_ip(request: Request) -> str:
     # Azure front-ends commonly set x-forwarded-for with a comma-separated chain.
-    xff = (request.headers.get("x-forwarded-for") or "").strip()
-    if xff:
-        return xff.split(",")[0].strip()
-    rip = (request.headers.get("x-real-ip") or "").strip()
-    if rip:
-        return rip
-    cip = (request.headers.get("x-client-ip") or "").strip()
-    if cip:
-        return cip
-    try:
-        return str(getattr(request.client, "host", "") or "").strip()
+    # Headers are read lazily: stop at the first one that is present.
+    headers = request.headers
+    xff = headers.get("x-forwarded-for")
+    if xff and not xff.isspace():
+        return xff.split(",", 1)[0].strip()
+    for name in ("x-real-ip", "x-client-ip"):
+        val = headers.get(name)
+        if val:
+            val = val.strip()
+            if val:
+                return val
+    client = request.client
+    if client is None:
+        return ""
+    try:
+        return str(client.host or "").strip()
     except Exception:
         return ""
 
@@ -5455,19 +5583,22 @@ def _usage_credit_minutes_sync(identity_key: str, minutes: int) -> Dict[str, Any
         return {"ok": False, "identity_key": identity_key}
 
 
+_MODE_SEPARATOR_RE = re.compile(r"[\s_\-]+")
+_MODE_ALIASES: Dict[str, str] = {
+    **{k: "intimate" for k in ("mature", "mature 18+", "intimate", "intimate 18+", "explicit", "18+", "adult")},
+    **{k: "romantic" for k in ("grow", "mate", "romance", "romantic")},
+    **{k: "friend" for k in ("start", "intro", "friend", "friendly")},
+}
+
+
+@lru_cache(maxsize=256)
 def _normalize_mode(raw: str) -> str:
     t = (raw or "").strip().lower()
-    t = re.sub(r"[\s_\-]+", " ", t).strip()
+    t = _MODE_SEPARATOR_RE.sub(" ", t).strip()
     # Public mode labels are Start/Grow/Mature.
     # Internal routing remains friend/romantic/intimate to preserve content folders,
     # model routing, consent gates, and provider behavior.
-    if t in {"mature", "mature 18+", "intimate", "intimate 18+", "explicit", "18+", "adult"}:
-        return "intimate"
-    if t in {"grow", "mate", "romance", "romantic"}:
-        return "romantic"
-    if t in {"start", "intro", "friend", "friendly"}:
-        return "friend"
-    return "friend"
+    return _MODE_ALIASES.get(t, "friend")
 
 
 
@@ -5524,106 +5655,159 @@ def _sanitize_public_mode_labels_events(events: List[Dict[str, Any]]) -> List[Di
     return out
 
 
+# Mode-switch phrases are matched as plain substrings of the lower-cased text. Each list is
+# compiled once into an alternation so a message is scanned once per mode, not once per phrase.
+_MODE_SWITCH_HINT_FRIEND_RE = re.compile(r"mode:(?:friend|intro)")
+_MODE_SWITCH_HINT_ROMANTIC_RE = re.compile(r"mode:(?:romantic|mate)")
+_MODE_SWITCH_HINT_INTIMATE_RE = re.compile(r"mode:(?:intimate|mature|explicit)")
+_MODE_SWITCH_FRIEND_PHRASES = (
+    "switch to intro",
+    "change to intro",
+    "move to intro",
+    "make it intro",
+    "go to intro",
+    "back to intro",
+    "intro mode",
+    "set intro",
+    "set mode to intro",
+    "turn on intro",
+    "switch to friend",
+    "change to friend",
+    "move to friend",
+    "make it friend",
+    "go to friend",
+    "back to friend",
+    "friend mode",
+    "set friend",
+    "set mode to friend",
+    "turn on friend",
+)
+_MODE_SWITCH_ROMANTIC_PHRASES = (
+    "switch to mate",
+    "change to mate",
+    "move to mate",
+    "go to mate",
+    "back to mate",
+    "mate mode",
+    "set mate",
+    "set mode to mate",
+    "turn on mate",
+    "switch to romantic",
+    "change to romantic",
+    "move to romantic",
+    "go to romantic",
+    "back to romantic",
+    "romantic mode",
+    "romance mode",
+    "set romantic",
+    "set mode to romantic",
+    "turn on romantic",
+    "let's be romantic",
+)
+_MODE_SWITCH_INTIMATE_PHRASES = (
+    "switch to mature",
+    "change to mature",
+    "move to mature",
+    "go to mature",
+    "back to mature",
+    "mature mode",
+    "set mature",
+    "set mode to mature",
+    "turn on mature",
+    "switch to intimate",
+    "change to intimate",
+    "move to intimate",
+    "go to intimate",
+    "back to intimate",
+    "intimate mode",
+    "set intimate",
+    "set mode to intimate",
+    "turn on intimate",
+    "switch to explicit",
+    "explicit mode",
+    "set explicit",
+    "set mode to explicit",
+    "turn on explicit",
+    "adult mode",
+    "18+ mode",
+)
+_MODE_SWITCH_FRIEND_RE = re.compile("|".join(re.escape(p) for p in _MODE_SWITCH_FRIEND_PHRASES))
+_MODE_SWITCH_ROMANTIC_RE = re.compile("|".join(re.escape(p) for p in _MODE_SWITCH_ROMANTIC_PHRASES))
+_MODE_SWITCH_INTIMATE_RE = re.compile("|".join(re.escape(p) for p in _MODE_SWITCH_INTIMATE_PHRASES))
+# Union of the three lists: most turns contain no switch phrase at all, so one scan
+# rules them out before the per-mode (precedence-ordered) passes run.
+_MODE_SWITCH_ANY_RE = re.compile(
+    "|".join(
+        re.escape(p)
+        for p in _MODE_SWITCH_FRIEND_PHRASES + _MODE_SWITCH_ROMANTIC_PHRASES + _MODE_SWITCH_INTIMATE_PHRASES
+    )
+)
+
+
 def _detect_mode_switch_from_text(text: str) -> Optional[str]:
     t = (text or "").lower().strip()
 
     # explicit hints: allow [mode:romantic] etc
-    if "mode:friend" in t or "[mode:friend]" in t or "mode:intro" in t or "[mode:intro]" in t:
-        return "friend"
-    if "mode:romantic" in t or "[mode:romantic]" in t or "mode:mate" in t or "[mode:mate]" in t:
-        return "romantic"
-    if (
-        "mode:intimate" in t
-        or "[mode:intimate]" in t
-        or "mode:mature" in t
-        or "[mode:mature]" in t
-        or "mode:explicit" in t
-        or "[mode:explicit]" in t
-    ):
-        return "intimate"
+    if "mode:" in t:
+        if _MODE_SWITCH_HINT_FRIEND_RE.search(t):
+            return "friend"
+        if _MODE_SWITCH_HINT_ROMANTIC_RE.search(t):
+            return "romantic"
+        if _MODE_SWITCH_HINT_INTIMATE_RE.search(t):
+            return "intimate"
 
     # soft detection (more natural language coverage)
-    # friend
-    if any(p in t for p in [
-        "switch to intro",
-        "change to intro",
-        "move to intro",
-        "make it intro",
-        "go to intro",
-        "back to intro",
-        "intro mode",
-        "set intro",
-        "set mode to intro",
-        "turn on intro",
-        "switch to friend",
-        "change to friend",
-        "move to friend",
-        "make it friend",
-        "go to friend",
-        "back to friend",
-        "friend mode",
-        "set friend",
-        "set mode to friend",
-        "turn on friend",
-    ]):
+    if _MODE_SWITCH_ANY_RE.search(t) is None:
+        return None
+    if _MODE_SWITCH_FRIEND_RE.search(t):
         return "friend"
-
-    # romantic
-    if any(p in t for p in [
-        "switch to mate",
-        "change to mate",
-        "move to mate",
-        "go to mate",
-        "back to mate",
-        "mate mode",
-        "set mate",
-        "set mode to mate",
-        "turn on mate",
-        "switch to romantic",
-        "change to romantic",
-        "move to romantic",
-        "go to romantic",
-        "back to romantic",
-        "romantic mode",
-        "romance mode",
-        "set romantic",
-        "set mode to romantic",
-        "turn on romantic",
-        "let's be romantic",
-    ]):
+    if _MODE_SWITCH_ROMANTIC_RE.search(t):
         return "romantic"
-
-    # intimate/explicit
-    if any(p in t for p in [
-        "switch to mature",
-        "change to mature",
-        "move to mature",
-        "go to mature",
-        "back to mature",
-        "mature mode",
-        "set mature",
-        "set mode to mature",
-        "turn on mature",
-        "switch to intimate",
-        "change to intimate",
-        "move to intimate",
-        "go to intimate",
-        "back to intimate",
-        "intimate mode",
-        "set intimate",
-        "set mode to intimate",
-        "turn on intimate",
-        "switch to explicit",
-        "explicit mode",
-        "set explicit",
-        "set mode to explicit",
-        "turn on explicit",
-        "adult mode",
-        "18+ mode",
-    ]):
+    if _MODE_SWITCH_INTIMATE_RE.search(t):
         return "intimate"
 
     return None
+
+
+_MINUTES_BALANCE_NEEDLES = (
+    "minutes remaining",
+    "minutes left",
+    "remaining minutes",
+    "time remaining",
+    "time left",
+    "how many minutes",
+    "how much time",
+    "minutes balance",
+    "balance minutes",
+    "what is my balance",
+    "what's my balance",
+    "how many minutes remain",
+    "how many minutes are remaining",
+    "how many minutes for chat",
+    "chat minutes",
+    "minutes for chat",
+    "how many minutes do i have",
+    "how many minutes do i have left",
+    "how many minutes do i have remaining",
+    "how much time do i have left",
+    "how much time do i have remaining",
+    "how much time is left",
+    "how many minutes are left",
+    "minutes used",
+    "how many minutes have i used",
+    "how much have i used",
+    "usage minutes",
+)
+# All needles in one alternation: a single C-level pass over the text instead of one
+# substring scan per needle.
+_MINUTES_BALANCE_NEEDLES_RE = re.compile("|".join(re.escape(n) for n in _MINUTES_BALANCE_NEEDLES))
+# "minute(s)" or "time" together with remaining/left/balance/usage, in either order.
+_MINUTES_BALANCE_WORDS_RE = re.compile(
+    r"^(?=.*\b(?:minutes?|time)\b)(?=.*\b(?:remain|remaining|left|balance|used|usage)\b)",
+    re.S,
+)
+
+
 def _is_minutes_balance_question(text: str) -> bool:
     """
     Return True when the user is asking about their remaining chat time/minutes.
@@ -5634,61 +5818,56 @@ def _is_minutes_balance_question(text: str) -> bool:
     t = text.strip().lower()
 
     # Fast exact-ish contains (covers prior phrases)
-    needles = [
-        "minutes remaining",
-        "minutes left",
-        "remaining minutes",
-        "time remaining",
-        "time left",
-        "how many minutes",
-        "how much time",
-        "minutes balance",
-        "balance minutes",
-        "what is my balance",
-        "what's my balance",
-        "how many minutes remain",
-        "how many minutes are remaining",
-        "how many minutes for chat",
-        "chat minutes",
-        "minutes for chat",
-        "how many minutes do i have",
-        "how many minutes do i have left",
-        "how many minutes do i have remaining",
-        "how much time do i have left",
-        "how much time do i have remaining",
-        "how much time is left",
-        "how many minutes are left",
-        "minutes used",
-        "how many minutes have i used",
-        "how much have i used",
-        "usage minutes",
-    ]
-    if any(n in t for n in needles):
+    if _MINUTES_BALANCE_NEEDLES_RE.search(t):
         return True
 
-    # Regex fallback: any question containing "minute(s)" + remaining/left/balance/usage
-    if re.search(r"\bminute(s)?\b", t) and re.search(r"\b(remain|remaining|left|balance|used|usage)\b", t):
-        return True
+    # Regex fallback: "minute(s)"/"time" + remaining/left/balance/usage
+    # (a bare "time" question without a balance word does not match)
+    return _MINUTES_BALANCE_WORDS_RE.match(t) is not None
+
+_LOOKS_INTIMATE_KEYWORDS = (
+    # Mode / intent
+    "mature", "explicit", "intimate", "nsfw", "adult", "18+",
+    # Common explicit content terms (kept intentionally simple: substring match)
+    "sex", "sexy", "nude", "naked", "porn",
+    "fuck", "fucking", "cock", "dick", "penis", "pussy", "vagina",
+    "blowjob", "oral", "anal", "orgasm", "cum",
+)
+_LOOKS_INTIMATE_RE = re.compile("|".join(re.escape(k) for k in _LOOKS_INTIMATE_KEYWORDS))
 
-    # Or "time" + remaining/left/balance (but avoid generic "time" questions)
-    if re.search(r"\btime\b", t) and re.search(r"\b(remain|remaining|left|balance|used|usage)\b", t):
-        return True
 
-    return False
+# Summaries and history turns get re-checked on every safe-mode turn; memoize short texts.
+# Longer strings (e.g. a joined transcript) bypass the cache to keep its memory bounded.
+_LOOKS_INTIMATE_CACHE_MAX_CHARS = 8192
+
+
+@lru_cache(maxsize=4096)
+def _looks_intimate_cached(text: str) -> bool:
+    return _LOOKS_INTIMATE_RE.search(text.lower()) is not None
+
 
 def _looks_intimate(text: str) -> bool:
-    t = (text or "").lower()
-    return any(
-        k in t
-        for k in [
-            # Mode / intent
-            "mature", "explicit", "intimate", "nsfw", "adult", "18+",
-            # Common explicit content terms (kept intentionally simple: substring match)
-            "sex", "sexy", "nude", "naked", "porn",
-            "fuck", "fucking", "cock", "dick", "penis", "pussy", "vagina",
-            "blowjob", "oral", "anal", "orgasm", "cum",
-        ]
-    )
+    t = text or ""
+    if len(t) > _LOOKS_INTIMATE_CACHE_MAX_CHARS:
+        return _LOOKS_INTIMATE_RE.search(t.lower()) is not None
+    return _looks_intimate_cached(t)
+
+
+def _classify_intent(text: str) -> Dict[str, Any]:
+    """Mode switch, minutes-balance and intimate intent for one user message.
+
+    Lower-cases once and runs each compiled matcher over the same string. The matchers
+    stay separate (rather than one alternation with named groups) because a single
+    leftmost match would lose the explicit-hint and friend > romantic > intimate
+    precedence, and overlapping keywords would hide each other.
+    """
+    t = (text or "").lower().strip()
+    mode = _detect_mode_switch_from_text(t) if t else None
+    return {
+        "mode": mode,
+        "balance": bool(t) and not mode and _is_minutes_balance_question(t),
+        "intimate": _LOOKS_INTIMATE_RE.search(t) is not None,
+    }
 
 
 def _session_state_brand_key_for_mode(session_state: Dict[str, Any]) -> str:
@@ -6003,18 +6182,12 @@ def _parse_companion_meta(raw: Any) -> Dict[str, str]:
       - "Dulce-Female-Hispanic-GenZ|live=stream"
 
     Always returns at least first_name when possible.
+
+    The same key is echoed back on every /chat turn, so the split is memoized by the
+    raw string (as an immutable tuple); callers always get a fresh dict.
     """
     if isinstance(raw, str):
-        base = raw.split("|", 1)[0].strip()
-        parts = [p.strip() for p in base.split("-") if p.strip()]
-        if not parts:
-            return {"first_name": "", "gender": "", "ethnicity": "", "generation": ""}
-
-        first = parts[0]
-        gender = parts[1] if len(parts) >= 2 else ""
-        ethnicity = parts[2] if len(parts) >= 3 else ""
-        generation = "-".join(parts[3:]) if len(parts) >= 4 else ""
-
+        first, gender, ethnicity, generation = _parse_companion_meta_cached(raw)
         return {
             "first_name": first,
             "gender": gender,
@@ -6025,6 +6198,20 @@ def _parse_companion_meta(raw: Any) -> Dict[str, str]:
     return {"first_name": "", "gender": "", "ethnicity": "", "generation": ""}
 
 
+@lru_cache(maxsize=2048)
+def _parse_companion_meta_cached(raw: str) -> Tuple[str, str, str, str]:
+    base = raw.split("|", 1)[0].strip()
+    parts = [p.strip() for p in base.split("-") if p.strip()]
+    if not parts:
+        return ("", "", "", "")
+
+    first = parts[0]
+    gender = parts[1] if len(parts) >= 2 else ""
+    ethnicity = parts[2] if len(parts) >= 3 else ""
+    generation = "-".join(parts[3:]) if len(parts) >= 4 else ""
+    return (first, gender, ethnicity, generation)
+
+
 def _ai_companion_strip_extensions(raw: str) -> str:
     s = str(raw or "").strip()
     if not s:
@@ -6601,7 +6788,12 @@ def _ai_companion_public_payload(brand: str, raw_avatar: str, public_base_url: s
 def _build_persona_system_prompt(session_state: dict, *, mode: str, intimate_allowed: bool) -> str:
     comp = _parse_companion_meta(_extract_companion_raw(session_state))
     name = comp.get("first_name") or _avatar_from_session_state(session_state) or "Elara"
+    return _persona_system_prompt_for(str(name), str(mode or ""), bool(intimate_allowed))
+
 
+# The prompt depends only on (name, mode, intimate_allowed), which repeat turn after turn.
+@lru_cache(maxsize=1024)
+def _persona_system_prompt_for(name: str, mode: str, intimate_allowed: bool) -> str:
     lines = [
         f"You are {name}, an AI companion who is warm, attentive, and emotionally intelligent.",
         "You speak naturally and conversationally.",
@@ -6727,7 +6919,9 @@ def _get_openai_client():
         raise RuntimeError("OPENAI_API_KEY is not set")
 
     with _LLM_CLIENT_LOCK:
-        if _OPENAI_CLIENT is None:
+        # Rebuild only when the key has been rotated; otherwise every call shares one client
+        # (and its warm keep-alive connections).
+        if _OPENAI_CLIENT is None or getattr(_OPENAI_CLIENT, "api_key", api_key) != api_key:
             _OPENAI_CLIENT = _make_openai_client(api_key=api_key)
         return _OPENAI_CLIENT
 
@@ -6742,7 +6936,7 @@ def _get_openai_summary_client(timeout_s: float):
     key = f"{float(timeout_s):.3f}"
     with _LLM_CLIENT_LOCK:
         c = _OPENAI_SUMMARY_CLIENTS.get(key)
-        if c is None:
+        if c is None or getattr(c, "api_key", api_key) != api_key:
             c = _make_openai_client(api_key=api_key, timeout=float(timeout_s))
             _OPENAI_SUMMARY_CLIENTS[key] = c
         return c
@@ -6756,11 +6950,114 @@ def _get_xai_client():
         raise RuntimeError("XAI_API_KEY is not set")
 
     with _LLM_CLIENT_LOCK:
-        if _XAI_CLIENT is None:
+        if _XAI_CLIENT is None or getattr(_XAI_CLIENT, "api_key", api_key) != api_key:
             _XAI_CLIENT = _make_openai_client(api_key=api_key, base_url=_xai_base_url())
         return _XAI_CLIENT
 
 
+@atexit.register
+def _close_llm_clients() -> None:
+    """Close pooled LLM clients (and the shared HTTP pool) at process exit."""
+    with _LLM_CLIENT_LOCK:
+        clients = [_OPENAI_CLIENT, _XAI_CLIENT, *_OPENAI_SUMMARY_CLIENTS.values(), _SHARED_HTTP_CLIENT]
+    for c in clients:
+        try:
+            if c is not None:
+                c.close()
+        except Exception:
+            pass
+
+
+# Async clients for the /chat hot path. They share one httpx.AsyncClient with raised pool
+# limits, so concurrent turns neither hold a threadpool slot for the whole LLM call nor
+# queue behind the SDK's default connection cap.
+_ASYNC_OPENAI_CLIENT = None
+_ASYNC_XAI_CLIENT = None
+_SHARED_ASYNC_HTTP_CLIENT = None
+_LLM_ASYNC_MAX_CONNECTIONS = max(1, _env_int("LLM_ASYNC_MAX_CONNECTIONS", 500))
+_LLM_ASYNC_MAX_KEEPALIVE_CONNECTIONS = max(1, _env_int("LLM_ASYNC_MAX_KEEPALIVE_CONNECTIONS", 200))
+
+
+def _get_shared_async_http_client():
+    """Best-effort shared async httpx client (SDK defaults + raised pool limits)."""
+    global _SHARED_ASYNC_HTTP_CLIENT
+    if _SHARED_ASYNC_HTTP_CLIENT is not None:
+        return _SHARED_ASYNC_HTTP_CLIENT
+
+    try:
+        import httpx  # type: ignore
+        from openai import DefaultAsyncHttpxClient
+
+        _SHARED_ASYNC_HTTP_CLIENT = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=_LLM_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=_LLM_ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+            )
+        )
+        return _SHARED_ASYNC_HTTP_CLIENT
+    except Exception:
+        _SHARED_ASYNC_HTTP_CLIENT = None
+        return None
+
+
+def _make_async_openai_client(*, api_key: str, base_url: Optional[str] = None):
+    from openai import AsyncOpenAI
+
+    kwargs: Dict[str, Any] = {"api_key": api_key}
+    if base_url:
+        kwargs["base_url"] = base_url
+
+    http_client = _get_shared_async_http_client()
+    if http_client is not None:
+        kwargs["http_client"] = http_client
+
+    return AsyncOpenAI(**kwargs)
+
+
+def _get_async_openai_client():
+    global _ASYNC_OPENAI_CLIENT
+
+    api_key = _resolve_openai_api_key()
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+
+    with _LLM_CLIENT_LOCK:
+        if _ASYNC_OPENAI_CLIENT is None or getattr(_ASYNC_OPENAI_CLIENT, "api_key", api_key) != api_key:
+            _ASYNC_OPENAI_CLIENT = _make_async_openai_client(api_key=api_key)
+        return _ASYNC_OPENAI_CLIENT
+
+
+def _get_async_xai_client():
+    global _ASYNC_XAI_CLIENT
+
+    api_key = (os.getenv("XAI_API_KEY", "") or os.getenv("XAI_API_TOKEN", "") or "").strip()
+    if not api_key:
+        raise RuntimeError("XAI_API_KEY is not set")
+
+    with _LLM_CLIENT_LOCK:
+        if _ASYNC_XAI_CLIENT is None or getattr(_ASYNC_XAI_CLIENT, "api_key", api_key) != api_key:
+            _ASYNC_XAI_CLIENT = _make_async_openai_client(api_key=api_key, base_url=_xai_base_url())
+        return _ASYNC_XAI_CLIENT
+
+
+@app.on_event("shutdown")
+async def _close_async_llm_clients() -> None:
+    with _LLM_CLIENT_LOCK:
+        clients = [_ASYNC_OPENAI_CLIENT, _ASYNC_XAI_CLIENT]
+        http_client = _SHARED_ASYNC_HTTP_CLIENT
+    for c in clients:
+        try:
+            if c is not None:
+                await c.close()
+        except Exception:
+            pass
+    try:
+        if http_client is not None:
+            await http_client.aclose()
+    except Exception:
+        pass
+
+
 def _extract_text_from_chat_completion(resp: Any) -> str:
     try:
         return (resp.choices[0].message.content or "").strip()
@@ -6827,13 +7124,81 @@ def _chat_completion_text(
         return _extract_text_from_chat_completion(resp)
 
 
+async def _chat_completion_text_async(
+    client: Any,
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: Optional[int] = None,
+    stream: bool = False,
+) -> str:
+    """Async twin of _chat_completion_text for AsyncOpenAI clients."""
+    params: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "temperature": float(temperature),
+    }
+    if max_tokens is not None:
+        params["max_tokens"] = int(max_tokens)
+
+    if not stream:
+        resp = await client.chat.completions.create(**params)
+        return _extract_text_from_chat_completion(resp)
+
+    # Best-effort streaming: if the provider/SDK rejects stream, fall back to non-stream.
+    try:
+        params["stream"] = True
+        chunks = await client.chat.completions.create(**params)
+        parts: List[str] = []
+        async for ch in chunks:
+            t = _extract_text_from_stream_chunk(ch)
+            if t:
+                parts.append(t)
+        return ("".join(parts) or "").strip()
+    except Exception:
+        resp = await client.chat.completions.create(**{k: v for k, v in params.items() if k != "stream"})
+        return _extract_text_from_chat_completion(resp)
+
+
+# Per-call LLM / prompt-shaping settings, read once at import instead of on every chat
+# turn (changing them needs a restart). A malformed number falls back to its default
+# rather than failing startup.
+_OPENAI_MODEL = (os.getenv("OPENAI_MODEL", "") or "gpt-4o").strip()
+_OPENAI_TEMPERATURE = _perf_opt_env_float("OPENAI_TEMPERATURE", 0.8, max_value=2.0)
+_XAI_MODEL = (os.getenv("XAI_MODEL", "") or "grok-4").strip()
+_XAI_TEMPERATURE = _perf_opt_env_float("XAI_TEMPERATURE", _OPENAI_TEMPERATURE, max_value=2.0)
+_XAI_STREAM = (os.getenv("XAI_STREAM", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+_SAVE_SUMMARY_OPENAI_TIMEOUT_S = _perf_opt_env_float("SAVE_SUMMARY_OPENAI_TIMEOUT_S", 25.0)
+_SAVE_SUMMARY_TEMPERATURE = _perf_opt_env_float("SAVE_SUMMARY_TEMPERATURE", 0.2, max_value=2.0)
+_SAVE_SUMMARY_MAX_TOKENS = _env_int("SAVE_SUMMARY_MAX_TOKENS", 350)
+_SAFE_MODE_SUMMARY_MAX_CHARS = _env_int("SAFE_MODE_SUMMARY_MAX_CHARS", 2500)
+_IN_SESSION_SUMMARY_MAX_ITEMS = _env_int("IN_SESSION_SUMMARY_MAX_ITEMS", 8)
+_LLM_MAX_BODY_MESSAGES = _env_int("LLM_MAX_BODY_MESSAGES", 34)
+_LLM_MAX_BODY_MESSAGES_ON_SWITCH = _env_int("LLM_MAX_BODY_MESSAGES_ON_SWITCH", 22)
+_LLM_MESSAGE_MAX_CHARS = _env_int("LLM_MESSAGE_MAX_CHARS", 4000)
+_ELEVENLABS_MODEL_ID = (os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2") or "").strip() or "eleven_multilingual_v2"
+_ELEVENLABS_OUTPUT_FORMAT = (os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128") or "").strip() or "mp3_44100_128"
+
+
 def _call_gpt4o(messages: List[Dict[str, Any]]) -> str:
     client = _get_openai_client()
     return _chat_completion_text(
         client,
-        model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        model=_OPENAI_MODEL,
+        messages=messages,
+        temperature=_OPENAI_TEMPERATURE,
+        stream=False,
+    )
+
+
+async def _call_gpt4o_async(messages: List[Dict[str, Any]]) -> str:
+    client = _get_async_openai_client()
+    return await _chat_completion_text_async(
+        client,
+        model=_OPENAI_MODEL,
         messages=messages,
-        temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.8") or "0.8"),
+        temperature=_OPENAI_TEMPERATURE,
         stream=False,
     )
 
@@ -6852,10 +7217,10 @@ def _call_gpt4o_with_options(
     legacy wrapper.
     """
     client = _get_openai_client()
-    resolved_temp = float(temperature) if temperature is not None else float(os.getenv("OPENAI_TEMPERATURE", "0.8") or "0.8")
+    resolved_temp = float(temperature) if temperature is not None else _OPENAI_TEMPERATURE
     return _chat_completion_text(
         client,
-        model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        model=_OPENAI_MODEL,
         messages=messages,
         temperature=resolved_temp,
         max_tokens=max_tokens,
@@ -6891,18 +7256,53 @@ def _call_xai_chat(messages: List[Dict[str, Any]]) -> str:
     """Call xAI (OpenAI-compatible) chat completions endpoint."""
     client = _get_xai_client()
 
-    stream_env = (os.getenv("XAI_STREAM", "1") or "1").strip().lower()
-    use_stream = stream_env not in ("0", "false", "no", "off")
-
     return _chat_completion_text(
         client,
-        model=(os.getenv("XAI_MODEL", "") or "grok-4").strip(),
+        model=_XAI_MODEL,
+        messages=messages,
+        temperature=_XAI_TEMPERATURE,
+        stream=_XAI_STREAM,
+    )
+
+
+async def _call_xai_chat_async(messages: List[Dict[str, Any]]) -> str:
+    """Async xAI chat call used by /chat (same settings as _call_xai_chat)."""
+    client = _get_async_xai_client()
+
+    return await _chat_completion_text_async(
+        client,
+        model=_XAI_MODEL,
         messages=messages,
-        temperature=float(os.getenv("XAI_TEMPERATURE", os.getenv("OPENAI_TEMPERATURE", "0.8")) or "0.8"),
-        stream=use_stream,
+        temperature=_XAI_TEMPERATURE,
+        stream=_XAI_STREAM,
     )
 
 
+_IN_SESSION_SUMMARY_KEYS = (
+    "conversation_summaries",
+    "conversationSummaries",
+    "chat_summaries",
+    "chatSummaries",
+    "summaries",
+    "summary_chunks",
+    "summaryChunks",
+)
+
+
+def _summary_item_text(item: Any) -> str:
+    if isinstance(item, dict):
+        item = item.get("summary") or item.get("text") or item.get("content")
+    return item.strip() if isinstance(item, str) else ""
+
+
+def _iter_summary_texts(v: Any):
+    if isinstance(v, list):
+        for item in v:
+            yield _summary_item_text(item)
+    else:
+        yield _summary_item_text(v)
+
+
 def _extract_in_session_summaries(session_state: Dict[str, Any]) -> List[str]:
     """Extract any in-session summaries provided by the frontend/state machine.
 
@@ -6911,55 +7311,19 @@ def _extract_in_session_summaries(session_state: Dict[str, Any]) -> List[str]:
     if not isinstance(session_state, dict):
         return []
 
-    keys = [
-        "conversation_summaries",
-        "conversationSummaries",
-        "chat_summaries",
-        "chatSummaries",
-        "summaries",
-        "summary_chunks",
-        "summaryChunks",
-    ]
-
-    out: List[str] = []
-    for k in keys:
-        v = session_state.get(k)
-        if not v:
-            continue
-
-        if isinstance(v, str):
-            s = v.strip()
-            if s:
-                out.append(s)
-            continue
-
-        if isinstance(v, dict):
-            s = v.get("summary") or v.get("text") or v.get("content")
-            if isinstance(s, str) and s.strip():
-                out.append(s.strip())
-            continue
-
-        if isinstance(v, list):
-            for item in v:
-                if isinstance(item, str):
-                    s = item.strip()
-                    if s:
-                        out.append(s)
-                elif isinstance(item, dict):
-                    s = item.get("summary") or item.get("text") or item.get("content")
-                    if isinstance(s, str) and s.strip():
-                        out.append(s.strip())
-
     # De-dupe while preserving order (most recent items are typically appended last)
-    seen: Set[str] = set()
-    deduped: List[str] = []
-    for s in out:
-        if s in seen:
-            continue
-        seen.add(s)
-        deduped.append(s)
+    deduped: List[str] = list(
+        dict.fromkeys(
+            s
+            for k in _IN_SESSION_SUMMARY_KEYS
+            for v in (session_state.get(k),)
+            if v
+            for s in _iter_summary_texts(v)
+            if s
+        )
+    )
 
-    max_items = int(os.getenv("IN_SESSION_SUMMARY_MAX_ITEMS", "8") or "8")
+    max_items = _IN_SESSION_SUMMARY_MAX_ITEMS
     if max_items > 0 and len(deduped) > max_items:
         deduped = deduped[-max_items:]
     return deduped
@@ -6969,6 +7333,8 @@ def _sanitize_summary_for_safe_mode(text: str) -> str:
     """Sanitize a summary for Start/Grow (OpenAI) context.
 
     If the summary appears intimate/explicit, replace it with a high-level, non-explicit note.
+    The same summaries come back on every turn; the expensive part (the intimate check) is
+    memoized inside _looks_intimate, while the cheap length cap is applied per call.
     """
     t = (text or "").strip()
     if not t:
@@ -6979,7 +7345,7 @@ def _sanitize_summary_for_safe_mode(text: str) -> str:
             "Details are intentionally omitted in Start/Grow mode."
         )
 
-    max_chars = int(os.getenv("SAFE_MODE_SUMMARY_MAX_CHARS", "2500") or "2500")
+    max_chars = _SAFE_MODE_SUMMARY_MAX_CHARS
     if max_chars > 0 and len(t) > max_chars:
         t = t[:max_chars] + " …"
     return t
@@ -6993,6 +7359,8 @@ _PLATFORM_ATTACHMENT_BLOCK_RE = re.compile(
 _PLATFORM_DELIVERY_LINE_RE = re.compile(
     r'(?im)^\s*Delivering\s+(?:Photo|Video|content|scheduled\s+content|requested\s+human\s+companion\s+photo)[^\n]*$'
 )
+_PLATFORM_LINK_REMOVED_LINE_RE = re.compile(r'(?im)^\s*\[platform content link removed\]\s*$')
+_BLANK_LINE_RUN_RE = re.compile(r'\n{3,}')
 _PLATFORM_FILENAME_IN_TEXT_RE = re.compile(
     r'(?im)(?:^|\n)\s*(?:Attachment|File(?:\s+name)?)\s*:\s*([^\n]+)$'
 )
@@ -7058,8 +7426,8 @@ def _sanitize_platform_content_text(text: str) -> Tuple[str, bool]:
     t = _PLATFORM_ATTACHMENT_BLOCK_RE.sub("\n", t)
     t = _PLATFORM_CONTENT_URL_RE.sub("[platform content link removed]", t)
     t = _PLATFORM_DELIVERY_LINE_RE.sub("", t)
-    t = re.sub(r'(?im)^\s*\[platform content link removed\]\s*$', "", t)
-    t = re.sub(r'\n{3,}', "\n\n", t).strip()
+    t = _PLATFORM_LINK_REMOVED_LINE_RE.sub("", t)
+    t = _BLANK_LINE_RUN_RE.sub("\n\n", t).strip()
 
     return t, (t != original.strip())
 
@@ -7207,12 +7575,19 @@ def _attachment_file_ext(value: str) -> str:
     return '.' + base.rsplit('.', 1)[-1].lower()
 
 
+_IMAGE_ATTACHMENT_SUFFIXES = tuple(sorted(_IMAGE_ATTACHMENT_EXTS))
+
+
 def _attachment_looks_like_image(name: str, url: str) -> bool:
-    for candidate in (name, url):
-        ext = _attachment_file_ext(candidate)
-        if ext and ext in _IMAGE_ATTACHMENT_EXTS:
+    # A plain file name (no scheme/query/fragment) needs no urlparse: one C-level
+    # endswith over the suffix tuple decides it.
+    probe = str(name or '').strip()
+    if probe and not any(ch in probe for ch in '?#:'):
+        if probe.lower().endswith(_IMAGE_ATTACHMENT_SUFFIXES):
             return True
-    return False
+    elif _attachment_file_ext(probe) in _IMAGE_ATTACHMENT_EXTS:
+        return True
+    return _attachment_file_ext(url) in _IMAGE_ATTACHMENT_EXTS
 
 
 def _extract_user_attachments_from_text(content: str) -> Tuple[str, List[Dict[str, str]]]:
@@ -7220,17 +7595,22 @@ def _extract_user_attachments_from_text(content: str) -> Tuple[str, List[Dict[st
     if not raw:
         return '', []
 
+    text = raw.replace('\r\n', '\n').replace('\r', '\n')
     attachments: List[Dict[str, str]] = []
-
-    def _repl(match) -> str:
-        name = str(match.group(1) or '').strip()
+    # Stitch the kept slices in one walk over the matches (no per-match callback).
+    pieces: List[str] = []
+    cursor = 0
+    for match in _USER_ATTACHMENT_BLOCK_RE.finditer(text):
         url = str(match.group(2) or '').strip()
         if url:
-            attachments.append({'name': name, 'url': url})
-        return '\n'
-
-    cleaned = _USER_ATTACHMENT_BLOCK_RE.sub(_repl, raw.replace('\r\n', '\n').replace('\r', '\n'))
-    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned).strip()
+            attachments.append({'name': str(match.group(1) or '').strip(), 'url': url})
+        pieces.append(text[cursor:match.start()])
+        pieces.append('\n')
+        cursor = match.end()
+    if not pieces:
+        return _BLANK_LINE_RUN_RE.sub('\n\n', text).strip(), attachments
+    pieces.append(text[cursor:])
+    cleaned = _BLANK_LINE_RUN_RE.sub('\n\n', ''.join(pieces)).strip()
     return cleaned, attachments
 
 
@@ -7365,15 +7745,17 @@ def _llm_message_content_has_image_input(content: Any) -> bool:
 
 
 def _llm_messages_have_user_image_input(messages: List[Dict[str, Any]]) -> bool:
-    for m in messages or []:
-        if str(m.get("role") or "").strip().lower() != "user":
-            continue
-        try:
-            if _llm_message_content_has_image_input(m.get("content")):
-                return True
-        except Exception:
-            continue
-    return False
+    # Plain-string contents (nearly every message) are skipped before any per-part work;
+    # any() stops at the first user message carrying an image part.
+    try:
+        return any(
+            isinstance(m.get("content"), list)
+            and str(m.get("role") or "").strip().lower() == "user"
+            and _llm_message_content_has_image_input(m["content"])
+            for m in messages or []
+        )
+    except Exception:
+        return False
 
 
 def _sanitize_assistant_reply_for_image_policy(text: str, *, had_image_input: bool) -> str:
@@ -7414,6 +7796,14 @@ def _filter_history_for_safe_mode(messages: List[Dict[str, str]]) -> Tuple[List[
     if not messages:
         return messages, None
 
+    # Common case: nothing intimate anywhere. One scan over the joined transcript
+    # (a per-message hit is always a hit on the join) avoids the per-message loop.
+    transcript = "\n".join(
+        str(m.get("content") or "") for m in messages if m.get("role") in ("user", "assistant")
+    )
+    if not _looks_intimate(transcript):
+        return messages, None
+
     kept: List[Dict[str, str]] = []
     omitted = 0
 
@@ -7463,9 +7853,9 @@ def _compact_llm_messages(messages: List[Dict[str, Any]], *, provider_switched:
     if not messages:
         return messages
 
-    max_body = int(os.getenv("LLM_MAX_BODY_MESSAGES", "34") or "34")
-    max_body_on_switch = int(os.getenv("LLM_MAX_BODY_MESSAGES_ON_SWITCH", "22") or "22")
-    max_chars = int(os.getenv("LLM_MESSAGE_MAX_CHARS", "4000") or "4000")
+    max_body = _LLM_MAX_BODY_MESSAGES
+    max_body_on_switch = _LLM_MAX_BODY_MESSAGES_ON_SWITCH
+    max_chars = _LLM_MESSAGE_MAX_CHARS
 
     n_keep = max_body_on_switch if provider_switched else max_body
     if n_keep <= 0:
@@ -7510,15 +7900,14 @@ def _compact_llm_messages(messages: List[Dict[str, Any]], *, provider_switched:
 
 def _call_gpt4o_summary(messages: List[Dict[str, str]]) -> str:
     """Summarization call with conservative limits for reliability."""
-    timeout_s = float(os.getenv("SAVE_SUMMARY_OPENAI_TIMEOUT_S", "25") or "25")
-    client = _get_openai_summary_client(timeout_s)
+    client = _get_openai_summary_client(_SAVE_SUMMARY_OPENAI_TIMEOUT_S)
 
     return _chat_completion_text(
         client,
-        model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        model=_OPENAI_MODEL,
         messages=messages,
-        temperature=float(os.getenv("SAVE_SUMMARY_TEMPERATURE", "0.2") or "0.2"),
-        max_tokens=int(os.getenv("SAVE_SUMMARY_MAX_TOKENS", "350") or "350"),
+        temperature=_SAVE_SUMMARY_TEMPERATURE,
+        max_tokens=_SAVE_SUMMARY_MAX_TOKENS,
         stream=False,
     )
 
@@ -7920,6 +8309,20 @@ def _assistant_display_text(reply: str, translation_ctx: Dict[str, Any]) -> Tupl
     return _display_text_and_translation_payload(reply, translation_ctx)
 
 
+def _display_text_needs_translation(text: str, translation_ctx: Dict[str, Any]) -> bool:
+    """True when _display_text_and_translation_payload would call the translator.
+
+    Everything else (empty text, translator off, English user) is pure string work
+    and can run inline instead of on the threadpool.
+    """
+    if not str(text or "").strip():
+        return False
+    if not bool((translation_ctx or {}).get("enabled")):
+        return False
+    user_code = str((translation_ctx or {}).get("user_language_code") or "").strip()
+    return bool(user_code) and not _is_english_language(user_code)
+
+
 @app.post("/translation/text")
 async def translation_text(raw: Dict[str, Any] = Body(...)):
     text_in = str(raw.get("text") or raw.get("content") or "").strip()
@@ -8070,6 +8473,20 @@ _PUBLIC_SITE_MAX_BYTES = int(os.getenv("PUBLIC_SITE_MAX_BYTES", "1500000") or "1
 _PUBLIC_SITE_MAX_CHARS_FOR_SUMMARY = int(os.getenv("PUBLIC_SITE_MAX_CHARS_FOR_SUMMARY", "25000") or "25000")
 _PUBLIC_SITE_REFERENCE_MAX_PAGES = int(os.getenv("PUBLIC_SITE_REFERENCE_MAX_PAGES", "6") or "6")
 
+# Public-site HTML scraping patterns (compiled once; used on every fetched page).
+# Script/style/noscript blocks and ordinary tags stripped in one left-to-right pass.
+_PUBLIC_SITE_MARKUP_RE = re.compile(r"(?is)<(script|style|noscript)[^>]*>.*?</\1>|<[^>]+>")
+_PUBLIC_SITE_WS_RE = re.compile(r"\s+")
+_PUBLIC_SITE_TITLE_RE = re.compile(r"(?is)<title[^>]*>(.*?)</title>")
+_PUBLIC_SITE_META_DESC_RE = re.compile(r'(?is)<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']')
+_PUBLIC_SITE_HREF_RE = re.compile(r'(?is)href=["\']([^"\']+)["\']')
+
+# Guideline reference pages are fetched + summarized concurrently (separate pool so a
+# page summary never waits on a slot held by its own caller).
+_PUBLIC_SITE_SUMMARY_POOL = ThreadPoolExecutor(
+    max_workers=max(1, _PUBLIC_SITE_REFERENCE_MAX_PAGES), thread_name_prefix="public-site-summary"
+)
+
 # In-memory cache for onboarding + public site system blocks.
 # This avoids repeated SQLite reads + string building on every turn.
 _HCO_BLOCKS_CACHE_TTL_S = int(os.getenv("HCO_BLOCKS_CACHE_TTL_S", "300") or "300")
@@ -8154,7 +8571,77 @@ def _column_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
         return False
 
 
-def _fetch_onboarding_join_for_avatar_sync(avatar: str) -> Optional[Dict[str, Any]]:
+# Shared read connection for the onboarding join. Reopened when the DB path or file
+# changes; the FK join column is remembered once found (columns are only ever added).
+_HCO_READ_CONN: Optional[sqlite3.Connection] = None
+_HCO_READ_CONN_KEY: Optional[Tuple[str, int]] = None
+_HCO_READ_JOIN_COL: Dict[str, str] = {}
+_HCO_READ_LOCK = threading.Lock()
+
+
+def _hco_read_conn_locked(db_path: str) -> sqlite3.Connection:
+    """Return the shared onboarding read connection. Caller holds _HCO_READ_LOCK."""
+    global _HCO_READ_CONN, _HCO_READ_CONN_KEY
+    key = (db_path, os.stat(db_path).st_ino)
+    if _HCO_READ_CONN is None or _HCO_READ_CONN_KEY != key:
+        _hco_read_conn_reset_locked()
+        # Plain tuple rows: the join result is zipped straight into a dict (see below).
+        conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        _HCO_READ_CONN, _HCO_READ_CONN_KEY = conn, key
+    return _HCO_READ_CONN
+
+
+def _hco_read_conn_reset_locked() -> None:
+    global _HCO_READ_CONN, _HCO_READ_CONN_KEY
+    if _HCO_READ_CONN is not None:
+        try:
+            _HCO_READ_CONN.close()
+        except Exception:
+            pass
+    _HCO_READ_CONN, _HCO_READ_CONN_KEY = None, None
+    _HCO_READ_JOIN_COL.clear()
+
+
+# Onboarding joins per avatar (None included: most AI companions have no onboarding row).
+# Shared by the HCO system blocks and the guideline reference-site lookup, whose own caches
+# would otherwise each re-run the join on a miss. Its TTL is kept well below the HCO blocks
+# TTL because those blocks are built from it (staleness stacks). Cleared, together with the
+# HCO blocks, when an onboarding row is upserted or companion mappings are written/reloaded.
+_ONBOARDING_JOIN_CACHE: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+_ONBOARDING_JOIN_CACHE_MAX = 1024
+_ONBOARDING_JOIN_CACHE_TTL_S = _perf_opt_env_float("ONBOARDING_JOIN_CACHE_TTL_S", 60.0, max_value=600.0)
+_ONBOARDING_JOIN_CACHE_LOCK = threading.Lock()
+
+
+def _onboarding_join_cache_clear() -> None:
+    """Drop cached onboarding joins and the HCO system blocks derived from them."""
+    with _ONBOARDING_JOIN_CACHE_LOCK:
+        _ONBOARDING_JOIN_CACHE.clear()
+    with _HCO_BLOCKS_CACHE_LOCK:
+        _HCO_BLOCKS_CACHE.clear()
+
+
+def _fetch_onboarding_join_for_avatar_sync(avatar: str) -> Optional[Dict[str, Any]]:
+    """TTL-cached _fetch_onboarding_join_for_avatar_uncached_sync (ONBOARDING_JOIN_CACHE_TTL_S)."""
+    a = (avatar or "").strip()
+    if not a:
+        return None
+    key = a.lower()
+    now = time.time()
+    with _ONBOARDING_JOIN_CACHE_LOCK:
+        ent = _ONBOARDING_JOIN_CACHE.get(key)
+    if ent and (now - ent[0]) < float(_ONBOARDING_JOIN_CACHE_TTL_S):
+        return dict(ent[1]) if ent[1] is not None else None
+
+    joined = _fetch_onboarding_join_for_avatar_uncached_sync(a)
+    with _ONBOARDING_JOIN_CACHE_LOCK:
+        if len(_ONBOARDING_JOIN_CACHE) >= _ONBOARDING_JOIN_CACHE_MAX:
+            _ONBOARDING_JOIN_CACHE.clear()
+        _ONBOARDING_JOIN_CACHE[key] = (now, dict(joined) if joined is not None else None)
+    return joined
+
+
+def _fetch_onboarding_join_for_avatar_uncached_sync(avatar: str) -> Optional[Dict[str, Any]]:
     """Fetch the latest onboarding row for the given avatar (companionName).
 
     Primary path (preferred):
@@ -8178,71 +8665,83 @@ def _fetch_onboarding_join_for_avatar_sync(avatar: str) -> Optional[Dict[str, An
     if not re.match(r"^[A-Za-z0-9_]+$", mapping_table):
         mapping_table = "companion_mappings"
 
-    conn: Optional[sqlite3.Connection] = None
-    try:
-        conn = sqlite3.connect(db_path, timeout=10)
-        conn.row_factory = sqlite3.Row
+    with _HCO_READ_LOCK:
+        try:
+            conn = _hco_read_conn_locked(db_path)
 
-        if not _table_exists(conn, mapping_table) or not _table_exists(conn, _HCO_TABLE):
-            return None
+            mapping_join_col = _HCO_READ_JOIN_COL.get(mapping_table, "")
+            if not mapping_join_col:
+                if not _table_exists(conn, mapping_table) or not _table_exists(conn, _HCO_TABLE):
+                    return None
 
-        has_hco_companion_id = _column_exists(conn, _HCO_TABLE, "companion_id")
-        mapping_join_col = "companion_id" if _column_exists(conn, mapping_table, "companion_id") else ("id" if _column_exists(conn, mapping_table, "id") else "")
-        use_fk = bool(has_hco_companion_id and mapping_join_col)
+                has_hco_companion_id = _column_exists(conn, _HCO_TABLE, "companion_id")
+                mapping_join_col = "companion_id" if _column_exists(conn, mapping_table, "companion_id") else ("id" if _column_exists(conn, mapping_table, "id") else "")
+                if not has_hco_companion_id:
+                    mapping_join_col = ""
+                elif mapping_join_col:
+                    _HCO_READ_JOIN_COL[mapping_table] = mapping_join_col
+            use_fk = bool(mapping_join_col)
 
-        cur = conn.cursor()
-        if use_fk:
-            cur.execute(
-                f"""
-                SELECT  b.brand,
-                        b.avatar,
-                        b.companion_type,
-                        b.phonetic AS mapping_phonetic,
-                        b.eleven_voice_id,
-                        a.*
-                FROM    {_HCO_TABLE} a,
-                        {mapping_table} b
-                WHERE   a.companion_id = b.{mapping_join_col}
-                  AND   lower(b.avatar) = lower(?)
-                ORDER BY COALESCE(a.ingested_at, 0) DESC,
-                         COALESCE(a.created_date, '') DESC
-                LIMIT 1;
-                """,
-                (a,),
-            )
-        else:
-            # Fallback to name match (useful if onboarding table doesn't yet have companion_id)
-            cur.execute(
-                f"""
-                SELECT  b.brand,
-                        b.avatar,
-                        b.companion_type,
-                        b.phonetic AS mapping_phonetic,
-                        b.eleven_voice_id,
-                        a.*
-                FROM    {_HCO_TABLE} a,
-                        {mapping_table} b
-                WHERE   lower(a.first_name) = lower(?)
-                  AND   lower(b.avatar) = lower(?)
-                ORDER BY COALESCE(a.ingested_at, 0) DESC,
-                         COALESCE(a.created_date, '') DESC
-                LIMIT 1;
-                """,
-                (a, a),
-            )
+            cur = conn.cursor()
+            if use_fk:
+                cur.execute(
+                    f"""
+                    SELECT  b.brand,
+                            b.avatar,
+                            b.companion_type,
+                            b.phonetic AS mapping_phonetic,
+                            b.eleven_voice_id,
+                            a.*
+                    FROM    {_HCO_TABLE} a,
+                            {mapping_table} b
+                    WHERE   a.companion_id = b.{mapping_join_col}
+                      AND   lower(b.avatar) = lower(?)
+                    ORDER BY COALESCE(a.ingested_at, 0) DESC,
+                             COALESCE(a.created_date, '') DESC
+                    LIMIT 1;
+                    """,
+                    (a,),
+                )
+            else:
+                # Fallback to name match (useful if onboarding table doesn't yet have companion_id)
+                cur.execute(
+                    f"""
+                    SELECT  b.brand,
+                            b.avatar,
+                            b.companion_type,
+                            b.phonetic AS mapping_phonetic,
+                            b.eleven_voice_id,
+                            a.*
+                    FROM    {_HCO_TABLE} a,
+                            {mapping_table} b
+                    WHERE   lower(a.first_name) = lower(?)
+                      AND   lower(b.avatar) = lower(?)
+                    ORDER BY COALESCE(a.ingested_at, 0) DESC,
+                             COALESCE(a.created_date, '') DESC
+                    LIMIT 1;
+                    """,
+                    (a, a),
+                )
 
-        row = cur.fetchone()
-        return dict(row) if row else None
+            row = cur.fetchone()
+            cols = [d[0] for d in (cur.description or ())]
+            # Release the statement so the shared connection holds no read snapshot.
+            cur.close()
+            if not row:
+                return None
+            # Build the dict in one pass rather than via sqlite3.Row + dict(row), which
+            # resolves every column by name. Callers rely on dict semantics
+            # (.get, key membership), so a Row is not returned directly. First column
+            # wins on duplicate names (b.* before a.*), matching dict(row).
+            out: Dict[str, Any] = {}
+            for k, v in zip(cols, row):
+                out.setdefault(k, v)
+            return out
 
-    except Exception as e:
-        print(f"[hco] join query failed: {type(e).__name__}: {e}")
-        return None
-    finally:
-        try:
-            if conn:
-                conn.close()
-        except Exception:
-            pass
+        except Exception as e:
+            print(f"[hco] join query failed: {type(e).__name__}: {e}")
+            _hco_read_conn_reset_locked()
+            return None
 
 
 def _pick_first(row: Dict[str, Any], *keys: str) -> str:
@@ -8254,6 +8753,32 @@ def _pick_first(row: Dict[str, Any], *keys: str) -> str:
     return ""
 
 
+# (label, candidate column names) for the onboarding guidance bullets, in output order.
+# Be tolerant: each field tries multiple candidate column names.
+_ONBOARDING_PRONUNCIATION_KEYS: Tuple[str, ...] = (
+    "phonetic_pronunciation_of_first_name", "Phonetic pronunciation of first name", "mapping_phonetic",
+)
+_ONBOARDING_FIELDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("Pronunciation / phonetic", _ONBOARDING_PRONUNCIATION_KEYS),
+    ("Relationship intent", ("relationship_intent", "Relationship Intent")),
+    ("Pace preferences", ("pace_preferences", "Pace preferences")),
+    ("Comfort with humor/flirting", ("comfort_with_humor_or_flirting", "Comfort with humor or flirting")),
+    ("Reply length preference", ("do_you_prefer_short_replies_or_longer_conversations", "Do you prefer short replies or longer conversations?")),
+    ("Do you ask questions often?", ("do_you_ask_questions_often_when_getting_to_know_someone", "Do you ask questions often when getting to know someone?")),
+    ("How you show interest", ("how_do_you_usually_show_interest", "How do you usually show interest?")),
+    ("Enjoyed topics", ("what_topics_do_you_enjoy_talking_about", "What topics do you enjoy talking about?")),
+    ("Avoid early topics", ("what_topics_do_you_avoid_early_on", "What topics do you avoid early on?")),
+    ("Topics requiring trust", ("topics_that_require_trust", "Topics that require trust")),
+    ("Off-limits topics", ("topics_that_are_off_limits", "Topics that are off-limits")),
+    ("If someone shares something personal", ("someone_shares_something_personal", "Someone shares something personal?")),
+    ("Handling disagreements", ("theres_a_disagreement", "There’s a disagreement?")),
+    ("If you feel a connection", ("you_feel_a_connection", "You feel a connection?")),
+    ("Values in a connection", ("three_things_that_matter_most_to_you_in_a_connection", "Three things that matter most to you in a connection")),
+    ("Time zone", ("time_zone", "Time zone")),
+    ("3 words that describe you", ("three_words_that_describe_you", "Three words that describe you")),
+)
+
+
 def _build_onboarding_system_block(joined: Dict[str, Any]) -> str:
     """Build a concise internal guidance block for the representative AI.
 
@@ -8261,47 +8786,28 @@ def _build_onboarding_system_block(joined: Dict[str, Any]) -> str:
     """
     avatar = _pick_first(joined, "avatar", "first_name") or "Companion"
 
-    def f(*cand: str) -> str:
-        return _pick_first(joined, *cand)
-
-    bullets: list[tuple[str, str]] = []
-    add = lambda label, *cand: bullets.append((label, f(*cand)))
-
-    # Be tolerant: attempt multiple candidate column names
-    add("Pronunciation / phonetic", "phonetic_pronunciation_of_first_name", "Phonetic pronunciation of first name", "mapping_phonetic")
-    add("Relationship intent", "relationship_intent", "Relationship Intent")
-    add("Pace preferences", "pace_preferences", "Pace preferences")
-    add("Comfort with humor/flirting", "comfort_with_humor_or_flirting", "Comfort with humor or flirting")
-    add("Reply length preference", "do_you_prefer_short_replies_or_longer_conversations", "Do you prefer short replies or longer conversations?")
-    add("Do you ask questions often?", "do_you_ask_questions_often_when_getting_to_know_someone", "Do you ask questions often when getting to know someone?")
-    add("How you show interest", "how_do_you_usually_show_interest", "How do you usually show interest?")
-    add("Enjoyed topics", "what_topics_do_you_enjoy_talking_about", "What topics do you enjoy talking about?")
-    add("Avoid early topics", "what_topics_do_you_avoid_early_on", "What topics do you avoid early on?")
-    add("Topics requiring trust", "topics_that_require_trust", "Topics that require trust")
-    add("Off-limits topics", "topics_that_are_off_limits", "Topics that are off-limits")
-    add("If someone shares something personal", "someone_shares_something_personal", "Someone shares something personal?")
-    add("Handling disagreements", "theres_a_disagreement", "There’s a disagreement?")
-    add("If you feel a connection", "you_feel_a_connection", "You feel a connection?")
-    add("Values in a connection", "three_things_that_matter_most_to_you_in_a_connection", "Three things that matter most to you in a connection")
-    add("Time zone", "time_zone", "Time zone")
-    add("3 words that describe you", "three_words_that_describe_you", "Three words that describe you")
-
     lines = [
         f"AI Representative onboarding context for {avatar} (internal guidance):",
         f"You are speaking *as* {avatar}. Use these preferences as style/boundary guidance.",
         "Do NOT mention forms/SQLite/imports. Do NOT quote these bullets verbatim.",
     ]
 
-    pronunciation = f("phonetic_pronunciation_of_first_name", "Phonetic pronunciation of first name", "mapping_phonetic")
+    pronunciation = _pick_first(joined, *_ONBOARDING_PRONUNCIATION_KEYS)
     if pronunciation:
         lines.append(
             f"Pronunciation rule: pronounce {avatar} as {pronunciation} in spoken replies/TTS. "
             "Do not keep repeating the phonetic spelling to the user unless they ask how the name is pronounced."
         )
 
-    for label, val in bullets:
-        if val:
-            lines.append(f"- {label}: {val}")
+    for label, cand in _ONBOARDING_FIELDS:
+        for k in cand:
+            v = joined.get(k)
+            if v is None:
+                continue
+            val = str(v).strip()
+            if val:
+                lines.append(f"- {label}: {val}")
+                break
 
     # If nothing meaningful, skip injection
     if len(lines) <= 3:
@@ -8317,13 +8823,24 @@ def _ensure_public_site_cache_table(conn: sqlite3.Connection) -> None:
         CREATE TABLE IF NOT EXISTS {_PUBLIC_SITE_CACHE_TABLE} (
             url TEXT PRIMARY KEY,
             fetched_at INTEGER,
-            summary TEXT
+            summary TEXT,
+            content_sha TEXT
         );
         """
     )
+    if not _column_exists(conn, _PUBLIC_SITE_CACHE_TABLE, "content_sha"):
+        cur.execute(f"ALTER TABLE {_PUBLIC_SITE_CACHE_TABLE} ADD COLUMN content_sha TEXT")
     conn.commit()
 
 
+def _public_site_content_sha(avatar: str, text: str) -> str:
+    """Fingerprint of the summarizer input; an unchanged page can reuse its summary."""
+    h = hashlib.sha256((avatar or "").strip().lower().encode("utf-8"))
+    h.update(b"|")
+    h.update((text or "").encode("utf-8"))
+    return h.hexdigest()
+
+
 def _safe_url(url: str) -> str:
     u = (url or "").strip()
     if not u:
@@ -8338,6 +8855,13 @@ def _safe_url(url: str) -> str:
         return ""
 
 
+# Link keywords that mark high-signal internal pages; a href scores one point per hit.
+_PUBLIC_SITE_LINK_KEYWORDS: Tuple[str, ...] = (
+    "faq", "faqs", "connect", "campaign", "live", "stream", "store", "bonus",
+    "about", "bio", "press", "media", "services", "work", "story", "profile",
+)
+
+
 def _extract_links(html: str, base_url: str) -> list[str]:
     """Extract a few same-origin, high-signal links (about/bio/press/etc)."""
     from urllib.parse import urljoin, urlparse
@@ -8345,22 +8869,16 @@ def _extract_links(html: str, base_url: str) -> list[str]:
     base = urlparse(base_url)
     host = (base.netloc or "").lower()
 
-    hrefs = re.findall(r'(?is)href=["\']([^"\']+)["\']', html or "")
-    out: list[str] = []
+    hrefs = _PUBLIC_SITE_HREF_RE.findall(html or "")
     seen: set[str] = set()
 
-    keywords = ["faq", "faqs", "connect", "campaign", "live", "stream", "store", "bonus", "about", "bio", "press", "media", "services", "work", "story", "profile"]
-
-    def score(h: str) -> int:
-        s = h.lower()
-        return sum(1 for k in keywords if k in s)
-
-    candidates: list[str] = []
+    # (score, url); each URL is lower-cased once and scored against the keyword tuple.
+    candidates: list[tuple[int, str]] = []
     for h in hrefs:
         h = (h or "").strip()
         if not h:
             continue
-        if h.startswith("mailto:") or h.startswith("tel:") or h.startswith("javascript:"):
+        if h.startswith(("mailto:", "tel:", "javascript:")):
             continue
         full = urljoin(base_url, h)
         try:
@@ -8375,46 +8893,72 @@ def _extract_links(html: str, base_url: str) -> list[str]:
         if full in seen:
             continue
         seen.add(full)
-        candidates.append(full)
+        sl = full.lower()
+        candidates.append((sum(k in sl for k in _PUBLIC_SITE_LINK_KEYWORDS), full))
 
-    candidates.sort(key=score, reverse=True)
-    for c in candidates:
-        if len(out) >= max(0, _PUBLIC_SITE_MAX_PAGES - 1):
-            break
-        out.append(c)
-    return out
+    # nlargest keeps the original order among equal scores, like a stable reverse sort.
+    top = heapq.nlargest(max(0, _PUBLIC_SITE_MAX_PAGES - 1), candidates, key=lambda c: c[0])
+    return [full for _, full in top]
 
 
 def _html_to_text(html: str) -> str:
     from html import unescape
 
-    # Remove scripts/styles/noscript blocks
-    html = re.sub(r"(?is)<(script|style|noscript)[^>]*>.*?</\1>", " ", html or "")
-    # Strip tags
-    text = re.sub(r"(?is)<[^>]+>", " ", html)
-    text = unescape(text)
-    text = re.sub(r"\s+", " ", text).strip()
+    # Remove scripts/styles/noscript blocks and strip tags in a single pass
+    text = _PUBLIC_SITE_MARKUP_RE.sub(" ", html or "")
+    if "&" in text:
+        text = unescape(text)
+    text = _PUBLIC_SITE_WS_RE.sub(" ", text).strip()
     return text
 
 
+_PUBLIC_SITE_HTTP_SESSION: Any = None
+_PUBLIC_SITE_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def _public_site_http_session() -> Any:
+    """Shared keep-alive session for public-site scraping (one TLS handshake per host)."""
+    global _PUBLIC_SITE_HTTP_SESSION
+    if _PUBLIC_SITE_HTTP_SESSION is not None:
+        return _PUBLIC_SITE_HTTP_SESSION
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+
+    with _PUBLIC_SITE_HTTP_SESSION_LOCK:
+        if _PUBLIC_SITE_HTTP_SESSION is None:
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            sess.mount("http://", adapter)
+            sess.mount("https://", adapter)
+            sess.headers.update(
+                {
+                    "User-Agent": "Mozilla/5.0 (compatible; ElaraloBot/1.0)",
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                }
+            )
+            _PUBLIC_SITE_HTTP_SESSION = sess
+    return _PUBLIC_SITE_HTTP_SESSION
+
+
 def _fetch_url_html(url: str) -> str:
     u = _safe_url(url)
     if not u:
         return ""
     try:
-        r = requests.get(
-            u,
-            timeout=_PUBLIC_SITE_FETCH_TIMEOUT_S,
-            headers={
-                "User-Agent": "Mozilla/5.0 (compatible; ElaraloBot/1.0)",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            },
-        )
-        if not r.ok:
-            return ""
-        raw = r.content[: max(1, _PUBLIC_SITE_MAX_BYTES)]
+        cap = max(1, _PUBLIC_SITE_MAX_BYTES)
+        # Stream the body and stop at the byte cap instead of downloading oversized pages.
+        with _public_site_http_session().get(u, timeout=_PUBLIC_SITE_FETCH_TIMEOUT_S, stream=True) as r:
+            if not r.ok:
+                return ""
+            buf = bytearray()
+            for chunk in r.iter_content(65536):
+                buf.extend(chunk)
+                if len(buf) >= cap:
+                    break
+            encoding = r.encoding
+        raw = bytes(buf[:cap])
         try:
-            return raw.decode(r.encoding or "utf-8", errors="replace")
+            return raw.decode(encoding or "utf-8", errors="replace")
         except Exception:
             return raw.decode("utf-8", errors="replace")
     except Exception:
@@ -8433,22 +8977,38 @@ def _collect_public_site_text(url: str) -> str:
 
     pages = [home]
     pages.extend(_extract_links(html, home))
+    pages = pages[: max(1, _PUBLIC_SITE_MAX_PAGES)]
+
+    # Fetch the internal pages in parallel so total latency is the slowest page,
+    # not the sum; results keep page order for the char-budget loop below.
+    # The executor is per call (one thread per page), so concurrent cold callers,
+    # e.g. /warmup, never queue behind each other's fetches.
+    htmls = [html]
+    if len(pages) > 1:
+        try:
+            with ThreadPoolExecutor(
+                max_workers=len(pages) - 1, thread_name_prefix="public-site-fetch"
+            ) as fetch_pool:
+                htmls.extend(fetch_pool.map(_fetch_url_html, pages[1:]))
+        except Exception:
+            htmls = [html]
+            htmls.extend(_fetch_url_html(p) for p in pages[1:])
 
     chunks: list[str] = []
-    for i, p in enumerate(pages[: max(1, _PUBLIC_SITE_MAX_PAGES)]):
-        h = html if (i == 0) else _fetch_url_html(p)
+    for i, p in enumerate(pages):
+        h = htmls[i]
         if not h:
             continue
 
         title = ""
-        mt = re.search(r"(?is)<title[^>]*>(.*?)</title>", h)
+        mt = _PUBLIC_SITE_TITLE_RE.search(h)
         if mt:
-            title = re.sub(r"\s+", " ", mt.group(1)).strip()
+            title = _PUBLIC_SITE_WS_RE.sub(" ", mt.group(1)).strip()
 
         desc = ""
-        md = re.search(r'(?is)<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', h)
+        md = _PUBLIC_SITE_META_DESC_RE.search(h)
         if md:
-            desc = re.sub(r"\s+", " ", md.group(1)).strip()
+            desc = _PUBLIC_SITE_WS_RE.sub(" ", md.group(1)).strip()
 
         body_text = _html_to_text(h)
 
@@ -8492,64 +9052,166 @@ def _summarize_public_site_sync(url: str, avatar: str, site_text: str) -> str:
     return (summary or "").strip()
 
 
-def _get_public_site_summary_cached_sync(url: str, avatar: str) -> str:
-    """Get a cached summary of a public website (fetch+summarize on cache miss)."""
-    u = _safe_url(url)
-    if not u:
-        return ""
+# url -> (fetched_at, summary) mirror of fresh _PUBLIC_SITE_CACHE_TABLE rows so hot
+# lookups skip the SQLite open/query. Oldest entries are evicted first.
+_PUBLIC_SITE_SUMMARY_MEM: Dict[str, Tuple[int, str]] = {}
+_PUBLIC_SITE_SUMMARY_MEM_MAX = 256
+_PUBLIC_SITE_SUMMARY_MEM_LOCK = threading.Lock()
 
-    db_path = _get_companion_mappings_db_path(for_write=True)
-    if not db_path or not os.path.exists(db_path):
-        return ""
 
-    ttl_s = max(1, _PUBLIC_SITE_CACHE_TTL_HOURS) * 3600
-    now = int(time.time())
+def _public_site_summary_mem_get(url: str, now: int, ttl_s: int) -> str:
+    with _PUBLIC_SITE_SUMMARY_MEM_LOCK:
+        hit = _PUBLIC_SITE_SUMMARY_MEM.get(url)
+    if hit and (now - hit[0]) < ttl_s:
+        return hit[1]
+    return ""
 
-    conn: Optional[sqlite3.Connection] = None
-    try:
-        conn = sqlite3.connect(db_path, timeout=20)
+
+def _public_site_summary_mem_put(url: str, fetched_at: int, summary: str) -> None:
+    with _PUBLIC_SITE_SUMMARY_MEM_LOCK:
+        _PUBLIC_SITE_SUMMARY_MEM.pop(url, None)
+        while len(_PUBLIC_SITE_SUMMARY_MEM) >= _PUBLIC_SITE_SUMMARY_MEM_MAX:
+            _PUBLIC_SITE_SUMMARY_MEM.pop(next(iter(_PUBLIC_SITE_SUMMARY_MEM)), None)
+        _PUBLIC_SITE_SUMMARY_MEM[url] = (fetched_at, summary)
+
+
+# Shared connection for the public-site summary cache (WAL, table ensured once per
+# open). Reopened when the DB path or file changes, or after an error. Only held for
+# the cache read/write, never across the page fetch or the summary LLM call.
+_PUBLIC_SITE_CONN: Optional[sqlite3.Connection] = None
+_PUBLIC_SITE_CONN_KEY: Optional[Tuple[str, int]] = None
+_PUBLIC_SITE_CONN_LOCK = threading.Lock()
+
+
+def _public_site_conn_locked(db_path: str) -> sqlite3.Connection:
+    """Return the shared public-site cache connection. Caller holds _PUBLIC_SITE_CONN_LOCK."""
+    global _PUBLIC_SITE_CONN, _PUBLIC_SITE_CONN_KEY
+    key = (db_path, os.stat(db_path).st_ino)
+    if _PUBLIC_SITE_CONN is None or _PUBLIC_SITE_CONN_KEY != key:
+        _public_site_conn_reset_locked()
+        conn = sqlite3.connect(db_path, timeout=20, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        for pragma in ("PRAGMA journal_mode=WAL;", "PRAGMA synchronous=NORMAL;", "PRAGMA mmap_size=268435456;"):
+            try:
+                conn.execute(pragma)
+            except Exception:
+                pass
         _ensure_public_site_cache_table(conn)
-        cur = conn.cursor()
+        _PUBLIC_SITE_CONN, _PUBLIC_SITE_CONN_KEY = conn, key
+    return _PUBLIC_SITE_CONN
 
-        cur.execute(f"SELECT fetched_at, summary FROM {_PUBLIC_SITE_CACHE_TABLE} WHERE url=?", (u,))
-        row = cur.fetchone()
+
+def _public_site_conn_reset_locked() -> None:
+    global _PUBLIC_SITE_CONN, _PUBLIC_SITE_CONN_KEY
+    if _PUBLIC_SITE_CONN is not None:
+        try:
+            _PUBLIC_SITE_CONN.close()
+        except Exception:
+            pass
+    _PUBLIC_SITE_CONN, _PUBLIC_SITE_CONN_KEY = None, None
+
+
+def _public_site_cache_execute(db_path: str, sql: str, params: Tuple[Any, ...], *, fetch: bool = False) -> Any:
+    """Run one statement on the shared cache connection (commit for writes)."""
+    with _PUBLIC_SITE_CONN_LOCK:
+        try:
+            conn = _public_site_conn_locked(db_path)
+            cur = conn.execute(sql, params)
+            if fetch:
+                row = cur.fetchone()
+                cur.close()
+                return row
+            conn.commit()
+            return None
+        except Exception:
+            _public_site_conn_reset_locked()
+            raise
+
+
+def _public_site_summary_cached_sync(
+    u: str,
+    avatar: str,
+    *,
+    collect: Any,
+    summarize: Any,
+    log_tag: str,
+) -> str:
+    """Cache-first summary of one URL in _PUBLIC_SITE_CACHE_TABLE (fetch+summarize on miss)."""
+    ttl_s = max(1, _PUBLIC_SITE_CACHE_TTL_HOURS) * 3600
+    now = int(time.time())
+
+    cached = _public_site_summary_mem_get(u, now, ttl_s)
+    if cached:
+        return cached
+
+    db_path = _get_companion_mappings_db_path(for_write=True)
+    if not db_path or not os.path.exists(db_path):
+        return ""
+
+    try:
+        row = _public_site_cache_execute(
+            db_path,
+            f"SELECT fetched_at, summary, content_sha FROM {_PUBLIC_SITE_CACHE_TABLE} WHERE url=?",
+            (u,),
+            fetch=True,
+        )
         if row:
             fetched_at = int(row["fetched_at"] or 0)
             summary = str(row["summary"] or "").strip()
             if summary and fetched_at and (now - fetched_at) < ttl_s:
+                _public_site_summary_mem_put(u, fetched_at, summary)
                 return summary
 
-        site_text = _collect_public_site_text(u)
-        if not site_text:
+        text = collect(u)
+        if not text:
             return ""
 
-        summary = _summarize_public_site_sync(u, avatar, site_text)
+        # Expired but the page text is byte-identical: keep the summary, skip the LLM.
+        content_sha = _public_site_content_sha(avatar, text)
+        prev_summary = str(row["summary"] or "").strip() if row else ""
+        if prev_summary and str(row["content_sha"] or "") == content_sha:
+            _public_site_cache_execute(
+                db_path, f"UPDATE {_PUBLIC_SITE_CACHE_TABLE} SET fetched_at=? WHERE url=?", (now, u)
+            )
+            _public_site_summary_mem_put(u, now, prev_summary)
+            return prev_summary
+
+        summary = summarize(u, avatar, text)
         if not summary:
             return ""
 
-        cur.execute(
+        _public_site_cache_execute(
+            db_path,
             f"""
-            INSERT INTO {_PUBLIC_SITE_CACHE_TABLE}(url, fetched_at, summary)
-            VALUES(?, ?, ?)
+            INSERT INTO {_PUBLIC_SITE_CACHE_TABLE}(url, fetched_at, summary, content_sha)
+            VALUES(?, ?, ?, ?)
             ON CONFLICT(url) DO UPDATE SET
                 fetched_at=excluded.fetched_at,
-                summary=excluded.summary
+                summary=excluded.summary,
+                content_sha=excluded.content_sha
             """,
-            (u, now, summary),
+            (u, now, summary, content_sha),
         )
-        conn.commit()
+        _public_site_summary_mem_put(u, now, summary)
         return summary
 
     except Exception as e:
-        print(f"[public-site] cache/summarize failed: {type(e).__name__}: {e}")
+        print(f"[{log_tag}] cache/summarize failed: {type(e).__name__}: {e}")
         return ""
-    finally:
-        try:
-            if conn:
-                conn.close()
-        except Exception:
-            pass
+
+
+def _get_public_site_summary_cached_sync(url: str, avatar: str) -> str:
+    """Get a cached summary of a public website (fetch+summarize on cache miss)."""
+    u = _safe_url(url)
+    if not u:
+        return ""
+    return _public_site_summary_cached_sync(
+        u,
+        avatar,
+        collect=_collect_public_site_text,
+        summarize=_summarize_public_site_sync,
+        log_tag="public-site",
+    )
 
 
 def _website_url_from_joined(joined: Dict[str, Any]) -> str:
@@ -8716,14 +9378,14 @@ def _collect_public_page_text(url: str) -> str:
         return ""
 
     title = ""
-    mt = re.search(r"(?is)<title[^>]*>(.*?)</title>", h)
+    mt = _PUBLIC_SITE_TITLE_RE.search(h)
     if mt:
-        title = re.sub(r"\s+", " ", mt.group(1)).strip()
+        title = _PUBLIC_SITE_WS_RE.sub(" ", mt.group(1)).strip()
 
     desc = ""
-    md = re.search(r'(?is)<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', h)
+    md = _PUBLIC_SITE_META_DESC_RE.search(h)
     if md:
-        desc = re.sub(r"\s+", " ", md.group(1)).strip()
+        desc = _PUBLIC_SITE_WS_RE.sub(" ", md.group(1)).strip()
 
     body_text = _html_to_text(h)
     header = f"=== PAGE: {u} ===\n"
@@ -8768,59 +9430,13 @@ def _get_public_reference_page_summary_cached_sync(url: str, avatar: str) -> str
     u = _normalize_public_reference_url(url)
     if not u:
         return ""
-
-    db_path = _get_companion_mappings_db_path(for_write=True)
-    if not db_path or not os.path.exists(db_path):
-        return ""
-
-    ttl_s = max(1, _PUBLIC_SITE_CACHE_TTL_HOURS) * 3600
-    now = int(time.time())
-
-    conn: Optional[sqlite3.Connection] = None
-    try:
-        conn = sqlite3.connect(db_path, timeout=20)
-        conn.row_factory = sqlite3.Row
-        _ensure_public_site_cache_table(conn)
-        cur = conn.cursor()
-
-        cur.execute(f"SELECT fetched_at, summary FROM {_PUBLIC_SITE_CACHE_TABLE} WHERE url=?", (u,))
-        row = cur.fetchone()
-        if row:
-            fetched_at = int(row["fetched_at"] or 0)
-            summary = str(row["summary"] or "").strip()
-            if summary and fetched_at and (now - fetched_at) < ttl_s:
-                return summary
-
-        page_text = _collect_public_page_text(u)
-        if not page_text:
-            return ""
-
-        summary = _summarize_public_reference_page_sync(u, avatar, page_text)
-        if not summary:
-            return ""
-
-        cur.execute(
-            f"""
-            INSERT INTO {_PUBLIC_SITE_CACHE_TABLE}(url, fetched_at, summary)
-            VALUES(?, ?, ?)
-            ON CONFLICT(url) DO UPDATE SET
-                fetched_at=excluded.fetched_at,
-                summary=excluded.summary
-            """,
-            (u, now, summary),
-        )
-        conn.commit()
-        return summary
-
-    except Exception as e:
-        print(f"[public-page] cache/summarize failed: {type(e).__name__}: {e}")
-        return ""
-    finally:
-        try:
-            if conn:
-                conn.close()
-        except Exception:
-            pass
+    return _public_site_summary_cached_sync(
+        u,
+        avatar,
+        collect=_collect_public_page_text,
+        summarize=_summarize_public_reference_page_sync,
+        log_tag="public-page",
+    )
 
 
 def _get_public_website_url_for_avatar_sync(avatar: str) -> str:
@@ -9099,13 +9715,26 @@ def _build_guideline_reference_page_blocks_sync(avatar: str, website_url: str, h
     if not urls:
         return []
 
-    blocks: List[str] = []
-    for u in urls[: max(1, _PUBLIC_SITE_REFERENCE_MAX_PAGES)]:
-        summary = ""
+    def _summary(u: str) -> str:
+        try:
+            return _get_public_reference_page_summary_cached_sync(u, a)
+        except Exception:
+            return ""
+
+    # Cold pages each cost a fetch plus an LLM call; run them side by side instead of
+    # back to back. Order of the resulting blocks is unchanged.
+    targets = urls[: max(1, _PUBLIC_SITE_REFERENCE_MAX_PAGES)]
+    summaries: List[str] = []
+    if len(targets) > 1:
         try:
-            summary = _get_public_reference_page_summary_cached_sync(u, a)
+            summaries = list(_PUBLIC_SITE_SUMMARY_POOL.map(_summary, targets))
         except Exception:
-            summary = ""
+            summaries = []
+    if len(summaries) != len(targets):
+        summaries = [_summary(u) for u in targets]
+
+    blocks: List[str] = []
+    for u, summary in zip(targets, summaries):
         block = _build_public_reference_page_system_block(a, u, summary)
         if block:
             blocks.append(block)
@@ -9123,6 +9752,21 @@ def _build_public_site_system_block(avatar: str, url: str, summary: str) -> str:
     )
 
 
+# Companion types that receive onboarding/public-site prompt injection.
+_HCO_INJECT_COMPANION_TYPES = frozenset({"human", "representative", "rep", "ai_representative", ""})
+
+
+def _hco_blocks_excluded_for_session(session_state: Dict[str, Any]) -> bool:
+    """True when the session's own companion type rules out HCO injection.
+
+    The frontend echoes companion_type from the mapping row, so a plain AI companion
+    can skip the onboarding join (and site summary) entirely. No hint -> not excluded.
+    """
+    state = session_state if isinstance(session_state, dict) else {}
+    hint = str(state.get("companion_type") or state.get("companionType") or "").strip().lower()
+    return bool(hint) and hint not in _HCO_INJECT_COMPANION_TYPES
+
+
 def _get_hco_system_blocks_cached_sync(avatar: str) -> List[str]:
     """Return system blocks derived from onboarding + public website.
 
@@ -9149,7 +9793,7 @@ def _get_hco_system_blocks_cached_sync(avatar: str) -> List[str]:
     if joined:
         # Only inject for human/rep companions
         ctype = (str(joined.get("companion_type") or "") or "").strip().lower()
-        if ctype in ("human", "representative", "rep", "ai_representative", ""):
+        if ctype in _HCO_INJECT_COMPANION_TYPES:
             ob = _build_onboarding_system_block(joined)
             if ob:
                 blocks.append(ob)
@@ -9802,13 +10446,19 @@ _TTS_CACHE_PREFIX = (os.getenv("TTS_CACHE_PREFIX", "tts_cache") or "tts_cache").
 _TTS_CACHE_NORMALIZE_WS = (os.getenv("TTS_CACHE_NORMALIZE_WS", "1") or "1").strip().lower() not in {"0", "false", "no", "off"}
 
 
+_TTS_CACHE_WS_RE = re.compile(r"\s+")
+
+
 def _normalize_tts_text_for_cache(text: str) -> str:
     t = (text or "").strip()
     if _TTS_CACHE_NORMALIZE_WS:
-        t = re.sub(r"\s+", " ", t)
+        t = _TTS_CACHE_WS_RE.sub(" ", t)
     return t
 
 
+_TTS_BLOB_NAME_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+
 def _tts_cache_blob_name(voice_id: str, text: str, cache_context: str = "") -> str:
     """Deterministic blob name for caching across sessions and workers.
 
@@ -9817,17 +10467,20 @@ def _tts_cache_blob_name(voice_id: str, text: str, cache_context: str = "") -> s
     companion_mappings.phonetic cannot keep serving an older cached greeting
     or reply for the same visible text and voice.
     """
-    safe_voice = re.sub(r"[^A-Za-z0-9_-]", "_", (voice_id or "voice"))[:48]
+    safe_voice = _TTS_BLOB_NAME_UNSAFE_RE.sub("_", (voice_id or "voice"))[:48]
 
-    model_id = (os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2") or "eleven_multilingual_v2").strip()
-    output_format = (os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128") or "mp3_44100_128").strip()
     silence = str(_TTS_LEADING_SILENCE_COPIES)
 
     norm_text = _normalize_tts_text_for_cache(text)
     norm_context = _normalize_tts_text_for_cache(cache_context or "")
-    h = hashlib.sha256(
-        (safe_voice + "|" + model_id + "|" + output_format + "|" + silence + "|" + norm_context + "|" + norm_text).encode("utf-8")
-    ).hexdigest()[:40]
+    # Feed the key parts incrementally (same bytes as the old "|"-joined key,
+    # so existing cached blobs keep matching) without building a joined copy.
+    hasher = hashlib.sha256()
+    for part in (safe_voice, _ELEVENLABS_MODEL_ID, _ELEVENLABS_OUTPUT_FORMAT, silence, norm_context):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"|")
+    hasher.update(norm_text.encode("utf-8"))
+    h = hasher.hexdigest()[:40]
 
     # Keep under a predictable prefix; safe_voice helps partition blobs for listing/debug.
     return f"{_TTS_CACHE_PREFIX}/{safe_voice}/{h}.mp3"
@@ -9841,25 +10494,65 @@ def _tts_cache_blob_name(voice_id: str, text: str, cache_context: str = "") -> s
 _SILENT_MP3_PREFIX_B64 = "SUQzBAAAAAAAI1RTU0UAAAAPAAADTGF2ZjU5LjI3LjEwMAAAAAAAAAAAAAAA//tAwAAAAAAAAAAAAAAAAAAAAAAASW5mbwAAAA8AAAAJAAAEXgBBQUFBQUFBQUFBQVlZWVlZWVlZWVlZcXFxcXFxcXFxcXGIiIiIiIiIiIiIiKCgoKCgoKCgoKCguLi4uLi4uLi4uLjQ0NDQ0NDQ0NDQ0Ojo6Ojo6Ojo6Ojo//////////////8AAAAATGF2YzU5LjM3AAAAAAAAAAAAAAAAJAPMAAAAAAAABF6gwS6ZAAAAAAD/+xDEAAPAAAGkAAAAIAAANIAAAARMQU1FMy4xMDBVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVTEFNRTMuMTAwVVVVVf/7EMQpg8AAAaQAAAAgAAA0gAAABFVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVMQU1FMy4xMDBVVVVV//sQxFMDwAABpAAAACAAADSAAAAEVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVUxBTUUzLjEwMFVVVVX/+xDEfIPAAAGkAAAAIAAANIAAAARVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVf/7EMSmA8AAAaQAAAAgAAA0gAAABFVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV//sQxM+DwAABpAAAACAAADSAAAAEVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVX/+xDE1gPAAAGkAAAAIAAANIAAAARVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVf/7EMTWA8AAAaQAAAAgAAA0gAAABFVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV//sQxNYDwAABpAAAACAAADSAAAAEVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVU="
 _SILENT_MP3_PREFIX_BYTES = base64.b64decode(_SILENT_MP3_PREFIX_B64)
 _TTS_LEADING_SILENCE_COPIES = max(0, int(os.getenv("TTS_LEADING_SILENCE_COPIES", "1") or "1"))
+# Full leading-silence prefix, built once (both operands are fixed after startup).
+if _TTS_LEADING_SILENCE_COPIES == 0:
+    _SILENT_MP3_PREFIX_BLOCK = b""
+elif _TTS_LEADING_SILENCE_COPIES == 1:
+    _SILENT_MP3_PREFIX_BLOCK = _SILENT_MP3_PREFIX_BYTES
+else:
+    _SILENT_MP3_PREFIX_BLOCK = _SILENT_MP3_PREFIX_BYTES * _TTS_LEADING_SILENCE_COPIES
+
+
+def _tts_prefixed_audio(chunks: List[bytes]) -> bytes:
+    """Join streamed audio chunks behind the silent prefix in a single allocation."""
+    if not chunks:
+        raise RuntimeError("ElevenLabs returned empty audio")
+    if _SILENT_MP3_PREFIX_BLOCK:
+        chunks.insert(0, _SILENT_MP3_PREFIX_BLOCK)
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
 
 def _tts_blob_name(session_id: str, voice_id: str, text: str) -> str:
-    safe_session = re.sub(r"[^A-Za-z0-9_-]", "_", (session_id or "session"))[:64]
-    safe_voice = re.sub(r"[^A-Za-z0-9_-]", "_", (voice_id or "voice"))[:48]
-    h = hashlib.sha1((safe_voice + "|" + (text or "")).encode("utf-8")).hexdigest()[:16]
+    safe_session = _TTS_BLOB_NAME_UNSAFE_RE.sub("_", (session_id or "session"))[:64]
+    safe_voice = _TTS_BLOB_NAME_UNSAFE_RE.sub("_", (voice_id or "voice"))[:48]
+    h = hashlib.blake2b((safe_voice + "|" + (text or "")).encode("utf-8"), digest_size=8).hexdigest()
     ts_ms = int(time.time() * 1000)
     # include hash for debugging/caching, but still unique by timestamp
     return f"{_TTS_BLOB_PREFIX}/{safe_session}/{ts_ms}-{h}-{uuid.uuid4().hex}.mp3"
 
 
-def _elevenlabs_tts_mp3_bytes(voice_id: str, text: str) -> bytes:
-    import requests  # type: ignore
+_ELEVEN_SESSION: Any = None
+_ELEVEN_SESSION_LOCK = threading.Lock()
+
 
+def _get_eleven_session() -> Any:
+    """Process-wide keep-alive session for ElevenLabs (reuses the TLS connection)."""
+    global _ELEVEN_SESSION
+    if _ELEVEN_SESSION is not None:
+        return _ELEVEN_SESSION
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+    from urllib3.util.retry import Retry  # type: ignore
+
+    with _ELEVEN_SESSION_LOCK:
+        if _ELEVEN_SESSION is None:
+            sess = requests.Session()
+            # POST is not in Retry's default allowed_methods, so only connection-level
+            # failures are retried; a synthesis request is never sent (and billed) twice.
+            retry = Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+            sess.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=retry))
+            sess.headers.update({"Connection": "keep-alive"})
+            _ELEVEN_SESSION = sess
+    return _ELEVEN_SESSION
+
+
+def _elevenlabs_tts_request(voice_id: str, text: str) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """(url, headers, json body) for an ElevenLabs streaming synthesis request."""
     xi_api_key = os.getenv("ELEVENLABS_API_KEY", "").strip()
     if not xi_api_key:
         raise RuntimeError("ELEVENLABS_API_KEY is not configured")
 
-    model_id = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2").strip() or "eleven_multilingual_v2"
-    output_format = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128").strip() or "mp3_44100_128"
+    model_id = _ELEVENLABS_MODEL_ID
+    output_format = _ELEVENLABS_OUTPUT_FORMAT
 
     # Using /stream tends to be lower latency on ElevenLabs.
     url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream?output_format={output_format}"
@@ -9869,66 +10562,110 @@ def _elevenlabs_tts_mp3_bytes(voice_id: str, text: str) -> bytes:
         "Accept": "audio/mpeg",
     }
     body = {"text": text, "model_id": model_id}
+    return url, headers, body
 
-    r = requests.post(url, headers=headers, json=body, timeout=60)
-    if r.status_code >= 400:
-        raise RuntimeError(f"ElevenLabs error {r.status_code}: {(r.text or '')[:400]}")
-    if not r.content:
-        raise RuntimeError("ElevenLabs returned empty audio")
-    audio_bytes = r.content
-    if _TTS_LEADING_SILENCE_COPIES:
-        audio_bytes = (_SILENT_MP3_PREFIX_BYTES * _TTS_LEADING_SILENCE_COPIES) + audio_bytes
-    return audio_bytes
 
+def _elevenlabs_tts_mp3_bytes(voice_id: str, text: str) -> bytes:
+    url, headers, body = _elevenlabs_tts_request(voice_id, text)
 
+    # Keep the streamed chunks and join them behind the silent prefix once, so the audio
+    # is copied a single time (no growing buffer, no final bytes() copy).
+    with _get_eleven_session().post(url, headers=headers, json=body, timeout=(5, 60), stream=True) as r:
+        if r.status_code >= 400:
+            raise RuntimeError(f"ElevenLabs error {r.status_code}: {(r.text or '')[:400]}")
+        chunks = [chunk for chunk in r.iter_content(16384) if chunk]
+    return _tts_prefixed_audio(chunks)
 
 
-def _azure_blob_sas_url(blob_name: str) -> str:
-    """Create a read-only SAS URL for an existing blob name in the TTS container."""
-    from azure.storage.blob import BlobServiceClient  # type: ignore
-    from azure.storage.blob import BlobSasPermissions, generate_blob_sas  # type: ignore
+def _make_eleven_async_client() -> Any:
+    """httpx.AsyncClient for batched ElevenLabs calls (HTTP/2 multiplexing when h2 is installed)."""
+    import httpx  # type: ignore
 
-    storage_conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
-    if not storage_conn_str:
-        raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not configured")
+    try:
+        import h2  # type: ignore  # noqa: F401
+        http2 = True
+    except Exception:
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
 
-    blob_service = BlobServiceClient.from_connection_string(storage_conn_str)
-    container_client = blob_service.get_container_client(_TTS_CONTAINER)
-    blob_client = container_client.get_blob_client(blob_name)
 
-    # Parse AccountName/AccountKey from connection string for SAS
-    parts: Dict[str, str] = {}
-    for seg in storage_conn_str.split(";"):
-        if "=" in seg:
-            k, v = seg.split("=", 1)
-            parts[k] = v
-    account_name = parts.get("AccountName") or getattr(blob_service, "account_name", None)
-    account_key = parts.get("AccountKey")
-    if not account_name or not account_key:
-        raise RuntimeError("Could not parse AccountName/AccountKey from AZURE_STORAGE_CONNECTION_STRING")
+async def _elevenlabs_tts_mp3_bytes_async(client: Any, voice_id: str, text: str) -> bytes:
+    """Async counterpart of _elevenlabs_tts_mp3_bytes over a caller-owned httpx.AsyncClient."""
+    url, headers, body = _elevenlabs_tts_request(voice_id, text)
+    async with client.stream("POST", url, headers=headers, json=body) as r:
+        if r.status_code >= 400:
+            err = (await r.aread()).decode("utf-8", "replace")
+            raise RuntimeError(f"ElevenLabs error {r.status_code}: {err[:400]}")
+        chunks = [chunk async for chunk in r.aiter_bytes(16384) if chunk]
+    return _tts_prefixed_audio(chunks)
 
-    expiry = datetime.utcnow() + timedelta(minutes=max(5, min(_TTS_SAS_MINUTES, 24 * 60)))
-    sas = generate_blob_sas(
-        account_name=account_name,
-        container_name=_TTS_CONTAINER,
-        blob_name=blob_name,
-        account_key=account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=expiry,
-    )
-    return f"{blob_client.url}?{sas}"
-def _azure_upload_mp3_and_get_sas_url(blob_name: str, mp3_bytes: bytes) -> str:
-    from azure.storage.blob import BlobServiceClient, ContentSettings  # type: ignore
-    from azure.storage.blob import BlobSasPermissions, generate_blob_sas  # type: ignore
+
+
+
+# Shared Azure Blob clients. The connection string is parsed (and the service client
+# with its HTTP pipeline/connection pool built) once, and rebuilt only if it changes.
+_BLOB_LOCK = threading.Lock()
+_BLOB_SERVICE: Any = None
+_BLOB_SERVICE_CONN_STR = ""
+_BLOB_ACCOUNT_NAME = ""
+_BLOB_ACCOUNT_KEY = ""
+_BLOB_ACCOUNT_KEY_BYTES = b""
+_BLOB_ENDPOINT = ""
+_BLOB_CONTAINER_CLIENTS: Dict[str, Any] = {}
+_BLOB_CONTAINERS_ENSURED: Set[str] = set()
+# Uploads above the single-put size are split into blocks staged in parallel
+# (the SDK default single-put size is 64 MiB, i.e. every MP3 went up as one PUT).
+_BLOB_MAX_SINGLE_PUT_SIZE = max(64 * 1024, _env_int("AZURE_BLOB_MAX_SINGLE_PUT_SIZE", 512 * 1024))
+_BLOB_MAX_BLOCK_SIZE = max(64 * 1024, _env_int("AZURE_BLOB_MAX_BLOCK_SIZE", 1024 * 1024))
+_BLOB_UPLOAD_CONCURRENCY = max(1, min(16, _env_int("AZURE_BLOB_UPLOAD_CONCURRENCY", 4)))
+
+
+def _get_blob_service() -> Any:
+    global _BLOB_SERVICE, _BLOB_SERVICE_CONN_STR, _BLOB_ACCOUNT_NAME, _BLOB_ACCOUNT_KEY, _BLOB_ACCOUNT_KEY_BYTES, _BLOB_ENDPOINT
 
     storage_conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
     if not storage_conn_str:
         raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not configured")
 
-    blob_service = BlobServiceClient.from_connection_string(storage_conn_str)
-    container_client = blob_service.get_container_client(_TTS_CONTAINER)
+    with _BLOB_LOCK:
+        if _BLOB_SERVICE is None or _BLOB_SERVICE_CONN_STR != storage_conn_str:
+            from azure.storage.blob import BlobServiceClient  # type: ignore
+
+            svc = BlobServiceClient.from_connection_string(
+                storage_conn_str,
+                max_single_put_size=_BLOB_MAX_SINGLE_PUT_SIZE,
+                max_block_size=_BLOB_MAX_BLOCK_SIZE,
+            )
+            parts: Dict[str, str] = dict(seg.split("=", 1) for seg in storage_conn_str.split(";") if "=" in seg)
+            _BLOB_ACCOUNT_NAME = parts.get("AccountName") or getattr(svc, "account_name", None) or ""
+            _BLOB_ACCOUNT_KEY = parts.get("AccountKey") or ""
+            try:
+                _BLOB_ACCOUNT_KEY_BYTES = base64.b64decode(_BLOB_ACCOUNT_KEY) if _BLOB_ACCOUNT_KEY else b""
+            except Exception:
+                _BLOB_ACCOUNT_KEY_BYTES = b""
+            _BLOB_ENDPOINT = str(getattr(svc, "url", "") or "").split("?", 1)[0].rstrip("/")
+            _BLOB_CONTAINER_CLIENTS.clear()
+            _BLOB_CONTAINERS_ENSURED.clear()
+            _BLOB_SERVICE, _BLOB_SERVICE_CONN_STR = svc, storage_conn_str
+        return _BLOB_SERVICE
+
+
+def _get_container_client(container_name: str, *, ensure: bool = False) -> Any:
+    """Cached ContainerClient; ensure=True creates the container once per process."""
+    blob_service = _get_blob_service()
+    with _BLOB_LOCK:
+        container_client = _BLOB_CONTAINER_CLIENTS.get(container_name)
+        if container_client is None:
+            container_client = blob_service.get_container_client(container_name)
+            _BLOB_CONTAINER_CLIENTS[container_name] = container_client
+        if not ensure or container_name in _BLOB_CONTAINERS_ENSURED:
+            return container_client
 
-    # Ensure container exists (safe)
+    # Ensure container exists (best-effort).
     try:
         container_client.get_container_properties()
     except Exception:
@@ -9936,55 +10673,125 @@ def _azure_upload_mp3_and_get_sas_url(blob_name: str, mp3_bytes: bytes) -> str:
             container_client.create_container()
         except Exception:
             pass
+    with _BLOB_LOCK:
+        _BLOB_CONTAINERS_ENSURED.add(container_name)
+    return container_client
+
+
+# Service SAS version used by the local signer below (string-to-sign layout of 2020-12-06+).
+_BLOB_SAS_VERSION = "2020-12-06"
+
+
+def _azure_blob_read_sas_url(container_name: str, blob_name: str, expiry: datetime) -> str:
+    """Read-only SAS URL for container/blob using the cached account credentials.
+
+    Signed locally (one HMAC-SHA256) rather than via generate_blob_sas + a BlobClient,
+    which only existed to read blob_client.url. Produces the same sp/se/sv/sr/sig
+    query the SDK emits for a read-only blob SAS.
+    """
+    _get_blob_service()
+    account_name, key_bytes, endpoint = _BLOB_ACCOUNT_NAME, _BLOB_ACCOUNT_KEY_BYTES, _BLOB_ENDPOINT
+    if not account_name or not key_bytes:
+        raise RuntimeError("Could not parse AccountName/AccountKey from AZURE_STORAGE_CONNECTION_STRING")
+    if not endpoint:
+        endpoint = f"https://{account_name}.blob.core.windows.net"
 
+    se = expiry.strftime("%Y-%m-%dT%H:%M:%SZ")
+    string_to_sign = "\n".join(
+        (
+            "r",  # signedPermissions
+            "",  # signedStart
+            se,  # signedExpiry
+            f"/blob/{account_name}/{container_name}/{blob_name}",
+            "",  # signedIdentifier
+            "",  # signedIP
+            "",  # signedProtocol
+            _BLOB_SAS_VERSION,
+            "b",  # signedResource
+            "",  # signedSnapshotTime
+            "",  # signedEncryptionScope
+            "", "", "", "", "",  # rscc, rscd, rsce, rscl, rsct
+        )
+    )
+    sig = base64.b64encode(hmac.new(key_bytes, string_to_sign.encode("utf-8"), hashlib.sha256).digest()).decode("ascii")
+    query = f"se={quote(se)}&sp=r&sv={_BLOB_SAS_VERSION}&sr=b&sig={quote(sig)}"
+    return f"{endpoint}/{quote(container_name)}/{quote(blob_name, safe='~/')}?{query}"
+
+
+@lru_cache(maxsize=4096)
+def _tts_sas_url_for_bucket(blob_name: str, bucket: int, bucket_s: int, minutes: int, conn_str: str) -> str:
+    # Expiry is fixed per bucket so the signed URL is reusable for the whole bucket;
+    # it always leaves at least the configured validity from the moment it is served.
+    expiry = datetime.utcfromtimestamp((bucket + 1) * bucket_s) + timedelta(minutes=minutes)
+    return _azure_blob_read_sas_url(_TTS_CONTAINER, blob_name, expiry)
+
+
+def _azure_blob_sas_url(blob_name: str) -> str:
+    """Create a read-only SAS URL for an existing blob name in the TTS container.
+
+    Repeat plays of the same cached phrase reuse one signed URL per half-validity
+    window instead of re-signing on every request.
+    """
+    minutes = max(5, min(_TTS_SAS_MINUTES, 24 * 60))
+    bucket_s = max(60, (minutes * 60) // 2)
+    _get_blob_service()
+    return _tts_sas_url_for_bucket(blob_name, int(time.time() // bucket_s), bucket_s, minutes, _BLOB_SERVICE_CONN_STR)
+
+
+def _azure_upload_mp3_and_get_sas_url(blob_name: str, mp3_bytes: bytes) -> str:
+    from azure.storage.blob import ContentSettings  # type: ignore
+
+    container_client = _get_container_client(_TTS_CONTAINER, ensure=True)
     blob_client = container_client.get_blob_client(blob_name)
     blob_client.upload_blob(
         mp3_bytes,
         overwrite=True,
+        max_concurrency=_BLOB_UPLOAD_CONCURRENCY,
         content_settings=ContentSettings(content_type="audio/mpeg"),
     )
+    return _azure_blob_sas_url(blob_name)
 
-    # Parse AccountName/AccountKey from connection string for SAS
-    parts: Dict[str, str] = {}
-    for seg in storage_conn_str.split(";"):
-        if "=" in seg:
-            k, v = seg.split("=", 1)
-            parts[k] = v
-    account_name = parts.get("AccountName") or getattr(blob_service, "account_name", None)
-    account_key = parts.get("AccountKey")
-    if not account_name or not account_key:
-        raise RuntimeError("Could not parse AccountName/AccountKey from AZURE_STORAGE_CONNECTION_STRING")
 
-    expiry = datetime.utcnow() + timedelta(minutes=max(5, min(_TTS_SAS_MINUTES, 24 * 60)))
-    sas = generate_blob_sas(
-        account_name=account_name,
-        container_name=_TTS_CONTAINER,
-        blob_name=blob_name,
-        account_key=account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=expiry,
-    )
-    return f"{blob_client.url}?{sas}"
+# Static patterns used on every TTS normalization (compiled once).
+# Word boundaries inside identifiers: lower->Upper, letter->digit, digit->letter.
+_TTS_CAMEL_SPLIT_RE = re.compile(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Za-z])(?=[0-9])|(?<=[0-9])(?=[A-Za-z])")
+_TTS_MD_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^\)]+)\)")
+_TTS_URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
+_TTS_WWW_RE = re.compile(r"\bwww\.[^\s]+\b", re.IGNORECASE)
+_TTS_NON_ALNUM_RE = re.compile(r"[^A-Za-z0-9]")
+
+
+@lru_cache(maxsize=256)
+def _tts_literal_re(literal: str) -> "re.Pattern[str]":
+    """Case-insensitive literal match (brand names), compiled once per literal."""
+    return re.compile(re.escape(literal), re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def _tts_standalone_token_re(token: str) -> "re.Pattern[str]":
+    """Case-insensitive match of token with no alnum on either side."""
+    return re.compile(rf"(?i)(?<![A-Za-z0-9]){re.escape(token)}(?![A-Za-z0-9])")
+
+
+@lru_cache(maxsize=256)
+def _tts_phonetic_target_re(token: str) -> "re.Pattern[str]":
+    """Case-insensitive match of token either glued to a following letter (e.g. DulceMoon,
+    group 1 set) or standing alone (no alnum on either side)."""
+    return re.compile(rf"(?i)(?<![A-Za-z0-9]){re.escape(token)}(?:(?=([A-Za-z]))|(?![A-Za-z0-9]))")
 
 
 def _split_camel_case_words(s: str) -> str:
     """Insert spaces in CamelCase identifiers to improve pronunciation (e.g., DulceMoon -> Dulce Moon)."""
-    if not s:
+    if not s or " " in s:
         return s
-    if " " in s:
-        return s
-    s2 = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", s)
-    s2 = re.sub(r"(?<=[A-Za-z])(?=[0-9])", " ", s2)
-    s2 = re.sub(r"(?<=[0-9])(?=[A-Za-z])", " ", s2)
-    return s2
+    return _TTS_CAMEL_SPLIT_RE.sub(" ", s)
 
 
 def _apply_phonetic_word_boundary(text: str, target: str, phonetic: str) -> str:
     """Case-insensitive replace of target as a standalone token (no alnum adjacent)."""
     if not text or not target or not phonetic:
         return text
-    pattern = re.compile(rf"(?i)(?<![A-Za-z0-9]){re.escape(target)}(?![A-Za-z0-9])")
-    return pattern.sub(phonetic, text)
+    return _tts_standalone_token_re(target).sub(phonetic, text)
 
 
 def _normalize_tts_text(
@@ -10008,57 +10815,62 @@ def _normalize_tts_text(
         return ""
 
     s = str(text)
+    # Most replies contain no link and no brand/avatar token; each phase below is
+    # gated on a cheap substring test so those replies skip the regex passes entirely.
+    low = s.lower()
+    touched = False
 
-    # 0) Replace markdown links: [Label](https://...) => "Label"
-    s = re.sub(r"\[([^\]]+)\]\((https?://[^\)]+)\)", r"\1", s)
+    if "http" in low or "www." in low:
+        # 0) Replace markdown links: [Label](https://...) => "Label"
+        if "](" in s:
+            s = _TTS_MD_LINK_RE.sub(r"\1", s)
 
-    # 1) Replace bare URLs with a neutral token so we don't speak domains/paths.
-    #    (This is the main fix for paywall pronunciation issues.)
-    s = re.sub(r"https?://\S+", " link ", s, flags=re.IGNORECASE)
+        # 1) Replace bare URLs with a neutral token so we don't speak domains/paths.
+        #    (This is the main fix for paywall pronunciation issues.)
+        s = _TTS_URL_RE.sub(" link ", s)
 
-    # 2) Replace www.* links without scheme.
-    s = re.sub(r"\bwww\.[^\s]+\b", " link ", s, flags=re.IGNORECASE)
+        # 2) Replace www.* links without scheme.
+        s = _TTS_WWW_RE.sub(" link ", s)
 
     # Collapse whitespace early.
-    s = re.sub(r"\s+", " ", s).strip()
+    s = " ".join(s.split())
+    low = s.lower()
 
     # 3) Brand normalization (CamelCase -> spaced) so phonetics can match word boundaries.
     brand = (brand or "").strip()
-    if brand:
+    brand_compact = _TTS_NON_ALNUM_RE.sub("", brand) if brand else ""
+    if brand and (brand.lower() in low or (brand_compact and brand_compact.lower() in low)):
+        touched = True
         spaced_brand = _split_camel_case_words(brand)
         if spaced_brand != brand:
             # Replace literal brand occurrences (case-insensitive)
-            s = re.sub(re.escape(brand), spaced_brand, s, flags=re.IGNORECASE)
+            s = _tts_literal_re(brand).sub(spaced_brand, s)
 
         # Also handle compact brand tokens (punctuation-delimited), e.g. "dulcemoon" in text.
-        brand_compact = re.sub(r"[^A-Za-z0-9]", "", brand)
         if brand_compact:
             spaced_compact = _split_camel_case_words(brand_compact)
-            token_pat = re.compile(
-                rf"(?i)(?<![A-Za-z0-9]){re.escape(brand_compact)}(?![A-Za-z0-9])"
-            )
-            s = token_pat.sub(spaced_compact, s)
+            s = _tts_standalone_token_re(brand_compact).sub(spaced_compact, s)
+        low = s.lower()
 
     # 4) Apply phonetic pronunciation for the companion name.
     avatar = (avatar or "").strip()
     mapping_phonetic = (mapping_phonetic or "").strip()
-    if avatar and mapping_phonetic:
-        # Handle CamelCase concatenations (e.g., "DulceMoon") by inserting a space.
-        s = re.sub(
-            rf"(?i)(?<![A-Za-z0-9]){re.escape(avatar)}(?=[A-Z])",
-            mapping_phonetic + " ",
-            s,
-        )
-        # Word-boundary replacement (normal case)
-        s = _apply_phonetic_word_boundary(s, avatar, mapping_phonetic)
+    if avatar and mapping_phonetic and avatar.lower() in low:
+        touched = True
+        # One scan covers both CamelCase concatenations ("DulceMoon" -> phonetic + space)
+        # and the normal word-boundary case.
+        glued = mapping_phonetic + " "
+        s = _tts_phonetic_target_re(avatar).sub(lambda m: glued if m.group(1) else mapping_phonetic, s)
 
     # 5) Optional brand phonetic (future-proof; not currently required).
     brand_phonetic = (brand_phonetic or "").strip()
-    if brand and brand_phonetic:
+    if brand and brand_phonetic and brand.lower() in s.lower():
+        touched = True
         s = _apply_phonetic_word_boundary(s, brand, brand_phonetic)
 
     # Final cleanup
-    s = re.sub(r"\s+", " ", s).strip()
+    if touched:
+        s = " ".join(s.split())
     return s
 
 
@@ -10085,6 +10897,37 @@ def _tts_explicit_phonetic_from_payload(value: Any) -> str:
     return ""
 
 
+# Every TTS call resolves (brand, avatar) through the alias-aware mapping lookup at least
+# twice (voice/phonetic authority + text normalization), and misses fall through to a
+# scan of all mapping rows. Results are memoized briefly and keyed to the mapping load,
+# so a reload of companion_mappings is picked up on the next request.
+_TTS_MAPPING_ROW_CACHE: Dict[Tuple[str, str, str], Tuple[float, float, Dict[str, Any]]] = {}
+_TTS_MAPPING_ROW_CACHE_MAX = 2048
+_TTS_MAPPING_ROW_CACHE_TTL_S = _perf_opt_env_float("TTS_MAPPING_ROW_CACHE_TTL_S", 60.0, max_value=600.0)
+_TTS_MAPPING_ROW_CACHE_LOCK = threading.Lock()
+
+
+def _tts_companion_mapping_row(brand: str, avatar: str, requested_type: str = "") -> Dict[str, Any]:
+    """Memoized _lookup_companion_mapping_with_aliases for the TTS paths ({} when unmapped).
+
+    The returned dict is shared; callers must treat it as read-only.
+    """
+    key = (brand, avatar, requested_type)
+    loaded_at = float(_COMPANION_MAPPINGS_LOADED_AT or 0.0)
+    now = time.time()
+    with _TTS_MAPPING_ROW_CACHE_LOCK:
+        hit = _TTS_MAPPING_ROW_CACHE.get(key)
+    if hit and hit[1] == loaded_at and (now - hit[0]) < _TTS_MAPPING_ROW_CACHE_TTL_S:
+        return hit[2]
+
+    row = _lookup_companion_mapping_with_aliases(brand, avatar, requested_type) or {}
+    with _TTS_MAPPING_ROW_CACHE_LOCK:
+        if len(_TTS_MAPPING_ROW_CACHE) >= _TTS_MAPPING_ROW_CACHE_MAX:
+            _TTS_MAPPING_ROW_CACHE.clear()
+        _TTS_MAPPING_ROW_CACHE[key] = (now, loaded_at, row)
+    return row
+
+
 def _tts_lookup_phonetic_context(brand: str, avatar: str, explicit_phonetic: str = "") -> Tuple[str, str, str]:
     """Return (brand, pronunciation_target, phonetic) for TTS name normalization.
 
@@ -10101,7 +10944,7 @@ def _tts_lookup_phonetic_context(brand: str, avatar: str, explicit_phonetic: str
 
     row: Dict[str, Any] = {}
     try:
-        row = _lookup_companion_mapping_with_aliases(b, a) or {}
+        row = _tts_companion_mapping_row(b, a)
     except Exception:
         row = {}
 
@@ -10366,7 +11209,7 @@ def _tts_authoritative_companion_context(
 
     row: Dict[str, Any] = {}
     try:
-        row = _lookup_companion_mapping_with_aliases(b, a, requested) or {}
+        row = _tts_companion_mapping_row(b, a, requested)
     except Exception:
         row = {}
     if not row:
@@ -10388,7 +11231,50 @@ def _tts_authoritative_companion_context(
     out["source"] = "db"
     return out
 
-def _tts_audio_url_sync(session_id: str, voice_id: str, text: str, brand: str = "", avatar: str = "", mapping_phonetic: str = "", cache_context: str = "") -> str:
+# In-process view of which deterministic TTS cache blobs exist, so hot phrases skip the
+# Azure HEAD. Cache blobs are never rewritten, but they can be deleted out-of-band
+# (lifecycle policy, manual cleanup) and only the browser would see that 404, so present
+# entries are re-probed every few minutes rather than trusted for long. Misses are
+# remembered briefly so a cold phrase does not HEAD twice in one turn (peek, then generate).
+_TTS_BLOB_PRESENCE: Dict[str, Tuple[float, bool]] = {}
+_TTS_BLOB_PRESENCE_MAX = 50000
+_TTS_BLOB_PRESENT_TTL_S = _perf_opt_env_float("TTS_BLOB_PRESENT_TTL_S", 300.0, max_value=3600.0)
+_TTS_BLOB_MISSING_TTL_S = _perf_opt_env_float("TTS_BLOB_MISSING_TTL_S", 10.0, max_value=300.0)
+_TTS_BLOB_PRESENCE_LOCK = threading.Lock()
+
+
+def _tts_blob_presence_set(cache_blob: str, present: bool) -> None:
+    with _TTS_BLOB_PRESENCE_LOCK:
+        if len(_TTS_BLOB_PRESENCE) >= _TTS_BLOB_PRESENCE_MAX:
+            _TTS_BLOB_PRESENCE.clear()
+        _TTS_BLOB_PRESENCE[cache_blob] = (time.time(), present)
+
+
+def _tts_cache_blob_exists(blob_client: Any, cache_blob: str, *, trust_missing: bool = True) -> bool:
+    """HEAD the cache blob unless a recent answer is known (misses only if trust_missing)."""
+    with _TTS_BLOB_PRESENCE_LOCK:
+        hit = _TTS_BLOB_PRESENCE.get(cache_blob)
+    if hit:
+        age = time.time() - hit[0]
+        if hit[1] and age < _TTS_BLOB_PRESENT_TTL_S:
+            return True
+        if not hit[1] and trust_missing and age < _TTS_BLOB_MISSING_TTL_S:
+            return False
+
+    # exists() is a single HEAD that already maps 404 to False. A failure here is either
+    # transient (ServiceRequestError: the request never reached the service) or a real
+    # service error; retrying the same HEAD as get_blob_properties() only doubled the
+    # wall-clock, so any failure is reported as "not present" and is not remembered.
+    try:
+        exists = bool(blob_client.exists())
+    except Exception:
+        return False
+    _tts_blob_presence_set(cache_blob, exists)
+    return exists
+
+
+def _tts_resolve_voice_and_text(voice_id: str, text: str, brand: str = "", avatar: str = "", mapping_phonetic: str = "") -> Tuple[str, str]:
+    """Return the (voice_id, normalized text) that TTS generation and caching actually use."""
     # Backend authority: resolve the active DB mapping for voice + phonetic every time.
     # This prevents the first greeting from using a stale browser phonetic or a
     # fallback/front-end voice that differs from subsequent chat replies.
@@ -10408,31 +11294,39 @@ def _tts_audio_url_sync(session_id: str, voice_id: str, text: str, brand: str =
     text = _normalize_tts_generation_text(text, brand=brand, avatar=avatar, mapping_phonetic=mapping_phonetic)
     if not text:
         raise RuntimeError("TTS text is empty")
+    return voice_id, text
+
+
+def _tts_cache_store_sync(blob_client: Any, cache_blob: str, mp3_bytes: bytes) -> str:
+    """Upload freshly generated audio to its deterministic cache blob and return a SAS URL."""
+    # Upload without overwrite to avoid clobbering a concurrent writer.
+    try:
+        from azure.storage.blob import ContentSettings  # type: ignore
+        blob_client.upload_blob(
+            mp3_bytes,
+            overwrite=False,
+            max_concurrency=_BLOB_UPLOAD_CONCURRENCY,
+            content_settings=ContentSettings(content_type="audio/mpeg"),
+        )
+        _tts_blob_presence_set(cache_blob, True)
+    except Exception:
+        # If another worker won the race and uploaded first, just return SAS.
+        pass
+
+    return _azure_blob_sas_url(blob_name=cache_blob)
+
+
+def _tts_audio_url_sync(session_id: str, voice_id: str, text: str, brand: str = "", avatar: str = "", mapping_phonetic: str = "", cache_context: str = "") -> str:
+    voice_id, text = _tts_resolve_voice_and_text(voice_id, text, brand, avatar, mapping_phonetic)
 
     # Cache path: deterministic blob name, cross-session.
     if _TTS_CACHE_ENABLED:
         cache_blob = _tts_cache_blob_name(voice_id=voice_id, text=text, cache_context=cache_context)
         try:
-            from azure.storage.blob import BlobServiceClient  # type: ignore
+            blob_client = _get_container_client(_TTS_CONTAINER).get_blob_client(cache_blob)
 
-            storage_conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
-            if not storage_conn_str:
-                raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not configured")
-
-            blob_service = BlobServiceClient.from_connection_string(storage_conn_str)
-            container_client = blob_service.get_container_client(_TTS_CONTAINER)
-            blob_client = container_client.get_blob_client(cache_blob)
-
-            # Fast existence check (SDK-level). If present, return SAS immediately.
-            exists = False
-            try:
-                exists = bool(blob_client.exists())
-            except Exception:
-                try:
-                    blob_client.get_blob_properties()
-                    exists = True
-                except Exception:
-                    exists = False
+            # Fast existence check (in-process memo, then SDK-level). If present, return SAS immediately.
+            exists = _tts_cache_blob_exists(blob_client, cache_blob)
 
             if exists:
                 _clear_inflight_marker(cache_blob)
@@ -10444,20 +11338,7 @@ def _tts_audio_url_sync(session_id: str, voice_id: str, text: str, brand: str =
 
             _touch_inflight_marker(cache_blob)
             mp3_bytes = _elevenlabs_tts_mp3_bytes(voice_id=voice_id, text=text)
-
-            # Upload without overwrite to avoid clobbering a concurrent writer.
-            try:
-                from azure.storage.blob import ContentSettings  # type: ignore
-                blob_client.upload_blob(
-                    mp3_bytes,
-                    overwrite=False,
-                    content_settings=ContentSettings(content_type="audio/mpeg"),
-                )
-            except Exception:
-                # If another worker won the race and uploaded first, just return SAS.
-                pass
-
-            return _azure_blob_sas_url(blob_name=cache_blob)
+            return _tts_cache_store_sync(blob_client, cache_blob, mp3_bytes)
         except Exception:
             # Fail-open: if cache path fails for any reason, fall back to the legacy per-session upload.
             pass
@@ -10496,6 +11377,8 @@ try:
     _TTS_PREWARM_MAX_VOICES = max(1, int(os.getenv("TTS_PREWARM_MAX_VOICES", "8") or "8"))
 except Exception:
     _TTS_PREWARM_MAX_VOICES = 8
+# Phrase/voice combinations generated at once during prewarm (each one is independent).
+_TTS_PREWARM_CONCURRENCY = max(1, min(16, _env_int("TTS_PREWARM_CONCURRENCY", 4)))
 
 _DEFAULT_PREWARM_PHRASES: list[str] = [
     "Hello!",
@@ -10607,33 +11490,72 @@ async def _tts_prewarm_task() -> None:
     base_phrases = _load_prewarm_phrases()
     # Use a fixed session id; caching ignores session id when _TTS_CACHE_ENABLED is on.
     sid = "prewarm"
-    warmed = 0
-    for target in targets:
-        voice_id = str(target.get("voice_id") or "").strip()
-        if not voice_id:
-            continue
-        for phrase in _tts_prewarm_phrases_for_target(target, base_phrases):
+    sem = asyncio.Semaphore(_TTS_PREWARM_CONCURRENCY)
+
+    # Cache misses are synthesized over one async client so the batch shares a TLS
+    # session (multiplexed when HTTP/2 is available); Azure I/O stays on the shared
+    # sync blob client in the threadpool.
+    eleven_client: Any = None
+    if _TTS_CACHE_ENABLED:
+        try:
+            eleven_client = _make_eleven_async_client()
+        except Exception:
+            eleven_client = None
+
+    def _probe_cache(voice_id: str, text_for_tts: str, brand: str, avatar: str, phonetic: str) -> Tuple[Any, str, str, str, bool]:
+        vid, text = _tts_resolve_voice_and_text(voice_id, text_for_tts, brand, avatar, phonetic)
+        cache_blob = _tts_cache_blob_name(voice_id=vid, text=text, cache_context="")
+        blob_client = _get_container_client(_TTS_CONTAINER).get_blob_client(cache_blob)
+        exists = _tts_cache_blob_exists(blob_client, cache_blob)
+        if not exists:
+            _touch_inflight_marker(cache_blob)
+        return blob_client, cache_blob, vid, text, exists
+
+    async def _warm_one(target: dict[str, str], voice_id: str, phrase: str) -> bool:
+        async with sem:
             try:
+                brand = str(target.get("brand") or "")
+                avatar = str(target.get("avatar") or "")
+                phonetic = str(target.get("phonetic") or "")
                 text_for_tts = _normalize_tts_generation_text(
                     phrase,
-                    brand=str(target.get("brand") or ""),
-                    avatar=str(target.get("avatar") or ""),
-                    mapping_phonetic=str(target.get("phonetic") or ""),
+                    brand=brand,
+                    avatar=avatar,
+                    mapping_phonetic=phonetic,
                 )
-                # run the synchronous generator in a thread to avoid blocking the event loop
-                await run_in_threadpool(
-                    _tts_audio_url_sync,
-                    sid,
-                    voice_id,
-                    text_for_tts,
-                    str(target.get("brand") or ""),
-                    str(target.get("avatar") or ""),
-                    str(target.get("phonetic") or ""),
+                if eleven_client is None:
+                    # run the synchronous generator in a thread to avoid blocking the event loop
+                    await run_in_threadpool(_tts_audio_url_sync, sid, voice_id, text_for_tts, brand, avatar, phonetic)
+                    return True
+
+                blob_client, cache_blob, vid, text, exists = await run_in_threadpool(
+                    _probe_cache, voice_id, text_for_tts, brand, avatar, phonetic
                 )
-                warmed += 1
+                if exists:
+                    return True
+                mp3_bytes = await _elevenlabs_tts_mp3_bytes_async(eleven_client, vid, text)
+                await run_in_threadpool(_tts_cache_store_sync, blob_client, cache_blob, mp3_bytes)
+                return True
             except Exception:
                 # fail-open: ignore
-                continue
+                return False
+
+    jobs = []
+    for target in targets:
+        voice_id = str(target.get("voice_id") or "").strip()
+        if not voice_id:
+            continue
+        for phrase in _tts_prewarm_phrases_for_target(target, base_phrases):
+            jobs.append(_warm_one(target, voice_id, phrase))
+    try:
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+    finally:
+        if eleven_client is not None:
+            try:
+                await eleven_client.aclose()
+            except Exception:
+                pass
+    warmed = sum(1 for r in results if r is True)
     try:
         print(f"[tts-prewarm] warmed {warmed} phrase/voice combinations across {len(targets)} voices")
     except Exception:
@@ -10661,45 +11583,72 @@ async def _startup_tts_prewarm() -> None:
 #   TTS_CHAT_CACHE_FIRST=1|0     (default: 1)
 #   TTS_INFLIGHT_WAIT_MS=1500    (default: 1500ms)
 #   TTS_INFLIGHT_STALE_S=90      (default: 90s)
-#   TTS_INFLIGHT_DIR=/home/tts_inflight
+#   TTS_INFLIGHT_DIR=/dev/shm/tts_inflight  (default: tmpfs when available, else /tmp/tts_inflight;
+#                                           set /home/tts_inflight to coordinate across scaled-out instances)
 
 _TTS_CHAT_CACHE_FIRST = (os.getenv("TTS_CHAT_CACHE_FIRST", "1") or "1").strip().lower() not in {"0","false","no","off"}
 _TTS_INFLIGHT_WAIT_MS = max(0, int(os.getenv("TTS_INFLIGHT_WAIT_MS", "1500") or "1500"))
 _TTS_INFLIGHT_STALE_S = max(10, int(os.getenv("TTS_INFLIGHT_STALE_S", "90") or "90"))
-_TTS_INFLIGHT_DIR = (os.getenv("TTS_INFLIGHT_DIR", "/home/tts_inflight") or "/home/tts_inflight").strip()
+# Markers only coordinate a few seconds of waiting, so they default to RAM-backed tmpfs
+# (shared by all workers on the host) instead of App Service's network-backed /home.
+# Missing a marker only costs a duplicate generation; the cache upload never overwrites.
+_TTS_INFLIGHT_DIR = (
+    (os.getenv("TTS_INFLIGHT_DIR", "") or "").strip()
+    or ("/dev/shm/tts_inflight" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "tts_inflight"))
+)
+try:
+    os.makedirs(_TTS_INFLIGHT_DIR, exist_ok=True)
+except Exception:
+    pass
 
+@lru_cache(maxsize=8192)
 def _inflight_marker_path(cache_blob_name: str) -> str:
-    h = hashlib.sha256((cache_blob_name or "").encode("utf-8")).hexdigest()[:40]
-    return os.path.join(_TTS_INFLIGHT_DIR, f"{h}.lock")
+    # Markers are fanned out into 256 subdirectories by hash prefix (like git's object
+    # store) so no single directory grows to tens of thousands of entries.
+    h = hashlib.blake2b((cache_blob_name or "").encode("utf-8"), digest_size=20).hexdigest()
+    return os.path.join(_TTS_INFLIGHT_DIR, h[:2], f"{h}.lock")
 
 def _touch_inflight_marker(cache_blob_name: str) -> None:
+    # Only the marker's mtime is read, so an existing marker is refreshed with one utime().
+    p = _inflight_marker_path(cache_blob_name)
     try:
-        os.makedirs(_TTS_INFLIGHT_DIR, exist_ok=True)
-        with open(_inflight_marker_path(cache_blob_name), "w", encoding="utf-8") as f:
-            f.write(str(int(time.time())))
+        os.utime(p, None)
+        return
+    except FileNotFoundError:
+        pass
+    except Exception:
+        return
+    try:
+        open(p, "wb").close()
+    except FileNotFoundError:
+        # First marker in this prefix subdirectory (or the directory was removed).
+        try:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            open(p, "wb").close()
+        except Exception:
+            pass
     except Exception:
         pass
 
 def _clear_inflight_marker(cache_blob_name: str) -> None:
     try:
-        p = _inflight_marker_path(cache_blob_name)
-        if os.path.exists(p):
-            os.remove(p)
+        os.remove(_inflight_marker_path(cache_blob_name))
     except Exception:
         pass
 
 def _inflight_marker_is_fresh(cache_blob_name: str) -> bool:
     try:
-        p = _inflight_marker_path(cache_blob_name)
-        if not os.path.exists(p):
-            return False
-        age = time.time() - os.path.getmtime(p)
+        age = time.time() - os.stat(_inflight_marker_path(cache_blob_name)).st_mtime
         return age >= 0 and age <= _TTS_INFLIGHT_STALE_S
     except Exception:
         return False
 
-def _tts_cache_peek_sync(voice_id: str, text: str, cache_context: str = "") -> Optional[str]:
-    """Cache-only lookup: returns SAS URL if deterministic cache blob exists, else None."""
+def _tts_cache_peek_sync(voice_id: str, text: str, cache_context: str = "", trust_missing: bool = True) -> Optional[str]:
+    """Cache-only lookup: returns SAS URL if deterministic cache blob exists, else None.
+
+    trust_missing=False re-checks Azure even after a recent miss (used while waiting on
+    another worker that is generating the same blob).
+    """
     if not _TTS_CACHE_ENABLED:
         return None
     t = (text or "").strip()
@@ -10707,27 +11656,40 @@ def _tts_cache_peek_sync(voice_id: str, text: str, cache_context: str = "") -> O
         return None
     cache_blob = _tts_cache_blob_name(voice_id=voice_id, text=t, cache_context=cache_context)
     try:
-        from azure.storage.blob import BlobServiceClient  # type: ignore
-        storage_conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
-        if not storage_conn_str:
+        if not os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip():
             return None
-        blob_service = BlobServiceClient.from_connection_string(storage_conn_str)
-        container_client = blob_service.get_container_client(_TTS_CONTAINER)
-        blob_client = container_client.get_blob_client(cache_blob)
-        try:
-            if blob_client.exists():
-                return _azure_blob_sas_url(blob_name=cache_blob)
-        except Exception:
-            try:
-                blob_client.get_blob_properties()
-                return _azure_blob_sas_url(blob_name=cache_blob)
-            except Exception:
-                return None
+        blob_client = _get_container_client(_TTS_CONTAINER).get_blob_client(cache_blob)
+        if _tts_cache_blob_exists(blob_client, cache_blob, trust_missing=trust_missing):
+            return _azure_blob_sas_url(blob_name=cache_blob)
     except Exception:
         return None
     return None
 
 
+def _tts_cache_peek_memo(voice_id: str, text: str, cache_context: str = "") -> Optional[str]:
+    """In-memory-only variant of _tts_cache_peek_sync, cheap enough for the event loop.
+
+    Answers only when the blob is already known to exist (no Azure call; the SAS URL is
+    signed locally and memoized). None means "unknown": fall back to the threadpool peek.
+    """
+    if not _TTS_CACHE_ENABLED:
+        return None
+    t = (text or "").strip()
+    if not t:
+        return None
+    try:
+        cache_blob = _tts_cache_blob_name(voice_id=voice_id, text=t, cache_context=cache_context)
+        with _TTS_BLOB_PRESENCE_LOCK:
+            hit = _TTS_BLOB_PRESENCE.get(cache_blob)
+        if not hit or not hit[1] or (time.time() - hit[0]) >= _TTS_BLOB_PRESENT_TTL_S:
+            return None
+        if _BLOB_SERVICE is None:
+            return None
+        return _azure_blob_sas_url(blob_name=cache_blob)
+    except Exception:
+        return None
+
+
 
 
 # ----------------------------
@@ -10812,53 +11774,178 @@ def _infer_image_ext(content_type: str, filename: str) -> str:
 def _azure_upload_bytes_and_get_sas_url(
     *, container_name: str, blob_name: str, content_type: str, data: bytes
 ) -> str:
-    from azure.storage.blob import BlobServiceClient, ContentSettings  # type: ignore
-    from azure.storage.blob import BlobSasPermissions, generate_blob_sas  # type: ignore
+    from azure.storage.blob import ContentSettings  # type: ignore
+
+    container_client = _get_container_client(container_name, ensure=True)
+    blob_client = container_client.get_blob_client(blob_name)
+    blob_client.upload_blob(
+        data,
+        overwrite=True,
+        max_concurrency=_BLOB_UPLOAD_CONCURRENCY,
+        content_settings=ContentSettings(content_type=(content_type or "application/octet-stream")),
+    )
+
+    expiry = datetime.utcnow() + timedelta(days=max(1, min(_UPLOAD_SAS_DAYS, 365)))
+    return _azure_blob_read_sas_url(container_name, blob_name, expiry)
+
+
+# Async (aiohttp-backed) Blob client for request handlers that upload user files, so a
+# large upload is sent as concurrent blocks on the event loop instead of occupying a
+# threadpool slot for the whole transfer. Built lazily inside the running loop.
+_BLOB_SERVICE_AIO: Any = None
+_BLOB_SERVICE_AIO_CONN_STR = ""
+
+
+async def _get_blob_service_aio() -> Any:
+    global _BLOB_SERVICE_AIO, _BLOB_SERVICE_AIO_CONN_STR
 
     storage_conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "").strip()
     if not storage_conn_str:
         raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not configured")
 
-    blob_service = BlobServiceClient.from_connection_string(storage_conn_str)
-    container_client = blob_service.get_container_client(container_name)
+    if _BLOB_SERVICE_AIO is None or _BLOB_SERVICE_AIO_CONN_STR != storage_conn_str:
+        from azure.storage.blob.aio import BlobServiceClient as AioBlobServiceClient  # type: ignore
 
-    # Ensure container exists (best-effort).
-    try:
-        container_client.get_container_properties()
-    except Exception:
+        old = _BLOB_SERVICE_AIO
+        _BLOB_SERVICE_AIO = AioBlobServiceClient.from_connection_string(
+            storage_conn_str,
+            max_single_put_size=_BLOB_MAX_SINGLE_PUT_SIZE,
+            max_block_size=_BLOB_MAX_BLOCK_SIZE,
+        )
+        _BLOB_SERVICE_AIO_CONN_STR = storage_conn_str
+        if old is not None:
+            try:
+                await old.close()
+            except Exception:
+                pass
+    return _BLOB_SERVICE_AIO
+
+
+async def _get_container_client_aio(container_name: str) -> Any:
+    """Async ContainerClient; the container is created (best-effort) once per process."""
+    container_client = (await _get_blob_service_aio()).get_container_client(container_name)
+    with _BLOB_LOCK:
+        ensured = container_name in _BLOB_CONTAINERS_ENSURED
+    if not ensured:
         try:
-            container_client.create_container()
+            await container_client.get_container_properties()
         except Exception:
-            pass
+            try:
+                await container_client.create_container()
+            except Exception:
+                pass
+        with _BLOB_LOCK:
+            _BLOB_CONTAINERS_ENSURED.add(container_name)
+    return container_client
+
 
+async def _azure_upload_bytes_and_get_sas_url_async(
+    *, container_name: str, blob_name: str, content_type: str, data: bytes
+) -> str:
+    """Async counterpart of _azure_upload_bytes_and_get_sas_url."""
+    from azure.storage.blob import ContentSettings  # type: ignore
+
+    container_client = await _get_container_client_aio(container_name)
     blob_client = container_client.get_blob_client(blob_name)
-    blob_client.upload_blob(
+    await blob_client.upload_blob(
         data,
         overwrite=True,
+        max_concurrency=_BLOB_UPLOAD_CONCURRENCY,
+        validate_content=False,
         content_settings=ContentSettings(content_type=(content_type or "application/octet-stream")),
     )
 
-    # Parse AccountName/AccountKey from connection string for SAS
-    parts: Dict[str, str] = {}
-    for seg in storage_conn_str.split(";"):
-        if "=" in seg:
-            k, v = seg.split("=", 1)
-            parts[k] = v
-    account_name = parts.get("AccountName") or getattr(blob_service, "account_name", None)
-    account_key = parts.get("AccountKey")
-    if not account_name or not account_key:
-        raise RuntimeError("Could not parse AccountName/AccountKey from AZURE_STORAGE_CONNECTION_STRING")
+    expiry = datetime.utcnow() + timedelta(days=max(1, min(_UPLOAD_SAS_DAYS, 365)))
+    return _azure_blob_read_sas_url(container_name, blob_name, expiry)
+
+
+async def _azure_stream_upload_and_get_sas_url_async(
+    *, container_name: str, blob_name: str, content_type: str, chunks: Any, max_bytes: int
+) -> Tuple[str, int]:
+    """Upload an async byte stream and return (SAS URL, size) without buffering the whole body.
+
+    Incoming chunks are regrouped into _BLOB_MAX_BLOCK_SIZE blocks that are staged
+    concurrently (at most _BLOB_UPLOAD_CONCURRENCY in flight) and committed at the end,
+    so only a few blocks are resident at once. Bodies of at most _BLOB_MAX_SINGLE_PUT_SIZE
+    go up as a single PUT; a larger body that never fills one block is staged as one block
+    (rather than handed to upload_blob, which would re-split it). Raises HTTPException(413)
+    as soon as the stream exceeds max_bytes.
+    """
+    from azure.storage.blob import BlobBlock, ContentSettings  # type: ignore
+
+    blob_client = None
+    block_ids: List[str] = []
+    pending: Set[Any] = set()
+    buf = bytearray()
+    total = 0
+
+    async def _stage(block_id: str, payload: bytes) -> None:
+        await blob_client.stage_block(block_id, payload, validate_content=False)
+
+    async def _drain(limit: int) -> None:
+        while len(pending) > limit:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                pending.discard(t)
+                t.result()
+
+    async def _stage_next(payload: bytes) -> None:
+        nonlocal blob_client
+        if blob_client is None:
+            blob_client = (await _get_container_client_aio(container_name)).get_blob_client(blob_name)
+        await _drain(_BLOB_UPLOAD_CONCURRENCY - 1)
+        block_id = base64.b64encode(f"{len(block_ids):08d}".encode("ascii")).decode("ascii")
+        block_ids.append(block_id)
+        pending.add(asyncio.ensure_future(_stage(block_id, payload)))
+
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            total += len(chunk)
+            if total > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload too large (max {max_bytes} bytes)")
+            buf.extend(chunk)
+            while len(buf) >= _BLOB_MAX_BLOCK_SIZE:
+                await _stage_next(bytes(buf[:_BLOB_MAX_BLOCK_SIZE]))
+                del buf[:_BLOB_MAX_BLOCK_SIZE]
+
+        if not total:
+            raise HTTPException(status_code=400, detail="Empty upload body")
+
+        if not block_ids and len(buf) <= _BLOB_MAX_SINGLE_PUT_SIZE:
+            url = await _azure_upload_bytes_and_get_sas_url_async(
+                container_name=container_name,
+                blob_name=blob_name,
+                content_type=content_type,
+                data=bytes(buf),
+            )
+            return url, total
+
+        if buf:
+            await _stage_next(bytes(buf))
+            buf = bytearray()
+        await _drain(0)
+        await blob_client.commit_block_list(
+            [BlobBlock(block_id=b) for b in block_ids],
+            content_settings=ContentSettings(content_type=(content_type or "application/octet-stream")),
+        )
+    finally:
+        # Uncommitted blocks are discarded by the service; just stop any in-flight stages.
+        for t in pending:
+            t.cancel()
 
     expiry = datetime.utcnow() + timedelta(days=max(1, min(_UPLOAD_SAS_DAYS, 365)))
-    sas = generate_blob_sas(
-        account_name=account_name,
-        container_name=container_name,
-        blob_name=blob_name,
-        account_key=account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=expiry,
-    )
-    return f"{blob_client.url}?{sas}"
+    return _azure_blob_read_sas_url(container_name, blob_name, expiry), total
+
+
+@app.on_event("shutdown")
+async def _close_blob_service_aio() -> None:
+    try:
+        if _BLOB_SERVICE_AIO is not None:
+            await _BLOB_SERVICE_AIO.close()
+    except Exception:
+        pass
 
 
 @app.post("/files/upload")
@@ -10893,10 +11980,13 @@ async def files_upload(request: Request) -> Dict[str, Any]:
 
     # Only images for now (required by UI preview behavior).
 
-    data = await request.body()
-    if not data:
-        raise HTTPException(status_code=400, detail="Empty upload body")
-    if len(data) > int(_UPLOAD_MAX_BYTES):
+    # Reject oversized bodies up front when the client declares a length; the stream
+    # below still enforces the cap for chunked/undeclared bodies.
+    try:
+        declared = int(request.headers.get("content-length") or 0)
+    except Exception:
+        declared = 0
+    if declared > int(_UPLOAD_MAX_BYTES):
         raise HTTPException(status_code=413, detail=f"Upload too large (max {_UPLOAD_MAX_BYTES} bytes)")
 
     ext = _infer_upload_ext(content_type, filename)
@@ -10908,13 +11998,15 @@ async def files_upload(request: Request) -> Dict[str, Any]:
     )
 
     try:
-        url = await run_in_threadpool(
-            _azure_upload_bytes_and_get_sas_url,
+        url, size = await _azure_stream_upload_and_get_sas_url_async(
             container_name=_UPLOADS_CONTAINER,
             blob_name=blob_name,
             content_type=content_type,
-            data=data,
+            chunks=request.stream(),
+            max_bytes=int(_UPLOAD_MAX_BYTES),
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {type(e).__name__}: {e}")
 
@@ -10922,7 +12014,7 @@ async def files_upload(request: Request) -> Dict[str, Any]:
         "ok": True,
         "url": url,
         "name": filename,
-        "size": len(data),
+        "size": size,
         "contentType": content_type,
         "container": _UPLOADS_CONTAINER,
         "blobName": blob_name,
@@ -10931,6 +12023,25 @@ async def files_upload(request: Request) -> Dict[str, Any]:
 # ----------------------------
 # CHAT (Optimized: optional audio_url in same response)
 # ----------------------------
+async def _request_json_fast(request: Request) -> Any:
+    """request.json() equivalent that parses with orjson when available."""
+    body = await request.body()
+    if _orjson is not None:
+        return _orjson.loads(body)
+    return json.loads(body)
+
+
+# Consent keywords accepted while an intimate-mode consent prompt is pending.
+_CONSENT_YES = frozenset({
+    "yes", "y", "yeah", "yep", "sure", "ok", "okay",
+    "i consent", "i agree", "i confirm", "confirm",
+    "i am 18+", "i'm 18+", "i am over 18", "i'm over 18",
+    "i confirm i am 18+", "i confirm that i am 18+",
+    "i confirm and consent",
+})
+_CONSENT_NO = frozenset({"no", "n", "nope", "nah", "decline", "cancel"})
+
+
 @app.post("/chat", response_model=None)
 async def chat(request: Request):
     """
@@ -10949,7 +12060,7 @@ async def chat(request: Request):
     """
     debug = bool(getattr(settings, "DEBUG", False))
 
-    raw = await request.json()
+    raw = await _request_json_fast(request)
     _perf_stage("chat.parse_json")
     session_id, messages, session_state, wants_explicit = _normalize_payload(raw)
     _perf_stage("chat.normalize_payload", session_id=session_id)
@@ -10998,17 +12109,15 @@ async def chat(request: Request):
     rebranding_parsed = _parse_rebranding_key(rebranding_key_raw) if rebranding_key_raw else {}
 
     # Prefer explicit fields (if provided) and fall back to the parsed RebrandingKey.
-    upgrade_link_override = _session_get_str(session_state, "upgrade_link", "upgradeLink") or rebranding_parsed.get("upgrade_link", "")
-    pay_go_link_override = _session_get_str(session_state, "pay_go_link", "payGoLink") or rebranding_parsed.get("pay_go_link", "")
-    pay_go_price = _session_get_str(session_state, "pay_go_price", "payGoPrice") or rebranding_parsed.get("pay_go_price", "")
-    pay_go_minutes_raw = _session_get_str(session_state, "pay_go_minutes", "payGoMinutes") or rebranding_parsed.get("pay_go_minutes", "")
-    plan_external = (
-        _session_get_str(session_state, "rebranding_plan", "rebrandingPlan", "planExternal", "plan_external")
-        or rebranding_parsed.get("plan", "")
-    )
-    plan_map = _session_get_str(session_state, "elaralo_plan_map", "elaraloPlanMap") or rebranding_parsed.get("elaralo_plan_map", "")
-    free_minutes_raw = _session_get_str(session_state, "free_minutes", "freeMinutes") or rebranding_parsed.get("free_minutes", "")
-    cycle_days_raw = _session_get_str(session_state, "cycle_days", "cycleDays") or rebranding_parsed.get("cycle_days", "")
+    overrides = _rebranding_overrides(session_state, rebranding_parsed)
+    upgrade_link_override = overrides["upgrade_link"]
+    pay_go_link_override = overrides["pay_go_link"]
+    pay_go_price = overrides["pay_go_price"]
+    pay_go_minutes_raw = overrides["pay_go_minutes"]
+    plan_external = overrides["plan"]
+    plan_map = overrides["elaralo_plan_map"]
+    free_minutes_raw = overrides["free_minutes"]
+    cycle_days_raw = overrides["cycle_days"]
 
     pay_go_minutes = _safe_int(pay_go_minutes_raw)
     free_minutes = _safe_int(free_minutes_raw)
@@ -11072,10 +12181,9 @@ async def chat(request: Request):
 
     # For rebranding, construct PAYG_PRICE_TEXT as:
     #   PayGoPrice + " per " + PayGoMinutes + " minutes"
-    is_rebranding = bool(rebranding_key_raw or plan_external or plan_map or upgrade_link_override or pay_go_link_override or pay_go_price)
-
+    # PayGoPrice is itself a rebranding override, so it alone gates the text.
     payg_price_text_override = ""
-    if is_rebranding:
+    if pay_go_price:
         minutes_part = ""
         if pay_go_minutes is not None:
             minutes_part = str(pay_go_minutes)
@@ -11084,13 +12192,62 @@ async def chat(request: Request):
         if pay_go_price and minutes_part:
             payg_price_text_override = f"{pay_go_price} per {minutes_part} minutes"
 
-    usage_ok, usage_info = await run_in_threadpool(
-        _usage_charge_and_check_sync,
-        identity_key,
-        is_trial=is_trial,
-        plan_name=plan_name_for_limits,
-        minutes_allowed_override=minutes_allowed_override,
-        cycle_days_override=cycle_days_override,
+    # Host-override session touch arguments; shared by the paywall and main paths
+    # (exactly one of them runs per request).
+    override_touch_args: Dict[str, Any] = {
+        "session_id": session_id,
+        "session_state": session_state,
+        "identity_key": identity_key,
+        "is_trial": is_trial,
+        "plan_name_for_limits": plan_name_for_limits,
+        "plan_label_for_messages": plan_label_for_messages,
+        "minutes_allowed_override": minutes_allowed_override,
+        "cycle_days_override": cycle_days_override,
+        "upgrade_url": upgrade_link_override,
+        "payg_pay_url": pay_go_link_override,
+        "payg_minutes": pay_go_minutes,
+        "payg_price_text": payg_price_text_override,
+    }
+    # Plan/rebranding fields shared by the paywall and minutes-balance messages.
+    usage_message_args: Dict[str, Any] = {
+        "is_trial": is_trial,
+        "plan_name": plan_label_for_messages,
+        "upgrade_url": upgrade_link_override,
+        "payg_pay_url": pay_go_link_override,
+        "payg_increment_minutes": pay_go_minutes,
+        "payg_price_text": payg_price_text_override,
+    }
+    # Host takeover state as of this request's session touch (None until the touch ran).
+    # Reused by the override branch and _respond instead of re-reading the store.
+    override_active: Optional[bool] = None
+
+    # The onboarding join only depends on the avatar, so warm its cache while the usage
+    # charge runs (both are single SQLite lookups). Only the join: the site summary behind
+    # the HCO blocks can mean a page fetch + LLM call, which turns that return before the
+    # LLM (paywall, balance, consent, override) must not wait on.
+    hco_excluded = _hco_blocks_excluded_for_session(session_state)
+    hco_prefetch_avatar = "" if hco_excluded else _avatar_from_session_state(session_state)
+
+    async def _onboarding_join_prefetch() -> None:
+        if not hco_prefetch_avatar:
+            return None
+        try:
+            await run_in_threadpool(_fetch_onboarding_join_for_avatar_sync, hco_prefetch_avatar)
+        except Exception:
+            # Fail-open: the injection site below runs the join itself on a cache miss.
+            pass
+        return None
+
+    (usage_ok, usage_info), _ = await asyncio.gather(
+        run_in_threadpool(
+            _usage_charge_and_check_sync,
+            identity_key,
+            is_trial=is_trial,
+            plan_name=plan_name_for_limits,
+            minutes_allowed_override=minutes_allowed_override,
+            cycle_days_override=cycle_days_override,
+        ),
+        _onboarding_join_prefetch(),
     )
     try:
         _clear_usage_status_fast_cache(identity_key)
@@ -11102,8 +12259,8 @@ async def chat(request: Request):
     # Special-case: allow "minutes remaining" questions to return a status message
     # even when minutes are exhausted (no OpenAI call).
     probe_text = str(last_user_english_text or "").strip()
-    probe_mode_switch = _detect_mode_switch_from_text(probe_text)
-    is_minutes_balance_query = _is_minutes_balance_question(probe_text) and not bool(probe_mode_switch)
+    probe_intent = _classify_intent(probe_text)
+    is_minutes_balance_query = bool(probe_intent["balance"])
 
 
     if not usage_ok and not is_minutes_balance_query:
@@ -11131,64 +12288,52 @@ async def chat(request: Request):
             }
         )
 
-        # If a host takeover was active, end it and notify the host (minutes are exhausted).
-        try:
-            _ai_override_touch_from_chat(
-                session_id=session_id,
-                session_state=session_state,
-                identity_key=identity_key,
-                is_trial=is_trial,
-                plan_name_for_limits=plan_name_for_limits,
-                plan_label_for_messages=plan_label_for_messages,
-                minutes_allowed_override=minutes_allowed_override,
-                cycle_days_override=cycle_days_override,
-                upgrade_url=upgrade_link_override,
-                payg_pay_url=pay_go_link_override,
-                payg_minutes=pay_go_minutes,
-                payg_price_text=payg_price_text_override,
-            )
-            if last_user_display_text or last_user_english_text:
-                _ai_override_append_event(
-                    session_id,
-                    role="user",
-                    content=(last_user_display_text or last_user_english_text),
-                    sender="user",
-                    audience="all",
-                    kind="message",
-                    payload=last_user_payload,
-                )
+        # If a host takeover was active, end it and notify the host (minutes are exhausted).
+        try:
+            with _ai_override_batch():
+                touch_rec = _ai_override_touch_from_chat(**override_touch_args)
+                override_active = bool(touch_rec.get("override_active") is True)
+                paywall_events: List[Dict[str, Any]] = []
+                if last_user_display_text or last_user_english_text:
+                    paywall_events.append(
+                        {
+                            "role": "user",
+                            "content": (last_user_display_text or last_user_english_text),
+                            "sender": "user",
+                            "audience": "all",
+                            "kind": "message",
+                            "payload": last_user_payload,
+                        }
+                    )
+                if override_active:
+                    _perf_stage("chat.host_override_active")
+                    paywall_events.append(
+                        {
+                            "role": "system",
+                            "content": "Member is out of chat minutes. Host override ended.",
+                            "sender": "system",
+                            "audience": "host",
+                            "kind": "minutes_exhausted",
+                        }
+                    )
+                # One SQLite transaction for the user turn and the minutes-exhausted notice.
+                _ai_override_append_events(session_id, paywall_events)
 
-            if _ai_override_is_active(session_id):
-                _perf_stage("chat.host_override_active")
-                _ai_override_append_event(
-                    session_id,
-                    role="system",
-                    content="Member is out of chat minutes. Host override ended.",
-                    sender="system",
-                    audience="host",
-                    kind="minutes_exhausted",
-                )
-                _ai_override_set_active(
-                    session_id,
-                    enabled=False,
-                    host_member_id=str((_ai_override_get_session(session_id) or {}).get("override_host_member_id") or ""),
-                    reason="member_out_of_minutes",
-                )
+                if override_active:
+                    _ai_override_set_active(
+                        session_id,
+                        enabled=False,
+                        host_member_id=str(touch_rec.get("override_host_member_id") or ""),
+                        reason="member_out_of_minutes",
+                    )
+                    override_active = False
         except Exception:
             pass
 
         # Member should normally see the standard pay/upgrade message.
         # However, if retroactive scheduled content is due, that delivery must override the paywall
         # on this turn so users can receive the missed content even after minutes are exhausted.
-        paywall_reply = _usage_paywall_message(
-            is_trial=is_trial,
-            plan_name=plan_label_for_messages,
-            minutes_allowed=minutes_allowed,
-            upgrade_url=upgrade_link_override,
-            payg_pay_url=pay_go_link_override,
-            payg_increment_minutes=pay_go_minutes,
-            payg_price_text=payg_price_text_override,
-        )
+        paywall_reply = _usage_paywall_message(minutes_allowed=minutes_allowed, **usage_message_args)
 
         # Surface override flag to the UI even on paywalls.
         session_state_out["host_override_active"] = False
@@ -11210,35 +12355,24 @@ async def chat(request: Request):
                 if brand_slug_for_content and member_id_for_content
                 else member_id_for_content
             )
-            friend_first_turn_content: Optional[Dict[str, Any]] = None
-            mode_specific_content: Optional[Dict[str, Any]] = None
-            if brand_slug_for_content and member_key_for_content:
-                friend_first_turn_content = _content_deliver_friend_first_turn_once_per_24h(
-                    session_id=session_id,
-                    brand_slug=brand_slug_for_content,
-                    member_key=member_key_for_content,
-                    base_url=str(request.base_url),
-                    now_epoch=time.time(),
-                )
-            if (
-                folder_for_content
-                and folder_for_content != "friend"
-                and brand_slug_for_content
-                and member_key_for_content
-                and _content_folder_allowed_for_member(member_key_for_content, folder_for_content, False)
-            ):
-                mode_specific_content = _content_deliver_to_user_if_due(
-                    session_id=session_id,
-                    brand_slug=brand_slug_for_content,
-                    member_key=member_key_for_content,
-                    folder=folder_for_content,
-                    cycle_id=str(usage_info.get("cycle_start_epoch") or ""),
-                    cycle_used_seconds=float(usage_info.get("used_seconds") or 0.0),
-                    base_url=str(request.base_url),
-                    now_epoch=time.time(),
-                    force_user_delivery=True,
-                )
-            delivered_content = _content_merge_delivery_payloads(friend_first_turn_content, mode_specific_content)
+            delivered_content = await _content_writer_call(
+                _content_deliver_first_turn_and_due,
+                session_id=session_id,
+                brand_slug=brand_slug_for_content,
+                member_key=member_key_for_content,
+                folder=folder_for_content,
+                deliver_mode_content=bool(
+                    folder_for_content
+                    and folder_for_content != "friend"
+                    and brand_slug_for_content
+                    and member_key_for_content
+                    and _content_folder_allowed_for_member(member_key_for_content, folder_for_content, False)
+                ),
+                cycle_id=str(usage_info.get("cycle_start_epoch") or ""),
+                cycle_used_seconds=float(usage_info.get("used_seconds") or 0.0),
+                base_url=str(request.base_url),
+                force_user_delivery=True,
+            )
         except Exception:
             delivered_content = None
 
@@ -11289,24 +12423,31 @@ async def chat(request: Request):
                 memory_key = key
 
         if memory_key:
-            _refresh_summary_store_if_needed()
-            rec = _CHAT_SUMMARY_STORE.get(memory_key) or {}
-            s = rec.get('summary')
-            if isinstance(s, str) and s.strip():
-                saved_summary = s.strip()
+            saved_summary = _get_saved_summary(memory_key)
     except Exception:
         saved_summary = None
         memory_key = None
     _perf_stage("chat.summary_lookup", has_summary=bool(saved_summary))
 
     # Helper to build responses consistently and optionally include audio_url.
+    # `state_out` must be a caller-owned copy (every branch builds its own
+    # session_state_out); it is updated in place and returned as session_state.
     async def _respond(reply: str, status_mode: str, state_out: Dict[str, Any], content: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         # Ensure the frontend can reflect whether a human host takeover is active.
+        # `override_active` was captured at touch time; a host can take over while the
+        # LLM call is in flight, so re-read the in-process hot record (no DB/file I/O).
         try:
-            state_out = dict(state_out)
-            state_out["host_override_active"] = bool(_ai_override_is_active(session_id))
+            if override_active is None:
+                host_override_now = _ai_override_is_active(session_id)
+            else:
+                host_override_now = bool(override_active)
+                if not host_override_now:
+                    with _AI_OVERRIDE_LOCK:
+                        hot_rec = _AI_OVERRIDE_SESSIONS.get((session_id or "").strip())
+                    host_override_now = bool(isinstance(hot_rec, dict) and hot_rec.get("override_active") is True)
+            state_out["host_override_active"] = host_override_now
         except Exception:
-            state_out = dict(state_out)
+            pass
 
         translation_state = _session_translation_context(state_out)
         state_out["translator_enabled"] = bool(translation_state.get("enabled"))
@@ -11334,7 +12475,11 @@ async def chat(request: Request):
         state_out["translation_notice_sent"] = bool(notice_sent)
         state_out["translationNoticeSent"] = bool(notice_sent)
 
-        display_reply, reply_translation = await run_in_threadpool(_assistant_display_text, reply_text, translation_state)
+        if _display_text_needs_translation(reply_text, translation_state):
+            display_reply, reply_translation = await run_in_threadpool(_assistant_display_text, reply_text, translation_state)
+        else:
+            # Empty (host-override) or untranslated replies: no I/O, skip the threadpool hop.
+            display_reply, reply_translation = _assistant_display_text(reply_text, translation_state)
         _perf_stage("chat.display_text_ready")
 
         audio_url: Optional[str] = None
@@ -11381,7 +12526,10 @@ async def chat(request: Request):
 
                 tts_cache_context = _tts_phonetic_cache_context(tts_brand, tts_avatar, tts_mapping_phonetic)
                 if _TTS_CHAT_CACHE_FIRST and _TTS_CACHE_ENABLED:
-                    audio_url = await run_in_threadpool(_tts_cache_peek_sync, effective_voice_id, tts_reply_text, tts_cache_context)
+                    # Known-present blobs are answered inline; only unknown ones need a HEAD.
+                    audio_url = _tts_cache_peek_memo(effective_voice_id, tts_reply_text, tts_cache_context)
+                    if audio_url is None:
+                        audio_url = await run_in_threadpool(_tts_cache_peek_sync, effective_voice_id, tts_reply_text, tts_cache_context)
                 if audio_url is None:
                     audio_url = await run_in_threadpool(
                         _tts_audio_url_sync,
@@ -11396,7 +12544,6 @@ async def chat(request: Request):
             except Exception as e:
                 # Fail-open: never break chat because TTS failed
                 _dbg(debug, "TTS generation failed:", repr(e))
-                state_out = dict(state_out)
                 state_out["tts_error"] = f"{type(e).__name__}: {e}"
             finally:
                 _perf_stage("chat.tts_complete", has_audio=bool(audio_url))
@@ -11444,23 +12591,18 @@ async def chat(request: Request):
         session_state_out["mode"] = session_state_out.get("mode") or "friend"
 
         reply = _usage_status_message(
-            is_trial=is_trial,
-            plan_name=plan_label_for_messages,
             minutes_used=minutes_used,
             minutes_allowed=minutes_allowed,
             minutes_remaining=minutes_remaining,
             cycle_days=effective_cycle_days,
-            upgrade_url=upgrade_link_override,
-            payg_pay_url=pay_go_link_override,
-            payg_increment_minutes=pay_go_minutes,
-            payg_price_text=payg_price_text_override,
+            **usage_message_args,
         )
         return await _respond(reply, STATUS_SAFE, session_state_out)
 
-    # last user message
-    user_text = str(last_user_english_text or "").strip()
+    # last user message (already extracted and stripped for the minutes-balance probe)
+    user_text = probe_text
     user_display_text = str(last_user_display_text or user_text).strip()
-    normalized_text = user_text.lower().strip()
+    normalized_text = user_text.lower()
 
     async def _human_photo_response_if_requested(
         state_for_delivery: Dict[str, Any],
@@ -11537,7 +12679,9 @@ async def chat(request: Request):
     # context switching cannot bypass plan gating.
     allowed_modes_for_session = _allowed_modes_from_session_state(session_state)
     context_auto_enabled = _session_state_is_context_auto_mode_ai_connect(session_state)
-    detected_switch = _detect_mode_switch_from_text(user_text)
+    # Same turn text as the minutes-balance probe above; classify it only once.
+    user_intent = probe_intent
+    detected_switch = user_intent["mode"]
     auto_detected_mode = None
     if detected_switch:
         if _mode_allowed_by_session(detected_switch, allowed_modes_for_session):
@@ -11573,7 +12717,7 @@ async def chat(request: Request):
         intimate_allowed = False
 
     # if user is requesting intimate OR the UI/backend inferred intimate mode, treat as intimate request.
-    raw_user_requesting_intimate = bool(wants_explicit or requested_intimate or _looks_intimate(user_text))
+    raw_user_requesting_intimate = bool(wants_explicit or requested_intimate or user_intent["intimate"])
     intimate_mode_entitled = _mode_allowed_by_session("intimate", allowed_modes_for_session)
     if context_auto_enabled and raw_user_requesting_intimate and not intimate_mode_entitled:
         session_state_out = dict(session_state)
@@ -11588,16 +12732,6 @@ async def chat(request: Request):
         )
     user_requesting_intimate = raw_user_requesting_intimate and intimate_mode_entitled
 
-    # consent keywords
-    CONSENT_YES = {
-        "yes", "y", "yeah", "yep", "sure", "ok", "okay",
-        "i consent", "i agree", "i confirm", "confirm",
-        "i am 18+", "i'm 18+", "i am over 18", "i'm over 18",
-        "i confirm i am 18+", "i confirm that i am 18+",
-        "i confirm and consent",
-    }
-    CONSENT_NO = {"no", "n", "nope", "nah", "decline", "cancel"}
-
     pending = (session_state.get("pending_consent") or "")
     pending = pending.strip().lower() if isinstance(pending, str) else ""
 
@@ -11624,7 +12758,7 @@ async def chat(request: Request):
 
     # If we are waiting on consent, only accept yes/no
     if pending == "intimate" and not intimate_allowed:
-        if normalized_text in CONSENT_YES:
+        if normalized_text in _CONSENT_YES:
             session_state_out = _grant_intimate(session_state)
             if member_id and not is_anon and _session_state_is_context_auto_mode_ai_connect(session_state_out):
                 saved = await run_in_threadpool(_record_member_intimate_consent_sync, member_id, session_state_out, session_id)
@@ -11635,7 +12769,7 @@ async def chat(request: Request):
                 session_state_out,
             )
 
-        if normalized_text in CONSENT_NO:
+        if normalized_text in _CONSENT_NO:
             session_state_out = dict(session_state)
             session_state_out["pending_consent"] = None
             session_state_out["explicit_consented"] = False
@@ -11721,37 +12855,29 @@ async def chat(request: Request):
     # ----------------------------
     # Track this session for host visibility and, if overridden, bypass the LLM.
     try:
-        _ai_override_touch_from_chat(
-            session_id=session_id,
-            session_state=session_state,
-            identity_key=identity_key,
-            is_trial=is_trial,
-            plan_name_for_limits=plan_name_for_limits,
-            plan_label_for_messages=plan_label_for_messages,
-            minutes_allowed_override=minutes_allowed_override,
-            cycle_days_override=cycle_days_override,
-            upgrade_url=upgrade_link_override,
-            payg_pay_url=pay_go_link_override,
-            payg_minutes=pay_go_minutes,
-            payg_price_text=payg_price_text_override,
-        )
+        # One JSON-store write for the session touch + transcript append.
+        with _ai_override_batch():
+            touch_rec = _ai_override_touch_from_chat(**override_touch_args)
+            override_active = bool(touch_rec.get("override_active") is True)
 
-        # Append the newest user message for the host transcript.
-        if last_user_display_text or last_user_english_text:
-            _ai_override_append_event(
-                session_id,
-                role="user",
-                content=(last_user_display_text or last_user_english_text),
-                sender="user",
-                audience="all",
-                kind="message",
-                payload=last_user_payload,
-            )
+            # Append the newest user message for the host transcript.
+            if last_user_display_text or last_user_english_text:
+                _ai_override_append_event(
+                    session_id,
+                    role="user",
+                    content=(last_user_display_text or last_user_english_text),
+                    sender="user",
+                    audience="all",
+                    kind="message",
+                    payload=last_user_payload,
+                )
     except Exception:
         pass
 
     # If the host has taken over this session, do NOT call OpenAI/xAI.
-    if _ai_override_is_active(session_id):
+    if override_active is None:
+        override_active = _ai_override_is_active(session_id)
+    if override_active:
         session_state_out = dict(session_state)
         session_state_out["mode"] = effective_mode
         session_state_out["pending_consent"] = None if intimate_allowed else session_state_out.get("pending_consent")
@@ -11776,7 +12902,8 @@ async def chat(request: Request):
             brand_slug = _content_brand_slug(session_state_out)
             member_key_for_content = f"{brand_slug}::{member_id_norm}" if brand_slug and member_id_norm else member_id_norm
             if brand_slug and member_key_for_content:
-                friend_first_turn_content = _content_deliver_friend_first_turn_once_per_24h(
+                friend_first_turn_content = await _content_writer_call(
+                    _content_deliver_friend_first_turn_once_per_24h,
                     session_id=session_id,
                     brand_slug=brand_slug,
                     member_key=member_key_for_content,
@@ -11793,7 +12920,8 @@ async def chat(request: Request):
             folder = _content_folder_for_mode(effective_mode)
             member_key_for_content = f"{brand_slug}::{member_id_norm}" if brand_slug and member_id_norm else member_id_norm
             if folder != "friend" and _content_folder_allowed_for_member(member_key_for_content, folder, intimate_allowed):
-                _content_queue_pending_for_host(
+                await _content_writer_call(
+                    _content_queue_pending_for_host,
                     request=request,
                     session_id=session_id,
                     member_id=member_id_norm,
@@ -11827,12 +12955,9 @@ async def chat(request: Request):
         return requested_photo_response
 
     if llm_provider == "openai" and in_session_summaries:
-        sanitized: List[str] = []
-        for s in in_session_summaries:
-            ss = _sanitize_summary_for_safe_mode(s)
-            if ss:
-                sanitized.append(ss)
-        in_session_summaries = sanitized
+        in_session_summaries = [
+            ss for ss in (_sanitize_summary_for_safe_mode(s) for s in in_session_summaries) if ss
+        ]
 
     try:
         llm_messages = _to_openai_messages(
@@ -11857,8 +12982,11 @@ async def chat(request: Request):
         avatar_name = _avatar_from_session_state(session_state)
 
         extra_system_blocks: List[str] = []
-        if avatar_name:
-            # Cached: avoids repeated SQLite joins + string building.
+        if avatar_name and hco_excluded:
+            _dbg(debug, f"[hco] companion type excludes onboarding/site injection for avatar={avatar_name!r}")
+        elif avatar_name:
+            # Cached: avoids repeated SQLite joins + string building (the join itself was
+            # warmed alongside the usage charge above).
             extra_system_blocks = await run_in_threadpool(_get_hco_system_blocks_cached_sync, avatar_name)
             _perf_stage("chat.hco_blocks_loaded", count=len(extra_system_blocks or []))
             if not extra_system_blocks:
@@ -11866,11 +12994,11 @@ async def chat(request: Request):
         else:
             _dbg(debug, "[hco] no avatar in session_state; skipping onboarding/site injection")
 
-        # Inject these blocks immediately after the base persona system prompt
-        insert_at = 1
+        # Inject these blocks immediately after the base persona system prompt.
+        # They are collected in order and spliced in once below (no per-block list.insert).
+        injected: List[Dict[str, Any]] = []
         for block in extra_system_blocks:
-            llm_messages.insert(insert_at, {"role": "system", "content": block})
-            insert_at += 1
+            injected.append({"role": "system", "content": block})
 
         # Host companion guidelines + approved Host Profile Studio persona block.
         # v10.0.0-alpha15.11 caches these hot-path prompt fragments while preserving
@@ -11879,8 +13007,7 @@ async def chat(request: Request):
         prompt_fragments = await run_in_threadpool(_chat_companion_prompt_blocks_cached_sync, brand_name, avatar_name)
         for block in list((prompt_fragments or {}).get("blocks") or []):
             if (block or "").strip():
-                llm_messages.insert(insert_at, {"role": "system", "content": str(block)})
-                insert_at += 1
+                injected.append({"role": "system", "content": str(block)})
         _perf_stage(
             "chat.companion_prompt_fragments_loaded",
             has_guidelines=bool((prompt_fragments or {}).get("has_guidelines")),
@@ -11893,13 +13020,11 @@ async def chat(request: Request):
 
         identity_blocks = _chat_identity_system_blocks(session_state)
         for block in identity_blocks:
-            llm_messages.insert(insert_at, {"role": "system", "content": block})
-            insert_at += 1
+            injected.append({"role": "system", "content": block})
 
         phonetic_guidance_block = _chat_phonetic_guidance_block(session_state)
         if phonetic_guidance_block:
-            llm_messages.insert(insert_at, {"role": "system", "content": phonetic_guidance_block})
-            insert_at += 1
+            injected.append({"role": "system", "content": phonetic_guidance_block})
 
         # Memory policy: do not guess about prior conversations.
         # - If a saved summary is injected, you may use ONLY that as cross-session context.
@@ -11907,69 +13032,58 @@ async def chat(request: Request):
         # Platform capability policy:
         # - This app can speak your replies via TTS / Live Avatar. Do not claim you "don't have TTS".
         memory_policy = _CHAT_MEMORY_CAPABILITY_POLICY
-        llm_messages.insert(insert_at, {"role": "system", "content": memory_policy})
-        insert_at += 1
+        injected.append({"role": "system", "content": memory_policy})
 
         language_capability_policy = _CHAT_LANGUAGE_CAPABILITY_POLICY
-        llm_messages.insert(insert_at, {"role": "system", "content": language_capability_policy})
-        insert_at += 1
+        injected.append({"role": "system", "content": language_capability_policy})
 
         vision_policy = _CHAT_VISION_POLICY
-        llm_messages.insert(insert_at, {"role": "system", "content": vision_policy})
-        insert_at += 1
+        injected.append({"role": "system", "content": vision_policy})
 
         content_delivery_policy = _CHAT_CONTENT_DELIVERY_POLICY
-        llm_messages.insert(insert_at, {"role": "system", "content": content_delivery_policy})
-        insert_at += 1
+        injected.append({"role": "system", "content": content_delivery_policy})
 
         if bool(translation_ctx.get("enabled")) and not _is_english_language(translation_ctx.get("user_language_code")):
             translation_policy = _chat_translation_policy_cached(
                 str(translation_ctx.get("user_language_code") or "en"),
                 str(translation_ctx.get("user_language_name") or ""),
             )
-            llm_messages.insert(insert_at, {"role": "system", "content": translation_policy})
-            insert_at += 1
+            injected.append({"role": "system", "content": translation_policy})
 
         if provider_switched:
-            llm_messages.insert(
-                insert_at,
+            injected.append(
                 {
                     "role": "system",
                     "content": _chat_provider_switch_policy_cached(llm_provider, effective_mode),
-                },
+                }
             )
-            insert_at += 1
 
         if safe_saved_summary:
             max_saved_chars = int(os.getenv("LLM_SAVED_SUMMARY_MAX_CHARS", "2500") or "2500")
             safe_saved_summary = _clamp_text(safe_saved_summary, max_saved_chars)
-            llm_messages.insert(
-                insert_at,
+            injected.append(
                 {
                     "role": "system",
                     "content": "Saved conversation summary (user-authorized, for reference across devices):\n" + safe_saved_summary,
-                },
+                }
             )
-            insert_at += 1
 
         if in_session_summaries:
             item_max = int(os.getenv("LLM_IN_SESSION_SUMMARY_ITEM_MAX_CHARS", "900") or "900")
             joined_summaries = "\n- " + "\n- ".join([
                 _clamp_text(s, item_max) for s in in_session_summaries if (s or '').strip()
             ])
-            llm_messages.insert(
-                insert_at,
+            injected.append(
                 {
                     "role": "system",
                     "content": "In-session conversation summaries (most recent last):" + joined_summaries,
-                },
+                }
             )
-            insert_at += 1
 
         if handoff_note:
-            llm_messages.insert(insert_at, {"role": "system", "content": handoff_note})
-            insert_at += 1
+            injected.append({"role": "system", "content": handoff_note})
 
+        llm_messages[1:1] = injected
         _perf_stage("chat.prompt_injection_complete", messages=len(llm_messages))
 
         # Final server-side compaction pass (frontend already trims, but this prevents
@@ -11979,9 +13093,9 @@ async def chat(request: Request):
         had_user_image_input = _llm_messages_have_user_image_input(llm_messages)
         _perf_stage("chat.prompt_ready", messages=len(llm_messages), provider=llm_provider)
         if llm_provider == "xai":
-            assistant_reply = _call_xai_chat(llm_messages)
+            assistant_reply = await _call_xai_chat_async(llm_messages)
         else:
-            assistant_reply = _call_gpt4o(llm_messages)
+            assistant_reply = await _call_gpt4o_async(llm_messages)
         _perf_stage("chat.llm_complete", provider=llm_provider)
         assistant_reply = _sanitize_assistant_reply_for_platform_content(assistant_reply)
         assistant_reply = _sanitize_assistant_reply_for_image_policy(
@@ -11995,16 +13109,14 @@ async def chat(request: Request):
 
 
 # echo back session_state (ensure correct mode)
-    session_state_out = dict(session_state)
-    session_state_out["mode"] = effective_mode
+    # Reuse the copy built for the photo check: it was not delivered, so it is still an
+    # untouched copy of session_state with mode/provider/pending_consent already applied.
+    session_state_out = session_state_out_photo
     # Surface the active provider/model to the frontend (SessionState.model exists already).
-    session_state_out["llm_provider"] = llm_provider
-    session_state_out["model_provider"] = llm_provider  # back-compat alias
     if llm_provider == "xai":
-        session_state_out["model"] = (os.getenv("XAI_MODEL", "") or "grok-4").strip()
+        session_state_out["model"] = _XAI_MODEL
     else:
-        session_state_out["model"] = (os.getenv("OPENAI_MODEL", "") or "gpt-4o").strip()
-    session_state_out["pending_consent"] = None if intimate_allowed else session_state_out.get("pending_consent")
+        session_state_out["model"] = _OPENAI_MODEL
     session_state_out["companion_meta"] = _parse_companion_meta(_extract_companion_raw(session_state_out))
 
 
@@ -12016,28 +13128,21 @@ async def chat(request: Request):
         brand_slug = _content_brand_slug(session_state_out)
         folder = _content_folder_for_mode(effective_mode)
         member_key_for_content = f"{brand_slug}::{member_id_norm}" if brand_slug and member_id_norm else member_id_norm
-        friend_first_turn_content: Optional[Dict[str, Any]] = None
-        mode_specific_content: Optional[Dict[str, Any]] = None
-        if brand_slug and member_key_for_content:
-            friend_first_turn_content = _content_deliver_friend_first_turn_once_per_24h(
-                session_id=session_id,
-                brand_slug=brand_slug,
-                member_key=member_key_for_content,
-                base_url=str(request.base_url),
-                now_epoch=time.time(),
-            )
-        if member_key_for_content and folder != "friend" and _content_folder_allowed_for_member(member_key_for_content, folder, intimate_allowed):
-            mode_specific_content = _content_deliver_to_user_if_due(
-                session_id=session_id,
-                brand_slug=brand_slug,
-                member_key=member_key_for_content,
-                folder=folder,
-                cycle_id=str((usage_info or {}).get("cycle_start_epoch") or ""),
-                cycle_used_seconds=float((usage_info or {}).get("used_seconds") or 0),
-                base_url=str(request.base_url),
-                now_epoch=time.time(),
-            )
-        delivered_content = _content_merge_delivery_payloads(friend_first_turn_content, mode_specific_content)
+        delivered_content = await _content_writer_call(
+            _content_deliver_first_turn_and_due,
+            session_id=session_id,
+            brand_slug=brand_slug,
+            member_key=member_key_for_content,
+            folder=folder,
+            deliver_mode_content=bool(
+                member_key_for_content
+                and folder != "friend"
+                and _content_folder_allowed_for_member(member_key_for_content, folder, intimate_allowed)
+            ),
+            cycle_id=str((usage_info or {}).get("cycle_start_epoch") or ""),
+            cycle_used_seconds=float((usage_info or {}).get("used_seconds") or 0),
+            base_url=str(request.base_url),
+        )
     except Exception:
         delivered_content = None
     _perf_stage("chat.content_delivery", has_content=bool(delivered_content))
@@ -12181,21 +13286,19 @@ async def llm_warm(raw: Dict[str, Any] = Body(...)):
     try:
         if provider == "xai":
             client = _get_xai_client()
-            stream_env = (os.getenv("XAI_STREAM", "1") or "1").strip().lower()
-            use_stream = stream_env not in ("0", "false", "no", "off")
             _chat_completion_text(
                 client,
-                model=(os.getenv("XAI_MODEL", "") or "grok-4").strip(),
+                model=_XAI_MODEL,
                 messages=warm_messages,
                 temperature=0.0,
                 max_tokens=1,
-                stream=use_stream,
+                stream=_XAI_STREAM,
             )
         else:
             client = _get_openai_client()
             _chat_completion_text(
                 client,
-                model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+                model=_OPENAI_MODEL,
                 messages=warm_messages,
                 temperature=0.0,
                 max_tokens=1,
@@ -12208,6 +13311,43 @@ async def llm_warm(raw: Dict[str, Any] = Body(...)):
     return {"ok": True, "provider": provider, "mode": mode}
 
 
+_COMPANION_WARMUP_CONCURRENCY = max(1, _env_int("COMPANION_WARMUP_CONCURRENCY", 8))
+_COMPANION_WARMUP_MAX_AVATARS = 32
+
+
+@app.post("/warmup")
+async def companions_warmup(raw: Dict[str, Any] = Body(...)):
+    """Pre-load onboarding + public-site blocks for several companions at once.
+
+    Body: {"avatars": ["Dulce", ...]}. Each avatar goes through the same cached path
+    /chat uses (_get_hco_system_blocks_cached_sync), so cold joins, site fetches and
+    summaries run concurrently (bounded, to respect LLM rate limits) instead of on
+    the first turn with each companion. Side-effect free apart from warming caches.
+    """
+    avatars_raw = raw.get("avatars") or raw.get("companions") or []
+    if isinstance(avatars_raw, str):
+        avatars_raw = [avatars_raw]
+    if not isinstance(avatars_raw, list):
+        avatars_raw = []
+
+    avatars: List[str] = list(
+        dict.fromkeys(str(a or "").strip() for a in avatars_raw if str(a or "").strip())
+    )[:_COMPANION_WARMUP_MAX_AVATARS]
+
+    sem = asyncio.Semaphore(_COMPANION_WARMUP_CONCURRENCY)
+
+    async def _warmup_one(avatar: str) -> int:
+        async with sem:
+            try:
+                blocks = await run_in_threadpool(_get_hco_system_blocks_cached_sync, avatar)
+                return len(blocks or [])
+            except Exception:
+                return 0
+
+    counts = await asyncio.gather(*[_warmup_one(a) for a in avatars])
+    return {"ok": True, "avatars": dict(zip(avatars, counts))}
+
+
 
 
 # =============================================================================
@@ -12263,10 +13403,37 @@ def _ai_override_load() -> None:
         return
 
 
+_AI_OVERRIDE_BATCH = threading.local()
+
+
+@contextmanager
+def _ai_override_batch():
+    """Coalesce _ai_override_persist calls made on this thread into one write at exit.
+
+    Each persist rewrites the whole JSON file, and a single host/content action often
+    touches the store several times (record update + one or more appended events).
+    """
+    depth = int(getattr(_AI_OVERRIDE_BATCH, "depth", 0) or 0)
+    _AI_OVERRIDE_BATCH.depth = depth + 1
+    if depth == 0:
+        _AI_OVERRIDE_BATCH.dirty = False
+    try:
+        yield
+    finally:
+        _AI_OVERRIDE_BATCH.depth = depth
+        if depth == 0 and getattr(_AI_OVERRIDE_BATCH, "dirty", False):
+            _AI_OVERRIDE_BATCH.dirty = False
+            with _AI_OVERRIDE_LOCK:
+                _ai_override_persist()
+
+
 def _ai_override_persist() -> None:
     global _AI_OVERRIDE_FILE_MTIME
     if not _AI_OVERRIDE_FILE:
         return
+    if int(getattr(_AI_OVERRIDE_BATCH, "depth", 0) or 0) > 0:
+        _AI_OVERRIDE_BATCH.dirty = True
+        return
     try:
         tmp = _AI_OVERRIDE_FILE + ".tmp"
         with open(tmp, "w", encoding="utf-8") as f:
@@ -12430,12 +13597,34 @@ def _ai_override_db_append_event(
     user_name: Optional[str] = None,
     payload: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
+    evs = _ai_override_db_append_events(
+        session_id,
+        [
+            {
+                "role": role,
+                "content": content,
+                "sender": sender,
+                "audience": audience,
+                "kind": kind,
+                "user_name": user_name,
+                "payload": payload,
+            }
+        ],
+    )
+    return evs[0] if evs else {}
+
+
+def _ai_override_db_append_events(session_id: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Append several events for one session in a single transaction.
+
+    Each item takes the _ai_override_db_append_event keyword fields. Sequence numbers
+    are allocated consecutively, in order, under one BEGIN IMMEDIATE.
+    """
     sid = str(session_id or "").strip()
-    if not sid:
-        return {}
+    if not sid or not events:
+        return []
 
     now = time.time()
-    payload_json = json.dumps(payload, ensure_ascii=False) if payload is not None else None
     conn = _ai_override_db_connect()
     try:
         _ai_override_db_ensure_schema(conn)
@@ -12462,46 +13651,62 @@ def _ai_override_db_append_event(
                 (sid, current_seq, now, now),
             )
 
-        next_seq = current_seq + 1
+        rows: List[Tuple[Any, ...]] = []
+        out: List[Dict[str, Any]] = []
+        for spec in events:
+            current_seq += 1
+            role = str(spec.get("role") or "").strip()
+            content = str(spec.get("content") or "")
+            sender = str(spec.get("sender") or "").strip()
+            audience = str(spec.get("audience") or "all").strip() or "all"
+            kind = str(spec.get("kind") or "message").strip() or "message"
+            user_name = spec.get("user_name")
+            payload = spec.get("payload")
+            payload_json = json.dumps(payload, ensure_ascii=False) if payload is not None else None
+            rows.append(
+                (
+                    sid,
+                    current_seq,
+                    now,
+                    role,
+                    content,
+                    sender,
+                    audience,
+                    kind,
+                    str(user_name or "").strip() or None,
+                    payload_json,
+                    now,
+                )
+            )
+            ev: Dict[str, Any] = {
+                "seq": current_seq,
+                "ts": now,
+                "role": role,
+                "content": content,
+                "sender": sender,
+                "audience": audience,
+                "kind": kind,
+            }
+            if user_name:
+                ev["user_name"] = str(user_name).strip()
+            if payload is not None:
+                ev["payload"] = payload
+            out.append(ev)
+
         cur.execute(
             "UPDATE ai_override_sessions SET seq=?, last_seen=?, updated_epoch=? WHERE session_id=?",
-            (next_seq, now, now, sid),
+            (current_seq, now, now, sid),
         )
-        cur.execute(
+        cur.executemany(
             """
             INSERT OR REPLACE INTO ai_override_events
             (session_id, seq, ts, role, content, sender, audience, kind, user_name, payload_json, created_epoch)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (
-                sid,
-                next_seq,
-                now,
-                str(role or "").strip(),
-                str(content or ""),
-                str(sender or "").strip(),
-                str(audience or "all").strip() or "all",
-                str(kind or "message").strip() or "message",
-                str(user_name or "").strip() or None,
-                payload_json,
-                now,
-            ),
+            rows,
         )
         conn.commit()
-        ev: Dict[str, Any] = {
-            "seq": next_seq,
-            "ts": now,
-            "role": str(role or "").strip(),
-            "content": str(content or ""),
-            "sender": str(sender or "").strip(),
-            "audience": str(audience or "all").strip() or "all",
-            "kind": str(kind or "message").strip() or "message",
-        }
-        if user_name:
-            ev["user_name"] = str(user_name).strip()
-        if payload is not None:
-            ev["payload"] = payload
-        return ev
+        return out
     finally:
         try:
             conn.close()
@@ -13046,44 +14251,59 @@ def _ai_override_append_event(
     can see both user and companion messages across multiple workers. Memory/file state
     is still updated as a best-effort hot cache for the currently serving worker.
     """
+    evs = _ai_override_append_events(
+        session_id,
+        [
+            {
+                "role": role,
+                "content": content,
+                "sender": sender,
+                "audience": audience,
+                "kind": kind,
+                "user_name": user_name,
+                "payload": payload,
+            }
+        ],
+    )
+    return evs[0] if evs else {}
+
+
+def _ai_override_append_events(session_id: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Append several events (same fields as _ai_override_append_event) in one go.
+
+    One SQLite transaction, one hot-cache update and one session upsert for the batch,
+    instead of one of each per event.
+    """
 
     sid = str(session_id or "").strip()
-    if not sid:
-        return {}
+    if not sid or not events:
+        return []
 
     base_rec = _ai_override_db_get_session(sid) or {}
     fallback_now = time.time()
-    ev: Dict[str, Any]
+    evs: List[Dict[str, Any]]
 
     try:
-        ev = _ai_override_db_append_event(
-            sid,
-            role=role,
-            content=content,
-            sender=sender,
-            audience=audience,
-            kind=kind,
-            user_name=user_name,
-            payload=payload,
-        )
-        event_seq = int(ev.get("seq") or 0)
-        ts = float(ev.get("ts") or fallback_now)
+        evs = _ai_override_db_append_events(sid, events)
+        ts = float((evs[-1] if evs else {}).get("ts") or fallback_now)
     except Exception:
-        event_seq = 0
         ts = fallback_now
-        ev = {
-            "seq": 0,
-            "ts": ts,
-            "role": role,
-            "content": content,
-            "sender": sender,
-            "audience": audience,
-            "kind": kind,
-        }
-        if user_name:
-            ev["user_name"] = user_name
-        if payload is not None:
-            ev["payload"] = payload
+        evs = []
+        for spec in events:
+            ev = {
+                "seq": 0,
+                "ts": ts,
+                "role": spec.get("role"),
+                "content": spec.get("content"),
+                "sender": spec.get("sender"),
+                "audience": spec.get("audience"),
+                "kind": spec.get("kind") or "message",
+            }
+            if spec.get("user_name"):
+                ev["user_name"] = spec.get("user_name")
+            if spec.get("payload") is not None:
+                ev["payload"] = spec.get("payload")
+            evs.append(ev)
 
     with _AI_OVERRIDE_LOCK:
         rec = _AI_OVERRIDE_SESSIONS.get(sid)
@@ -13104,22 +14324,24 @@ def _ai_override_append_event(
             }
             _AI_OVERRIDE_SESSIONS[sid] = rec
 
-        rec["seq"] = max(int(rec.get("seq") or 0), int(event_seq or 0))
         rec["last_seen"] = ts
         rec["updated_epoch"] = ts
-        events = rec.setdefault("events", [])
-        if not isinstance(events, list):
-            events = []
-            rec["events"] = events
-        if event_seq and not any(int((existing or {}).get("seq") or 0) == event_seq for existing in events if isinstance(existing, dict)):
-            events.append(ev)
-        elif not event_seq:
-            rec["seq"] = int(rec.get("seq") or 0) + 1
-            ev["seq"] = rec["seq"]
-            events.append(ev)
+        events_hot = rec.setdefault("events", [])
+        if not isinstance(events_hot, list):
+            events_hot = []
+            rec["events"] = events_hot
+        for ev in evs:
+            event_seq = int(ev.get("seq") or 0)
+            rec["seq"] = max(int(rec.get("seq") or 0), event_seq)
+            if event_seq and not any(int((existing or {}).get("seq") or 0) == event_seq for existing in events_hot if isinstance(existing, dict)):
+                events_hot.append(ev)
+            elif not event_seq:
+                rec["seq"] = int(rec.get("seq") or 0) + 1
+                ev["seq"] = rec["seq"]
+                events_hot.append(ev)
         # Cap the hot cache to keep per-worker memory bounded.
-        if len(events) > 600:
-            rec["events"] = events[-600:]
+        if len(events_hot) > 600:
+            rec["events"] = events_hot[-600:]
         _ai_override_persist_locked()
         out = dict(rec)
 
@@ -13127,7 +14349,7 @@ def _ai_override_append_event(
         _ai_override_db_upsert_session(out)
     except Exception:
         pass
-    return ev
+    return evs
 
 
 
@@ -13145,6 +14367,23 @@ def _ai_override_set_active(
     enabled: bool,
     host_member_id: str,
     reason: str = "",
+) -> Dict[str, Any]:
+    # The record update and the banner event below persist once, together.
+    with _ai_override_batch():
+        return _ai_override_set_active_unbatched(
+            session_id,
+            enabled=enabled,
+            host_member_id=host_member_id,
+            reason=reason,
+        )
+
+
+def _ai_override_set_active_unbatched(
+    session_id: str,
+    *,
+    enabled: bool,
+    host_member_id: str,
+    reason: str = "",
 ) -> Dict[str, Any]:
     sid = (session_id or "").strip()
     if not sid:
@@ -13375,11 +14614,9 @@ def _ai_override_best_summary(rec: Dict[str, Any]) -> Tuple[str, str]:
     try:
         key = str(rec.get("summary_key") or "").strip()
         if key:
-            _refresh_summary_store_if_needed()
-            ss = _CHAT_SUMMARY_STORE.get(key) or {}
-            s = ss.get("summary")
-            if isinstance(s, str) and s.strip():
-                return s.strip(), "saved_summary"
+            s = _get_saved_summary(key)
+            if s:
+                return s, "saved_summary"
     except Exception:
         pass
 
@@ -13498,6 +14735,28 @@ def _refresh_summary_store_if_needed() -> None:
         _load_summary_store()
 
 
+# Read paths (every /chat turn, host previews) re-check the backing file at most this
+# often; writers still call _refresh_summary_store_if_needed() unconditionally.
+_CHAT_SUMMARY_REFRESH_MIN_INTERVAL_S = _perf_opt_env_float("CHAT_SUMMARY_REFRESH_MIN_INTERVAL_S", 5.0, max_value=60.0)
+_CHAT_SUMMARY_LAST_REFRESH: float = 0.0
+
+
+def _get_saved_summary(memory_key: str) -> Optional[str]:
+    """Saved summary text for a summary-store key, or None (stripped, non-empty)."""
+    global _CHAT_SUMMARY_LAST_REFRESH
+    now = time.monotonic()
+    if now - _CHAT_SUMMARY_LAST_REFRESH >= _CHAT_SUMMARY_REFRESH_MIN_INTERVAL_S:
+        _CHAT_SUMMARY_LAST_REFRESH = now
+        _refresh_summary_store_if_needed()
+    rec = _CHAT_SUMMARY_STORE.get(memory_key)
+    s = rec.get("summary") if isinstance(rec, dict) else None
+    if isinstance(s, str):
+        s = s.strip()
+        if s:
+            return s
+    return None
+
+
 def _normalize_companion_key(raw: Any) -> str:
     """Normalize a companion identifier for stable keying.
 
@@ -14042,7 +15301,7 @@ async def tts_audio_url(request: Request) -> Dict[str, Any]:
                 if _inflight_marker_is_fresh(cache_blob):
                     waited = 0
                     while waited < _TTS_INFLIGHT_WAIT_MS:
-                        peek = await run_in_threadpool(_tts_cache_peek_sync, voice_id, text_for_tts, tts_cache_context)
+                        peek = await run_in_threadpool(_tts_cache_peek_sync, voice_id, text_for_tts, tts_cache_context, False)
                         if peek:
                             audio_url = peek
                             _perf_stage("tts.cache_wait_hit")
@@ -16595,9 +17854,10 @@ def _resolve_paygo_from_session_state(session_state: Optional[Dict[str, Any]]) -
         rebranding_key_raw = _extract_rebranding_key(ss)
         rebranding_parsed = _parse_rebranding_key(rebranding_key_raw) if rebranding_key_raw else {}
 
-        pay_go_link_override = _session_get_str(ss, "pay_go_link", "payGoLink") or rebranding_parsed.get("pay_go_link", "")
-        pay_go_price = _session_get_str(ss, "pay_go_price", "payGoPrice") or rebranding_parsed.get("pay_go_price", "")
-        pay_go_minutes_raw = _session_get_str(ss, "pay_go_minutes", "payGoMinutes") or rebranding_parsed.get("pay_go_minutes", "")
+        overrides = _rebranding_overrides(ss, rebranding_parsed)
+        pay_go_link_override = overrides["pay_go_link"]
+        pay_go_price = overrides["pay_go_price"]
+        pay_go_minutes_raw = overrides["pay_go_minutes"]
         pay_go_minutes = _safe_int(pay_go_minutes_raw)
 
         if pay_go_link_override:
@@ -18102,69 +19362,59 @@ async def host_ai_chats_send(req: HostAiChatsSendRequest):
                 if brand_slug and member_id_norm
                 else member_id_norm
             )
-            friend_first_turn_content: Optional[Dict[str, Any]] = None
-            mode_specific_content: Optional[Dict[str, Any]] = None
-            if brand_slug and member_key_for_content:
-                friend_first_turn_content = _content_deliver_friend_first_turn_once_per_24h(
-                    session_id=sid,
-                    brand_slug=brand_slug,
-                    member_key=member_key_for_content,
-                    base_url="",
-                    now_epoch=time.time(),
-                )
-            if folder and folder != "friend" and brand_slug and member_key_for_content:
-                mode_specific_content = _content_deliver_to_user_if_due(
-                    session_id=sid,
-                    brand_slug=brand_slug,
-                    member_key=member_key_for_content,
-                    folder=folder,
-                    cycle_id=str(usage_info.get("cycle_start_epoch") or ""),
-                    cycle_used_seconds=float(usage_info.get("used_seconds") or 0),
-                    base_url="",
-                    now_epoch=time.time(),
-                    force_user_delivery=True,
-                )
-            delivered_content = _content_merge_delivery_payloads(friend_first_turn_content, mode_specific_content)
+            delivered_content = await _content_writer_call(
+                _content_deliver_first_turn_and_due,
+                session_id=sid,
+                brand_slug=brand_slug,
+                member_key=member_key_for_content,
+                folder=folder,
+                deliver_mode_content=bool(folder and folder != "friend" and brand_slug and member_key_for_content),
+                cycle_id=str(usage_info.get("cycle_start_epoch") or ""),
+                cycle_used_seconds=float(usage_info.get("used_seconds") or 0),
+                base_url="",
+                force_user_delivery=True,
+            )
         except Exception:
             delivered_content = None
 
         if delivered_content:
-            try:
-                for item in _content_delivery_items(delivered_content):
-                    _ai_override_append_event(
-                        sid,
-                        role="assistant",
-                        content="",
-                        sender="system",
-                        audience="all",
-                        kind="user_content",
-                        payload={
-                            "token": str(item.get("token") or ""),
-                            "content": item,
-                            "trigger_minute": int(
-                                item.get("triggerMinute")
-                                or item.get("trigger_minute")
-                                or 0
-                            ),
-                        },
-                    )
-            except Exception:
-                pass
+            with _ai_override_batch():
+                try:
+                    for item in _content_delivery_items(delivered_content):
+                        _ai_override_append_event(
+                            sid,
+                            role="assistant",
+                            content="",
+                            sender="system",
+                            audience="all",
+                            kind="user_content",
+                            payload={
+                                "token": str(item.get("token") or ""),
+                                "content": item,
+                                "trigger_minute": int(
+                                    item.get("triggerMinute")
+                                    or item.get("trigger_minute")
+                                    or 0
+                                ),
+                            },
+                        )
+                except Exception:
+                    pass
 
-            _ai_override_append_event(
-                sid,
-                role="system",
-                content="Member is out of chat minutes. Scheduled content was delivered before paywall. Host override ended.",
-                sender="system",
-                audience="host",
-                kind="minutes_exhausted",
-            )
-            _ai_override_set_active(
-                sid,
-                enabled=False,
-                host_member_id=host_id,
-                reason="member_out_of_minutes_after_content",
-            )
+                _ai_override_append_event(
+                    sid,
+                    role="system",
+                    content="Member is out of chat minutes. Scheduled content was delivered before paywall. Host override ended.",
+                    sender="system",
+                    audience="host",
+                    kind="minutes_exhausted",
+                )
+                _ai_override_set_active(
+                    sid,
+                    enabled=False,
+                    host_member_id=host_id,
+                    reason="member_out_of_minutes_after_content",
+                )
 
             return {
                 "ok": False,
@@ -18284,10 +19534,12 @@ async def host_ai_chats_push_content(req: HostAiChatsPushContentRequest):
         raise HTTPException(status_code=400, detail="session_id is required")
 
     # Only the controlling host can push into the session.
-    host_id = str(_ai_override_get_host(sid) or "")
+    # One session read serves both checks (host id and active flag).
+    override_rec = _ai_override_get_session(sid) or {}
+    host_id = str(override_rec.get("override_host_member_id") or "").strip()
     if host_id and host_id != str(req.memberId or "").strip():
         raise HTTPException(status_code=403, detail="host not authorized for this session")
-    if not bool(_ai_override_is_active(sid)):
+    if not bool(override_rec.get("override_active") is True):
         raise HTTPException(status_code=409, detail="override not active")
 
     token = str(req.token or "").strip()
@@ -18339,7 +19591,7 @@ async def host_ai_chats_poll(req: HostAiChatsPollRequest):
     try:
         for ev in (out or {}).get("events", []) or []:
             if isinstance(ev, dict) and ev.get("kind") == "content_pending":
-                _content_mark_host_received(ev.get("payload") or {})
+                await _content_writer_call(_content_mark_host_received, ev.get("payload") or {})
     except Exception:
         pass
 
@@ -18837,14 +20089,23 @@ _CONTENT_FRIEND_FIRST_TURN_COOLDOWN_SECONDS = 24 * 60 * 60
 _CONTENT_FRIEND_FIRST_TURN_DELIVERED_VIA = "friend_first_turn_daily"
 
 
+_SAFE_SLUG_INVALID_RE = re.compile(r"[^a-z0-9_-]+")
+
+
 def _safe_slug(s: str) -> str:
-    s = str(s or "").strip().lower()
+    return _safe_slug_cached(str(s or ""))
+
+
+# Slugs are taken of the same few brand / folder / member strings on every content pass;
+# memoizing also hands back one shared string object per distinct slug.
+@lru_cache(maxsize=2048)
+def _safe_slug_cached(s: str) -> str:
+    s = s.strip().lower()
     if not s:
         return ""
     # allow a-z, 0-9, underscore, dash. Everything else becomes '-'
-    s = re.sub(r"[^a-z0-9_-]+", "-", s)
-    s = re.sub(r"^-+", "", s)
-    s = re.sub(r"-+$", "", s)
+    s = _SAFE_SLUG_INVALID_RE.sub("-", s)
+    s = s.strip("-")
     return s or ""
 
 
@@ -18887,20 +20148,76 @@ def _content_folder_for_mode(mode: str) -> str:
     return "friend"
 
 
-def _content_resolve_folder(brand_slug: str, mode: str) -> str:
-    """Resolve the on-disk content folder for a given mode.
+def _content_resolve_folder(brand_slug: str, mode: str) -> str:
+    """Resolve the on-disk content folder for a given mode.
+
+    We accept `brand_slug` for future brand-specific overrides, but today all brands
+    share the same disk layout: /home/site/brand/<brand>/content/mode/<mode>/.
+    """
+
+    _ = brand_slug  # reserved for future per-brand routing
+    return _content_folder_for_mode(mode)
+
+
+_CONTENT_CONN_LOCAL = threading.local()
+_CONTENT_CONNS: List[sqlite3.Connection] = []
+_CONTENT_CONNS_LOCK = threading.Lock()
+
+
+def _content_db_connect() -> sqlite3.Connection:
+    """Return this thread's long-lived econnect connection for scheduled content.
+
+    Content state is stored in the unified econnect.sqlite3. Scheduler calls run on
+    threadpool workers, so each worker keeps one connection open (and its prepared
+    statement cache warm) instead of connecting per tick. Release with
+    _content_db_release, never close().
+    """
+    conn = getattr(_CONTENT_CONN_LOCAL, "conn", None)
+    if conn is not None:
+        return conn
+    conn = _econnect_conn()
+    _CONTENT_CONN_LOCAL.conn = conn
+    with _CONTENT_CONNS_LOCK:
+        _CONTENT_CONNS.append(conn)
+    return conn
+
+
+def _content_db_release(conn: Optional[sqlite3.Connection]) -> None:
+    """Hand a connection from _content_db_connect back without closing it."""
+    if conn is None:
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except Exception:
+        # A broken connection is dropped so the next call on this thread reconnects.
+        if getattr(_CONTENT_CONN_LOCAL, "conn", None) is conn:
+            _CONTENT_CONN_LOCAL.conn = None
+        with _CONTENT_CONNS_LOCK:
+            if conn in _CONTENT_CONNS:
+                _CONTENT_CONNS.remove(conn)
+        _econnect_close(conn)
+
+
+# Every scheduled-content mutation runs on this single worker, so writes never contend for
+# the SQLite write lock inside the process and share one cached connection. Async handlers
+# await it with _content_writer_call instead of blocking the event loop.
+_CONTENT_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content-writer")
 
-    We accept `brand_slug` for future brand-specific overrides, but today all brands
-    share the same disk layout: /home/site/brand/<brand>/content/mode/<mode>/.
-    """
 
-    _ = brand_slug  # reserved for future per-brand routing
-    return _content_folder_for_mode(mode)
+async def _content_writer_call(fn: Any, *args: Any, **kwargs: Any) -> Any:
+    # Carry the caller's contextvars across, as run_in_threadpool does.
+    ctx = contextvars.copy_context()
+    return await asyncio.wrap_future(_CONTENT_WRITER.submit(ctx.run, partial(fn, *args, **kwargs)))
 
 
-def _content_db_connect() -> sqlite3.Connection:
-    # Content state is stored in the unified econnect.sqlite3
-    return _econnect_conn()
+@atexit.register
+def _content_db_close_all() -> None:
+    with _CONTENT_CONNS_LOCK:
+        conns = list(_CONTENT_CONNS)
+        _CONTENT_CONNS.clear()
+    for conn in conns:
+        _econnect_close(conn)
 
 
 def _content_table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
@@ -18914,25 +20231,29 @@ def _content_table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
         return False
 
 
+# Column sets of the content tables, filled once _content_db_ensure_schema has settled the
+# schema for this process. Hot delivery queries consult these on every call; without the
+# cache each lookup is a pragma_table_info query.
+_CONTENT_TABLE_COLUMNS_CACHE: Dict[str, FrozenSet[str]] = {}
+
+
 def _content_table_columns(conn: sqlite3.Connection, table_name: str) -> Set[str]:
-    if not _content_table_exists(conn, table_name):
-        return set()
+    if _CONTENT_DB_READY:
+        cached = _CONTENT_TABLE_COLUMNS_CACHE.get(table_name)
+        if cached is not None:
+            return set(cached)
+    # Bound table-valued pragma: one cached prepared statement for every table, and a
+    # missing table simply yields no rows (no separate sqlite_master probe).
     try:
-        rows = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+        rows = conn.execute(
+            "SELECT name FROM pragma_table_info(?)",
+            (str(table_name or "").strip(),),
+        ).fetchall()
     except Exception:
         return set()
-    cols: Set[str] = set()
-    for row in rows:
-        name = None
-        try:
-            if isinstance(row, sqlite3.Row):
-                name = row["name"]
-            elif len(row) > 1:
-                name = row[1]
-        except Exception:
-            name = None
-        if name:
-            cols.add(str(name).strip())
+    cols: Set[str] = {str(row[0]).strip() for row in rows if row[0]}
+    if _CONTENT_DB_READY and cols:
+        _CONTENT_TABLE_COLUMNS_CACHE[table_name] = frozenset(cols)
     return cols
 
 
@@ -18990,7 +20311,7 @@ def _content_ensure_state_schema(conn: sqlite3.Connection) -> None:
         _content_ensure_column(conn, "user_content_state", name, coldef)
 
 
-def _content_ensure_history_schema(conn: sqlite3.Connection) -> None:
+def _content_ensure_history_table(conn: sqlite3.Connection) -> None:
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS user_content_history (
@@ -19026,6 +20347,8 @@ def _content_ensure_history_schema(conn: sqlite3.Connection) -> None:
     ]:
         _content_ensure_column(conn, "user_content_history", name, coldef)
 
+    # The token index enforces delivery uniqueness (INSERT OR IGNORE relies on it), so it
+    # lives with the table rather than with the lookup indexes.
     conn.execute(
         """
         CREATE UNIQUE INDEX IF NOT EXISTS idx_user_content_history_token
@@ -19033,18 +20356,24 @@ def _content_ensure_history_schema(conn: sqlite3.Connection) -> None:
         WHERE token IS NOT NULL AND TRIM(token) <> '';
         """
     )
+
+
+def _content_ensure_history_indexes(conn: sqlite3.Connection) -> None:
+    # (member_id, content_folder, create_datetime) implicitly ends in rowid, so walked
+    # backwards it also serves the newest-first (create_datetime DESC, rowid DESC) scans.
+    # The (..., content_sequence) index only added write cost: MAX(CAST(...)) cannot use it.
+    conn.execute("DROP INDEX IF EXISTS idx_user_content_history_member_sequence")
     conn.execute(
         """
         CREATE INDEX IF NOT EXISTS idx_user_content_history_member
         ON user_content_history(member_id, content_folder, create_datetime);
         """
     )
-    conn.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_user_content_history_member_sequence
-        ON user_content_history(member_id, content_folder, content_sequence);
-        """
-    )
+
+
+def _content_ensure_history_schema(conn: sqlite3.Connection) -> None:
+    _content_ensure_history_table(conn)
+    _content_ensure_history_indexes(conn)
 
 
 def _content_ensure_claims_schema(conn: sqlite3.Connection) -> None:
@@ -19127,31 +20456,42 @@ def _content_history_needs_rebuild(conn: sqlite3.Connection) -> bool:
     if table_sql and re.search(r"\bmember_id\b[^,)]*\bunique\b", table_sql):
         return True
 
+    # One statement over the table-valued pragmas instead of index_list + index_info per index.
     try:
-        index_rows = conn.execute("PRAGMA index_list(user_content_history)").fetchall()
+        row = conn.execute(
+            """
+            SELECT 1
+            FROM pragma_index_list('user_content_history') AS il
+            WHERE il."unique" = 1
+              AND (
+                SELECT group_concat(lower(ii.name))
+                FROM pragma_index_info(il.name) AS ii
+              ) = 'member_id'
+            LIMIT 1
+            """
+        ).fetchone()
     except Exception:
-        index_rows = []
+        row = None
+    return row is not None
 
-    for index_row in index_rows:
-        try:
-            is_unique = int(index_row[2] or 0) == 1
-            idx_name = str(index_row[1] or "").strip()
-        except Exception:
-            is_unique = False
-            idx_name = ""
-        if not is_unique or not idx_name:
-            continue
-        try:
-            cols = [str(c[2] or "").strip().lower() for c in conn.execute(f"PRAGMA index_info({idx_name})").fetchall()]
-        except Exception:
-            cols = []
-        if cols == ["member_id"]:
-            return True
-    return False
+
+_CONTENT_HISTORY_INSERT_COLUMNS = (
+    "token",
+    "member_id",
+    "content_folder",
+    "trigger_minute",
+    "content_sequence",
+    "content_name",
+    "content_type",
+    "content_stage",
+    "content_url",
+    "delivered_via",
+    "create_datetime",
+    "user_type",
+)
 
 
-def _content_history_insert_with_create_datetime(
-    conn: sqlite3.Connection,
+def _content_history_row_values(
     token: str,
     member_id: str,
     content_folder: str,
@@ -19164,17 +20504,13 @@ def _content_history_insert_with_create_datetime(
     delivered_via: str,
     create_datetime: Optional[str] = None,
     user_type: Optional[str] = None,
-) -> None:
-    cols = _content_table_columns(conn, "user_content_history")
-    if not cols:
-        return
-
+) -> Dict[str, Any]:
     try:
         trigger_minute_i = int(trigger_minute or 0)
     except Exception:
         trigger_minute_i = 0
 
-    values: Dict[str, Any] = {
+    return {
         "token": str(token or "").strip(),
         "member_id": str(member_id or "").strip(),
         "content_folder": str(content_folder or "").strip(),
@@ -19195,28 +20531,60 @@ def _content_history_insert_with_create_datetime(
             file_name=str(content_name or "").strip(),
         ),
         "delivered_via": str(delivered_via or "").strip(),
-        "create_datetime": str(create_datetime or "").strip() or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "create_datetime": str(create_datetime or "").strip() or time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
         "user_type": str(user_type or "").strip() or None,
     }
-    ordered = [name for name in [
-        "token",
-        "member_id",
-        "content_folder",
-        "trigger_minute",
-        "content_sequence",
-        "content_name",
-        "content_type",
-        "content_stage",
-        "content_url",
-        "delivered_via",
-        "create_datetime",
-        "user_type",
-    ] if name in cols]
+
+
+def _content_history_insert_rows(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> None:
+    """Insert prepared history rows (see _content_history_row_values) with one executemany.
+
+    The caller owns the transaction; nothing is committed here. `rows` is consumed
+    lazily, so a generator (as in the schema rebuild) is never materialized.
+    """
+    cols = _content_table_columns(conn, "user_content_history")
+    ordered = [name for name in _CONTENT_HISTORY_INSERT_COLUMNS if name in cols]
     if not ordered:
         return
     placeholders = ", ".join(["?"] * len(ordered))
     sql = f"INSERT OR IGNORE INTO user_content_history ({', '.join(ordered)}) VALUES ({placeholders})"
-    conn.execute(sql, tuple(values[name] for name in ordered))
+    conn.executemany(sql, (tuple(row[name] for name in ordered) for row in rows if row))
+
+
+def _content_history_insert_with_create_datetime(
+    conn: sqlite3.Connection,
+    token: str,
+    member_id: str,
+    content_folder: str,
+    trigger_minute: int,
+    content_sequence: Any,
+    content_name: str,
+    content_type: str,
+    content_stage: str,
+    content_url: str,
+    delivered_via: str,
+    create_datetime: Optional[str] = None,
+    user_type: Optional[str] = None,
+) -> None:
+    _content_history_insert_rows(
+        conn,
+        [
+            _content_history_row_values(
+                token=token,
+                member_id=member_id,
+                content_folder=content_folder,
+                trigger_minute=trigger_minute,
+                content_sequence=content_sequence,
+                content_name=content_name,
+                content_type=content_type,
+                content_stage=content_stage,
+                content_url=content_url,
+                delivered_via=delivered_via,
+                create_datetime=create_datetime,
+                user_type=user_type,
+            )
+        ],
+    )
 
 
 def _content_history_has_token(conn: sqlite3.Connection, token: str) -> bool:
@@ -19236,9 +20604,11 @@ def _content_epoch_to_datetime(epoch_value: Any) -> str:
         epoch_f = float(epoch_value or 0.0)
     except Exception:
         epoch_f = 0.0
+    # time.gmtime + strftime formats straight from the struct_time, without building a
+    # datetime object; the text matches SQLite's datetime(x, 'unixepoch').
     if epoch_f <= 0:
-        return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    return datetime.utcfromtimestamp(epoch_f).strftime("%Y-%m-%d %H:%M:%S")
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch_f))
 
 
 def _content_history_backfill_from_claim(conn: sqlite3.Connection, claim: Dict[str, Any]) -> bool:
@@ -19324,30 +20694,67 @@ def _content_rebuild_history_schema(conn: sqlite3.Connection) -> bool:
         _content_ensure_history_schema(conn)
         return False
 
-    old_rows = conn.execute(
-        "SELECT * FROM user_content_history ORDER BY COALESCE(create_datetime, ''), rowid"
-    ).fetchall()
-
-    conn.execute("DROP TABLE user_content_history")
-    _content_ensure_history_schema(conn)
+    # Rename instead of buffering every row in memory, then stream the copy back. The old
+    # table's explicit indexes are dropped first: they keep their names across the rename
+    # and would otherwise shadow the IF NOT EXISTS index creation on the new table.
+    conn.execute("DROP TABLE IF EXISTS user_content_history_old")
+    conn.execute("ALTER TABLE user_content_history RENAME TO user_content_history_old")
+    for (index_name,) in conn.execute(
+        "SELECT name FROM pragma_index_list('user_content_history_old') WHERE origin = 'c'"
+    ).fetchall():
+        conn.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+    # Lookup indexes are built after the copy so the reload does not maintain them
+    # row by row.
+    _content_ensure_history_table(conn)
+    _CONTENT_TABLE_COLUMNS_CACHE.pop("user_content_history", None)
+
+    copy_cols = [
+        str(r[0])
+        for r in conn.execute(
+            """
+            SELECT name FROM pragma_table_info('user_content_history_old')
+            INTERSECT
+            SELECT name FROM pragma_table_info('user_content_history')
+            """
+        ).fetchall()
+    ]
+    order_by = "COALESCE(create_datetime, ''), rowid" if "create_datetime" in copy_cols else "rowid"
 
-    for row in old_rows:
-        payload = dict(row)
-        _content_history_insert_with_create_datetime(
-            conn,
-            token=str(payload.get("token") or "").strip(),
-            member_id=str(payload.get("member_id") or "").strip(),
-            content_folder=str(payload.get("content_folder") or "").strip(),
-            trigger_minute=int(payload.get("trigger_minute") or 0),
-            content_sequence=payload.get("content_sequence"),
-            content_name=str(payload.get("content_name") or "").strip(),
-            content_type=str(payload.get("content_type") or "").strip(),
-            content_stage=str(payload.get("content_stage") or "").strip(),
-            content_url=str(payload.get("content_url") or "").strip(),
-            delivered_via=str(payload.get("delivered_via") or "").strip(),
-            create_datetime=str(payload.get("create_datetime") or "").strip(),
-            user_type=str(payload.get("user_type") or "").strip() or None,
+    prev_cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    # Scoped to the copy: a larger page cache for the one-shot reload (restored below) and
+    # deferred FK checks (reset by SQLite at commit). Not executescript: that would commit
+    # the caller's transaction.
+    conn.execute("PRAGMA defer_foreign_keys=ON")
+    conn.execute("PRAGMA cache_size=-65536")
+    try:
+        old_rows = conn.execute(
+            f"SELECT {', '.join(copy_cols)} FROM user_content_history_old ORDER BY {order_by}"
         )
+
+        def _rebuilt_rows() -> Iterable[Dict[str, Any]]:
+            for row in old_rows:
+                payload = dict(zip(copy_cols, row))
+                yield _content_history_row_values(
+                    token=str(payload.get("token") or "").strip(),
+                    member_id=str(payload.get("member_id") or "").strip(),
+                    content_folder=str(payload.get("content_folder") or "").strip(),
+                    trigger_minute=int(payload.get("trigger_minute") or 0),
+                    content_sequence=payload.get("content_sequence"),
+                    content_name=str(payload.get("content_name") or "").strip(),
+                    content_type=str(payload.get("content_type") or "").strip(),
+                    content_stage=str(payload.get("content_stage") or "").strip(),
+                    content_url=str(payload.get("content_url") or "").strip(),
+                    delivered_via=str(payload.get("delivered_via") or "").strip(),
+                    create_datetime=str(payload.get("create_datetime") or "").strip(),
+                    user_type=str(payload.get("user_type") or "").strip() or None,
+                )
+
+        _content_history_insert_rows(conn, _rebuilt_rows())
+        conn.execute("DROP TABLE user_content_history_old")
+    finally:
+        conn.execute(f"PRAGMA cache_size={int(prev_cache_size)}")
+    _content_ensure_history_indexes(conn)
     return True
 
 
@@ -19412,7 +20819,23 @@ def _content_history_insert(
     )
 
 
+# Canonical branded content stem: <SEQ>-<DESCRIPTION>-<TYPE>-<STAGE>. Matched in one pass;
+# anything else (extra hyphens, padded fields, unknown types) falls back to the split parser.
+_CONTENT_FILENAME_RE = re.compile(
+    r"^(?P<seq>\d{9})-(?P<desc>[^-\s](?:[^-]*[^-\s])?)-(?P<type>photo|video)-(?P<stage>\w+)$",
+    re.IGNORECASE,
+)
+
+
 def _content_parse_filename(name: str) -> Dict[str, str]:
+    """Parse branded content filenames (memoized; returns a fresh dict per call)."""
+    return dict(_content_parse_filename_cached(name or ""))
+
+
+# Content folders hold a small, static set of names that every delivery pass re-parses
+# (first-file picks, payload prep), so parsed results are kept by filename.
+@lru_cache(maxsize=4096)
+def _content_parse_filename_cached(name: str) -> Dict[str, str]:
     """Parse branded content filenames.
 
     Canonical format:
@@ -19429,6 +20852,20 @@ def _content_parse_filename(name: str) -> Dict[str, str]:
 
     # Robustly strip extensions (handles double extensions like .png.jpg)
     stem = name.split(".")[0]
+
+    m = _CONTENT_FILENAME_RE.match(stem)
+    if m:
+        description = m.group("desc")
+        type_field3 = m.group("type")
+        return {
+            "sequence": m.group("seq"),
+            "description": description,
+            "title": description.replace("_", " ").strip() or description,
+            "kind": "image" if type_field3.lower() == "photo" else "video",
+            "stage": m.group("stage"),
+            "content_type": type_field3,
+        }
+
     parts = [p.strip() for p in stem.split("-") if p.strip()]
     if len(parts) < 3:
         return {}
@@ -19532,8 +20969,8 @@ def _content_history_has_recent_delivery(
         params.append(str(delivered_via or "").strip())
 
     if float(since_epoch or 0.0) > 0 and "create_datetime" in cols:
-        where.append("create_datetime >= datetime(?, 'unixepoch')")
-        params.append(float(since_epoch or 0.0))
+        where.append("create_datetime >= ?")
+        params.append(_content_epoch_to_datetime(since_epoch))
 
     row = conn.execute(
         f"SELECT 1 FROM user_content_history WHERE {' AND '.join(where)} LIMIT 1",
@@ -19653,11 +21090,7 @@ def _content_deliver_friend_first_turn_once_per_24h(
                 pass
         return None
     finally:
-        if conn is not None:
-            try:
-                conn.close()
-            except Exception:
-                pass
+        _content_db_release(conn)
 
 
 def _content_delivery_token(
@@ -19761,8 +21194,8 @@ def _content_history_row_for_trigger(
         params.extend([lo, hi])
 
     if float(window_start_epoch or 0.0) > 0 and "create_datetime" in cols:
-        where.append("create_datetime >= datetime(?, 'unixepoch')")
-        params.append(float(window_start_epoch or 0.0))
+        where.append("create_datetime >= ?")
+        params.append(_content_epoch_to_datetime(window_start_epoch))
 
     order_col = "id" if "id" in cols else "rowid"
     sql = f"SELECT * FROM user_content_history WHERE {' AND '.join(where)} ORDER BY {order_col} DESC LIMIT 1"
@@ -20180,8 +21613,8 @@ def _content_history_max_sequence(
         str(content_folder or "").strip(),
     ]
     if float(window_start_epoch or 0.0) > 0 and "create_datetime" in cols:
-        where.append("create_datetime >= datetime(?, 'unixepoch')")
-        params.append(float(window_start_epoch or 0.0))
+        where.append("create_datetime >= ?")
+        params.append(_content_epoch_to_datetime(window_start_epoch))
     try:
         row = conn.execute(
             f"""
@@ -20211,8 +21644,8 @@ def _content_history_has_any_delivery(
         str(content_folder or "").strip(),
     ]
     if float(window_start_epoch or 0.0) > 0 and "create_datetime" in cols:
-        where.append("create_datetime >= datetime(?, 'unixepoch')")
-        params.append(float(window_start_epoch or 0.0))
+        where.append("create_datetime >= ?")
+        params.append(_content_epoch_to_datetime(window_start_epoch))
     row = conn.execute(
         f"""
         SELECT 1
@@ -20319,7 +21752,7 @@ def _content_mode_dir_candidates(brand_dir: str, folder: str) -> List[str]:
     return out
 
 
-def _content_resolve_mode_dir(brand_slug: str, folder: str) -> str:
+def _content_resolve_mode_dir_uncached(brand_slug: str, folder: str) -> str:
     for brand_dir in _content_brand_dir_candidates(brand_slug):
         for cand in _content_mode_dir_candidates(brand_dir, folder):
             if os.path.isdir(cand):
@@ -20327,6 +21760,23 @@ def _content_resolve_mode_dir(brand_slug: str, folder: str) -> str:
     return ""
 
 
+def _content_resolve_mode_dir(brand_slug: str, folder: str) -> str:
+    # Resolution lists every content root; brand/mode folders rarely move, so the answer
+    # (including "not found") is kept for a short TTL.
+    if not _PERF_OPT_CACHE_ENABLED or _CONTENT_MODE_DIR_CACHE_TTL_S <= 0:
+        return _content_resolve_mode_dir_uncached(brand_slug, folder)
+    key = (str(brand_slug or ""), str(folder or ""))
+    now = time.time()
+    with _CONTENT_DIR_CACHE_LOCK:
+        hit = _CONTENT_MODE_DIR_CACHE.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+    resolved = _content_resolve_mode_dir_uncached(brand_slug, folder)
+    with _CONTENT_DIR_CACHE_LOCK:
+        _CONTENT_MODE_DIR_CACHE[key] = (now + _CONTENT_MODE_DIR_CACHE_TTL_S, resolved)
+    return resolved
+
+
 def _content_resolve_existing_filename(base_dir: str, filename: str) -> str:
     if not base_dir or not filename:
         return ""
@@ -20524,21 +21974,35 @@ def _content_repair_persisted_urls_sync() -> None:
             pass
         print(f"[content] WARNING: failed repairing persisted content URLs: {e!r}")
     finally:
-        try:
-            if conn is not None:
-                conn.close()
-        except Exception:
-            pass
+        _content_db_release(conn)
 
 
-def _content_list_files(brand_slug: str, folder: str) -> List[str]:
-    base = _content_resolve_mode_dir(brand_slug, folder)
-    if not base:
-        return []
+_CONTENT_NO_SEQ = 10**18
+
+
+def _content_seq_key(fn: str) -> int:
+    # Leading numeric prefix; files without one sort last.
+    try:
+        prefix = fn.split("-", 1)[0]
+        return int(prefix)
+    except Exception:
+        return _CONTENT_NO_SEQ
+
+
+def _content_dir_listing(base: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    """Sorted (files, sequence keys) for a content folder, rebuilt only when its mtime changes."""
+    try:
+        mtime_ns = os.stat(base).st_mtime_ns
+    except Exception:
+        return (), ()
+    with _CONTENT_DIR_CACHE_LOCK:
+        hit = _CONTENT_DIR_LISTING_CACHE.get(base)
+        if hit and hit[0] == mtime_ns:
+            return hit[1], hit[2]
     try:
         entries = os.listdir(base)
     except Exception:
-        return []
+        return (), ()
     files: List[str] = []
     for fn in entries:
         if fn.startswith("."):
@@ -20547,18 +22011,25 @@ def _content_list_files(brand_slug: str, folder: str) -> List[str]:
         if os.path.isfile(full):
             files.append(fn)
     # Sort by leading numeric prefix if present.
-    def _seq_key(fn: str) -> int:
-        try:
-            prefix = fn.split("-", 1)[0]
-            return int(prefix)
-        except Exception:
-            return 10**18
-    files.sort(key=_seq_key)
-    return files
+    files.sort(key=_content_seq_key)
+    listing = (tuple(files), tuple(_content_seq_key(fn) for fn in files))
+    with _CONTENT_DIR_CACHE_LOCK:
+        _CONTENT_DIR_LISTING_CACHE[base] = (mtime_ns, listing[0], listing[1])
+    return listing
+
+
+def _content_list_files(brand_slug: str, folder: str) -> List[str]:
+    base = _content_resolve_mode_dir(brand_slug, folder)
+    if not base:
+        return []
+    return list(_content_dir_listing(base)[0])
 
 
 def _content_pick_next_file(brand_slug: str, folder: str, last_sequence: Optional[str]) -> Optional[str]:
-    files = _content_list_files(brand_slug, folder)
+    base = _content_resolve_mode_dir(brand_slug, folder)
+    if not base:
+        return None
+    files, seqs = _content_dir_listing(base)
     if not files:
         return None
 
@@ -20570,13 +22041,9 @@ def _content_pick_next_file(brand_slug: str, folder: str, last_sequence: Optiona
             last_n = -1
 
     # Pick the first file whose numeric prefix is greater than last_sequence.
-    for fn in files:
-        try:
-            n = int(fn.split("-", 1)[0])
-        except Exception:
-            continue
-        if n > last_n:
-            return fn
+    i = bisect.bisect_right(seqs, last_n)
+    if i < len(files) and seqs[i] != _CONTENT_NO_SEQ:
+        return files[i]
 
     # Wrap-around fallback: start from the beginning.
     return files[0]
@@ -20794,6 +22261,7 @@ def _content_queue_pending_for_host(
             or bool(str(state.get("pending_token") or "").strip())
         )
         if stale_state:
+            _CONTENT_COMPLETE_WINDOWS.pop((member_key, folder), None)
             _content_state_upsert(
                 conn,
                 member_key,
@@ -20926,22 +22394,23 @@ def _content_queue_pending_for_host(
             _content_state_upsert(conn, member_key, folder, latest_state_update)
         conn.commit()
 
-        for payload in batch_payloads:
-            token = str(payload.get("token") or "").strip()
-            if token and _ai_override_has_token_event(session_id, token, "content_pending"):
-                continue
-            try:
-                _ai_override_append_event(
-                    session_id,
-                    role="system",
-                    content="",
-                    sender="system",
-                    audience="host",
-                    kind="content_pending",
-                    payload=payload,
-                )
-            except Exception:
-                pass
+        with _ai_override_batch():
+            for payload in batch_payloads:
+                token = str(payload.get("token") or "").strip()
+                if token and _ai_override_has_token_event(session_id, token, "content_pending"):
+                    continue
+                try:
+                    _ai_override_append_event(
+                        session_id,
+                        role="system",
+                        content="",
+                        sender="system",
+                        audience="host",
+                        kind="content_pending",
+                        payload=payload,
+                    )
+                except Exception:
+                    pass
 
         return batch_payloads[0]
     except Exception:
@@ -20951,10 +22420,42 @@ def _content_queue_pending_for_host(
             pass
         return None
     finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+        _content_db_release(conn)
+
+# (member_key, folder) -> (cycle_id, window_start_epoch, remembered_at) for windows already
+# seen complete (backed by history/claims rows). Repeat calls inside the window can return
+# before touching SQLite, but only for CONTENT_COMPLETE_RECHECK_S: after that the full pass
+# runs again so the stale-state repair still gets to reopen a window whose rows have gone.
+# Only the content writer thread uses this map.
+_CONTENT_COMPLETE_WINDOWS: Dict[Tuple[str, str], Tuple[str, float, float]] = {}
+_CONTENT_COMPLETE_WINDOWS_MAX = 10000
+_CONTENT_COMPLETE_RECHECK_S = _perf_opt_env_float("CONTENT_COMPLETE_RECHECK_S", 300.0, max_value=3600.0)
+
+
+def _content_window_known_complete(member_key: str, folder: str, cycle_id: str, now_epoch: float) -> bool:
+    hit = _CONTENT_COMPLETE_WINDOWS.get((member_key, folder))
+    if not hit:
+        return False
+    cached_cycle_id, window_start, remembered_at = hit
+    if (
+        cached_cycle_id != cycle_id
+        or now_epoch - window_start >= _CONTENT_WINDOW_SECONDS
+        or now_epoch - remembered_at >= float(_CONTENT_COMPLETE_RECHECK_S)
+    ):
+        _CONTENT_COMPLETE_WINDOWS.pop((member_key, folder), None)
+        return False
+    return True
+
+
+def _content_remember_complete_window(
+    member_key: str, folder: str, cycle_id: str, window_start: float, now_epoch: float
+) -> None:
+    if window_start <= 0:
+        return
+    if len(_CONTENT_COMPLETE_WINDOWS) >= _CONTENT_COMPLETE_WINDOWS_MAX:
+        _CONTENT_COMPLETE_WINDOWS.clear()
+    _CONTENT_COMPLETE_WINDOWS[(member_key, folder)] = (cycle_id, window_start, now_epoch)
+
 
 def _content_deliver_to_user_if_due(
     session_id: str,
@@ -20982,6 +22483,12 @@ def _content_deliver_to_user_if_due(
     if folder_slug == "intimate" and _is_anon_member_id(member_key):
         return None
     now = float(now_epoch or time.time())
+    # Nothing can be due before the earliest (host-early) trigger, and a window already seen
+    # complete stays complete for its cycle: answer both without opening a transaction.
+    if not _content_due_scheduled_minutes(used_seconds=float(cycle_used_seconds or 0.0), include_host_early=True):
+        return None
+    if _content_window_known_complete(member_key, folder, str(cycle_id or ""), now):
+        return None
     try:
         conn = _content_db_connect()
         _content_db_ensure_schema(conn)
@@ -21023,6 +22530,7 @@ def _content_deliver_to_user_if_due(
             or bool(str(state.get("pending_token") or "").strip())
         )
         if stale_state:
+            _CONTENT_COMPLETE_WINDOWS.pop((member_key, folder), None)
             _content_state_upsert(
                 conn,
                 member_key,
@@ -21040,6 +22548,14 @@ def _content_deliver_to_user_if_due(
 
         if int(state.get("window_complete") or 0) == 1:
             conn.commit()
+            if history_any or claims_any:
+                _content_remember_complete_window(
+                    member_key,
+                    folder,
+                    str(cycle_id or ""),
+                    float(state.get("window_start_epoch") or 0.0),
+                    now,
+                )
             return None
 
         deliver_to_host_first = False
@@ -21083,6 +22599,7 @@ def _content_deliver_to_user_if_due(
 
         last_seq_cursor = _content_history_max_sequence(conn, member_key, folder, window_start_epoch)
         delivered_items: List[Dict[str, Any]] = []
+        history_rows: List[Dict[str, Any]] = []
 
         for entry in backlog:
             trigger_minute = int(entry.get("trigger_minute") or 0)
@@ -21145,8 +22662,7 @@ def _content_deliver_to_user_if_due(
                 delivered_epoch=now,
             )
 
-            _content_history_insert(
-                conn,
+            history_rows.append(_content_history_row_values(
                 token,
                 member_key,
                 folder,
@@ -21157,7 +22673,7 @@ def _content_deliver_to_user_if_due(
                 prepared["content_stage"],
                 prepared["content_url"],
                 "auto",
-            )
+            ))
 
             delivered_items.append({
                 "token": token,
@@ -21171,6 +22687,9 @@ def _content_deliver_to_user_if_due(
             conn.commit()
             return None
 
+        # Whole backlog goes in as one batch inside the open BEGIN IMMEDIATE transaction.
+        _content_history_insert_rows(conn, history_rows)
+
         last_item = delivered_items[-1]
         last_stage = str(last_item.get("stage") or "")
         _content_state_upsert(
@@ -21198,11 +22717,45 @@ def _content_deliver_to_user_if_due(
                 pass
         return None
     finally:
-        if conn is not None:
-            try:
-                conn.close()
-            except Exception:
-                pass
+        _content_db_release(conn)
+
+def _content_deliver_first_turn_and_due(
+    *,
+    session_id: str,
+    brand_slug: str,
+    member_key: str,
+    folder: str,
+    deliver_mode_content: bool,
+    cycle_id: str,
+    cycle_used_seconds: float,
+    base_url: str,
+    force_user_delivery: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Friend first-turn drop plus due mode content, merged, in one content-writer hop."""
+    friend_first_turn_content: Optional[Dict[str, Any]] = None
+    mode_specific_content: Optional[Dict[str, Any]] = None
+    if brand_slug and member_key:
+        friend_first_turn_content = _content_deliver_friend_first_turn_once_per_24h(
+            session_id=session_id,
+            brand_slug=brand_slug,
+            member_key=member_key,
+            base_url=base_url,
+            now_epoch=time.time(),
+        )
+    if deliver_mode_content:
+        mode_specific_content = _content_deliver_to_user_if_due(
+            session_id=session_id,
+            brand_slug=brand_slug,
+            member_key=member_key,
+            folder=folder,
+            cycle_id=cycle_id,
+            cycle_used_seconds=cycle_used_seconds,
+            base_url=base_url,
+            now_epoch=time.time(),
+            force_user_delivery=force_user_delivery,
+        )
+    return _content_merge_delivery_payloads(friend_first_turn_content, mode_specific_content)
+
 
 def _content_mark_host_received(payload: Dict[str, Any]) -> None:
     """Mark a host-pending content item as delivered (business rule: delivered once host receives)."""
@@ -21379,10 +22932,7 @@ def _content_mark_host_received(payload: Dict[str, Any]) -> None:
 
         conn.commit()
     finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+        _content_db_release(conn)
 
 
 
@@ -23795,7 +25345,8 @@ def _usage_minutes_remaining_display(remaining_seconds: float) -> int:
     return max(1, int(math.ceil(remaining / 60.0)))
 
 
-def _usage_info_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+def _usage_info_from_row(row: Any) -> Dict[str, Any]:
+    """Build the usage payload from a member_usage_minutes row (sqlite3.Row or plain dict)."""
     free_minutes_total = int(row["free_minutes_total"] or 0)
     purchased_seconds = float(row["purchased_seconds"] or 0.0)
     used_seconds = float(row["used_seconds"] or 0.0)
@@ -24121,13 +25672,14 @@ def _usage_charge_and_check_sync(
                 (float(new_used), float(now), member_id),
             )
             conn.commit()
+            _clear_usage_peek_cache(member_id)
 
-            row2 = _usage_db_get_row(conn, member_id)
-            if row2 is None:
-                remaining_seconds = max(0.0, allowed_seconds - new_used)
-                ok = remaining_seconds > 0.0
-                return ok, {"minutes_used": int(new_used // 60), "minutes_allowed": int(allowed_seconds // 60), "minutes_remaining": _usage_minutes_remaining_display(remaining_seconds), "used_seconds": float(new_used), "remaining_seconds": float(remaining_seconds), "total_seconds": float(allowed_seconds)}
-            info = _usage_info_from_row(row2)
+            # The UPDATE only touched used_seconds/last_seen_epoch/restart_grace, so build the
+            # response from the row already in hand instead of re-reading it.
+            rec = {k: row[k] for k in row.keys()}
+            rec["used_seconds"] = float(new_used)
+            rec["last_seen_epoch"] = float(now)
+            info = _usage_info_from_row(rec)
 
             ok = float(info.get("remaining_seconds") or 0.0) > 0.0
             # Maintain legacy key name expected elsewhere in the app.
@@ -24154,6 +25706,9 @@ def _usage_peek_sync(
       - init (if missing)
       - cycle reset
       - plan upgrade/change
+
+    Results are memoized for _USAGE_PEEK_CACHE_TTL_S so UI polling does not take the
+    file lock and a write transaction on every call. Charges and credits clear the entry.
     """
     now = time.time()
 
@@ -24161,6 +25716,44 @@ def _usage_peek_sync(
     if not member_id:
         member_id = str(identity_key or "").strip()
 
+    peek_key = (
+        member_id.lower(),
+        bool(is_trial),
+        str(plan_name or "").strip().lower(),
+        str(minutes_allowed_override if minutes_allowed_override is not None else ""),
+        str(cycle_days_override if cycle_days_override is not None else ""),
+    )
+    if _PERF_OPT_CACHE_ENABLED and _USAGE_PEEK_CACHE_TTL_S > 0:
+        with _USAGE_PEEK_CACHE_LOCK:
+            cached = _USAGE_PEEK_CACHE.get(peek_key)
+        if cached and (now - cached[0]) < _USAGE_PEEK_CACHE_TTL_S:
+            return cached[1][0], dict(cached[1][1])
+
+    ok, info = _usage_peek_uncached_sync(
+        identity_key,
+        member_id,
+        now,
+        is_trial=is_trial,
+        plan_name=plan_name,
+        minutes_allowed_override=minutes_allowed_override,
+        cycle_days_override=cycle_days_override,
+    )
+    if _PERF_OPT_CACHE_ENABLED and _USAGE_PEEK_CACHE_TTL_S > 0:
+        with _USAGE_PEEK_CACHE_LOCK:
+            _USAGE_PEEK_CACHE[peek_key] = (now, (ok, dict(info)))
+    return ok, info
+
+
+def _usage_peek_uncached_sync(
+    identity_key: str,
+    member_id: str,
+    now: float,
+    *,
+    is_trial: bool,
+    plan_name: str,
+    minutes_allowed_override: Optional[int],
+    cycle_days_override: Optional[int],
+) -> Tuple[bool, Dict[str, Any]]:
     with _USAGE_LOCK:  
         conn = _usage_db_connect()
         try:
@@ -24517,7 +26110,19 @@ def _host_onboarding_parse_birthdate(raw: Any) -> Optional[datetime]:
     s = _host_onboarding_safe_str(raw)
     if not s:
         return None
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%Y"):
+    # Pick candidate formats from the delimiter layout instead of raising through every format.
+    if "/" not in s:
+        # ISO dates are parsed by the C-level fromisoformat; strptime only handles unpadded leftovers.
+        try:
+            return datetime.fromisoformat(s)
+        except Exception:
+            pass
+        fmts: Tuple[str, ...] = ("%Y-%m-%d",)
+    elif s.find("/") == 4:
+        fmts = ("%Y/%m/%d",)
+    else:
+        fmts = ("%m/%d/%Y", "%d/%m/%Y")
+    for fmt in fmts:
         try:
             return datetime.strptime(s, fmt)
         except Exception:
@@ -26940,6 +28545,7 @@ def _merge_human_mapping_row_on_conn(conn: sqlite3.Connection, *, keep_rowid: in
         set_sql = ", ".join([f"{col}=?" for col in updates.keys()])
         cur.execute(f"UPDATE companion_mappings SET {set_sql} WHERE rowid=?", tuple(updates.values()) + (keep_rowid,))
     cur.execute("DELETE FROM companion_mappings WHERE rowid=?", (drop_rowid,))
+    _onboarding_join_cache_clear()
     return {"keep": keep_rowid, "drop": drop_rowid, "merged_columns": sorted(updates.keys())}
 
 
@@ -27601,6 +29207,8 @@ def _host_onboarding_upsert_connect_companion_mapping(
     finally:
         if owns_conn and conn is not None:
             conn.close()
+        # Also covers caller-owned connections, which skip the reload below.
+        _onboarding_join_cache_clear()
     if owns_conn:
         try:
             _load_companion_mappings_sync()
@@ -27751,6 +29359,7 @@ def _host_onboarding_upsert_hco_row(
     finally:
         if owns_conn and conn is not None:
             conn.close()
+        _onboarding_join_cache_clear()
 
 
 def _host_onboarding_export_connect_profile(session: Dict[str, Any], profile: Dict[str, Any], version_id: str, db_conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]: